@@ -0,0 +1,38 @@
+import os
+import time
+
+from fastapi import Header, Request
+
+from app.domain.deadline import Deadline
+
+# Request deadlines at the API edge.
+# The budget of a request starts when the request ARRIVES (recorded by RequestArrivalMiddleware), not when the route
+# function starts running: time spent waiting for a worker thread is already spent. Clients can ask for a shorter (or,
+# up to REQUEST_TIMEOUT_MAX_SECONDS, longer) budget with the X-Request-Timeout header, in seconds.
+
+REQUEST_TIMEOUT_SECONDS = float(os.getenv('REQUEST_TIMEOUT_SECONDS', 30))
+REQUEST_TIMEOUT_MAX_SECONDS = float(os.getenv('REQUEST_TIMEOUT_MAX_SECONDS', 60))
+REQUEST_TIMEOUT_MIN_SECONDS = 0.1
+
+
+class RequestArrivalMiddleware:
+    # Plain ASGI middleware (no BaseHTTPMiddleware overhead): stores the arrival time in the request state
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            scope.setdefault('state', {})['received_at'] = time.monotonic()
+        await self.app(scope, receive, send)
+
+
+def request_deadline(
+    request: Request,
+    x_request_timeout: float | None = Header(None, allow_inf_nan=False,  # NaN would make a deadline that never trips
+                                             description="Optional time budget for this request, in seconds."),
+) -> Deadline:
+    seconds = REQUEST_TIMEOUT_SECONDS if x_request_timeout is None else x_request_timeout
+    seconds = min(max(seconds, REQUEST_TIMEOUT_MIN_SECONDS), REQUEST_TIMEOUT_MAX_SECONDS)
+    received_at = getattr(request.state, 'received_at', None)
+    return Deadline.after(seconds, start=received_at)
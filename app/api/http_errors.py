@@ -0,0 +1,12 @@
+import math
+
+from app.domain import errors
+
+# Small helpers shared by the routers to translate domain errors into HTTP details
+
+
+def retry_after_headers(e: errors.BusinessProviderRateLimitedError | errors.BusinessProviderUnavailableError) -> dict[str, str] | None:
+    # Retry-After must be an integer number of seconds; round up so clients never retry too early
+    if e.retry_after is None:
+        return None
+    return {'Retry-After': str(max(1, math.ceil(e.retry_after)))}
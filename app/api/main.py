@@ -1,16 +1,50 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.responses import HTMLResponse
 from fastapi.staticfiles import StaticFiles
 
 from app.api.routes.market_chart import router as router_market_chart
+from app.api.routes.quotes import router as router_quotes
+from app.api.deadlines import RequestArrivalMiddleware
+from app.api.metrics import MetricsMiddleware, router as router_metrics
+from app.api.profiling import router as router_profiles
+from app.infrastructure.prefetch import build_market_chart_prefetcher, prefetch_enabled
+from app.observability.memory import MEMORY_TRACKER, MEMORY_TRACKING_ENABLED
+from app.reports.warmup import WARMUP_ENABLED, start_background_warm_up
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Per-stage memory accounting (see app/observability/memory.py)
+    if MEMORY_TRACKING_ENABLED:
+        MEMORY_TRACKER.start()
+    # Background prefetch of the hottest market chart keys (see app/infrastructure/prefetch.py)
+    prefetcher = build_market_chart_prefetcher() if prefetch_enabled() else None
+    if prefetcher is not None:
+        prefetcher.start()
+    app.state.prefetcher = prefetcher
+    # pandas / matplotlib are imported lazily: load them in the background, off the startup path (app/reports/warmup.py)
+    app.state.warm_up = start_background_warm_up() if WARMUP_ENABLED else None
+    yield
+    if prefetcher is not None:
+        prefetcher.stop()
+
 
 app = FastAPI(
     title="Crypto Analytics Engine",
     description="API for fetching, analyzing, and visualizing historical cryptocurrency market data.",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(RequestArrivalMiddleware)  # added last = outermost: the arrival time is taken first
+
 app.include_router(router_market_chart, prefix = '/api/v1')
+app.include_router(router_quotes, prefix = '/api/v1')
+app.include_router(router_profiles, prefix = '/api/v1')
+app.include_router(router_metrics)
 
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
@@ -151,6 +185,15 @@ async def root() -> str:
                             volatility, normalization and optional resampling (daily, weekly, monthly, yearly).
                         </span>
                     </li>
+                    <li>
+                        <strong>Latest quotes</strong><br />
+                        <a href="/api/v1/quotes/latest?symbol=bitcoin&symbol=ethereum&currency=usd&currency=eur&provider=coingecko">
+                            /api/v1/quotes/latest?symbol=bitcoin&amp;symbol=ethereum&amp;currency=usd&amp;currency=eur&amp;provider=coingecko
+                        </a><br />
+                        <span class="small">
+                            Returns the latest price of every requested symbol in every requested currency (one batched provider call).
+                        </span>
+                    </li>
                 </ul>
             </div>
 
@@ -0,0 +1,111 @@
+import time
+from urllib.parse import parse_qs
+
+import anyio.to_thread
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.observability.metrics import REGISTRY, HTTP_REQUEST_SECONDS, RequestMetrics, Sample, request_metrics_scope
+from app.observability.memory import days_class, rss_bytes
+from app.infrastructure.cache import MARKET_CHART_CACHE, NEGATIVE_CACHE
+from app.infrastructure.scheduler import PROVIDER_SCHEDULERS
+from app.infrastructure.circuit_breaker import PROVIDER_CIRCUIT_BREAKERS, CircuitState
+
+# /metrics endpoint (Prometheus text format) and the middleware that labels stage timings with the route template
+
+
+class MetricsMiddleware:
+    # Plain ASGI middleware: times the request and flushes its stage samples once the matched route is known
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        query_string = scope.get('query_string', b'').decode('latin-1')
+        query = parse_qs(query_string)
+        request_metrics = RequestMetrics(provider=query.get('provider', [''])[0],
+                                         days_class=days_class(query.get('days', [None])[0]), query=query_string)
+        status = {'code': 500}
+
+        async def send_with_status(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            with request_metrics_scope(request_metrics):
+                await self.app(scope, receive, send_with_status)
+        finally:
+            route = getattr(scope.get('route'), 'path', 'unmatched')  # the template, e.g. /api/v1/market_chart/{symbol}/...
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, route, scope['method'], str(status['code']))
+            request_metrics.flush(route)
+
+
+# -------- Collectors: values that live in the infrastructure objects -------- #
+
+def _cache_samples() -> list[Sample]:
+    stats = MARKET_CHART_CACHE.stats
+    name = MARKET_CHART_CACHE.name
+    served = stats.hits + stats.stale_hits + stats.misses
+    results = {'hit': stats.hits, 'stale': stats.stale_hits, 'miss': stats.misses, 'stale_on_error': stats.stale_on_error}
+    return [
+        ('crypto_cache_requests_total', 'counter', 'Cache lookups by result.',
+         [({'cache': name, 'result': result}, value) for result, value in results.items()]),
+        ('crypto_cache_hit_ratio', 'gauge', 'Share of lookups answered without waiting for the provider (fresh + stale hits).',
+         [({'cache': name}, (stats.hits + stats.stale_hits) / served if served else 0.0)]),
+        ('crypto_cache_background_refreshes_total', 'counter', 'Background refreshes started by stale hits.',
+         [({'cache': name}, stats.background_refreshes)]),
+        ('crypto_cache_evictions_total', 'counter', 'LRU evictions.', [({'cache': name}, stats.evictions)]),
+        ('crypto_negative_cache_hits_total', 'counter', 'Requests answered by the negative cache.', [({}, NEGATIVE_CACHE.hits)]),
+    ]
+
+
+def _scheduler_samples() -> list[Sample]:
+    queue_depth, rate_limited, waits, states = [], [], [], []
+    for provider, scheduler in PROVIDER_SCHEDULERS.items():
+        snapshot = scheduler.snapshot()
+        labels = {'provider': provider.value}
+        queue_depth.append((labels, snapshot['queue_depth']))
+        rate_limited.append((labels, snapshot['rate_limited_responses']))
+        for priority, stats in snapshot['priorities'].items():
+            waits.append(({**labels, 'priority': priority}, stats['wait_seconds_p95']))
+    for provider, breaker in PROVIDER_CIRCUIT_BREAKERS.items():
+        states.append(({'provider': provider.value}, 0.0 if breaker.state is CircuitState.CLOSED else 1.0))
+    return [
+        ('crypto_provider_queue_depth', 'gauge', 'Callers waiting in the provider scheduler.', queue_depth),
+        ('crypto_provider_rate_limited_total', 'counter', '429 answers received from the provider.', rate_limited),
+        ('crypto_provider_queue_wait_p95_seconds', 'gauge', 'p95 of the recent scheduler queue waits.', waits),
+        ('crypto_provider_circuit_open', 'gauge', '1 while the provider circuit is open or half-open.', states),
+    ]
+
+
+def _process_samples() -> list[Sample]:
+    return [('crypto_process_resident_memory_bytes', 'gauge', 'Resident set size of the worker process.', [({}, rss_bytes())])]
+
+
+REGISTRY.register_collector(_cache_samples)
+REGISTRY.register_collector(_scheduler_samples)
+REGISTRY.register_collector(_process_samples)
+
+
+def _threadpool_samples() -> list[Sample]:
+    # Sync routes run in AnyIO's default thread pool: waiting tasks mean the pool is the bottleneck.
+    # Must be called from the event loop (the limiter is per loop)
+    stats = anyio.to_thread.current_default_thread_limiter().statistics()
+    return [
+        ('crypto_threadpool_size', 'gauge', 'Worker threads available for sync routes.', [({}, stats.total_tokens)]),
+        ('crypto_threadpool_busy', 'gauge', 'Worker threads currently running a sync route.', [({}, stats.borrowed_tokens)]),
+        ('crypto_threadpool_queue_depth', 'gauge', 'Requests waiting for a worker thread.', [({}, stats.tasks_waiting)]),
+    ]
+
+
+router = APIRouter(tags = ['observability'])
+
+@router.get('/metrics', response_class = PlainTextResponse, include_in_schema = False)
+async def get_metrics() -> PlainTextResponse:
+    return PlainTextResponse(REGISTRY.render(extra_collectors=(_threadpool_samples,)),
+                             media_type='text/plain; version=0.0.4; charset=utf-8')
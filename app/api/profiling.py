@@ -0,0 +1,89 @@
+import functools
+import hmac
+import os
+from dataclasses import dataclass
+
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import FileResponse, Response
+
+from app.observability.profiling import RequestProfiler, PROFILE_ARTIFACTS, profile_report_path
+
+# On-demand profiling of one request: add `profile=1` and the `X-Profile-Token` header to a market_chart call.
+# The route then runs under app/observability/profiling.RequestProfiler, the answer carries X-Profile-Id and the
+# reports are served by GET /api/v1/profiles/{profile_id}/{artifact}.
+# Profiling is disabled unless PROFILE_TOKEN is set. Without `profile=1` the route runs as is: no profiler is created.
+
+PROFILE_TOKEN = os.getenv('PROFILE_TOKEN', '')
+
+
+def _check_profile_token(token: str | None) -> None:
+    if not PROFILE_TOKEN:
+        raise HTTPException(status_code=403, detail='Profiling is disabled on this server')
+    if token is None or not hmac.compare_digest(token.encode(), PROFILE_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail='Invalid profiling token')
+
+
+@dataclass
+class ProfiledRequest:
+    profiler: RequestProfiler
+    response: Response  # FastAPI merges its headers into the route answer
+
+
+def request_profiler(
+    response: Response,
+    profile: bool = Query(False, description="Profile this request (needs the X-Profile-Token header)."),
+    x_profile_token: str | None = Header(None, description="Token allowing `profile=1`."),
+) -> ProfiledRequest | None:
+    if not profile:
+        return None
+    _check_profile_token(x_profile_token)
+    return ProfiledRequest(RequestProfiler(), response)
+
+
+def _profile_headers(profiler: RequestProfiler) -> dict[str, str]:
+    return {
+        'X-Profile-Id': profiler.profile_id,
+        'X-Profile-Report': f'/api/v1/profiles/{profiler.profile_id}/summary',
+    }
+
+
+def profiled(route):
+    # Decorator for sync routes declaring `profiler: ProfiledRequest | None = Depends(request_profiler)`.
+    # The profiler must run in the worker thread running the route, hence a decorator and not a middleware
+    @functools.wraps(route)
+    def wrapper(*args, **kwargs):
+        profiled_request = kwargs.get('profiler')
+        if profiled_request is None:
+            return route(*args, **kwargs)
+
+        profiler = profiled_request.profiler
+        profiler.label = route.__name__
+        try:
+            with profiler:
+                result = route(*args, **kwargs)
+        except HTTPException as e:
+            # Slow failures (504...) are worth profiling too: point to the report from the error answer
+            e.headers = {**(e.headers or {}), **_profile_headers(profiler)}
+            raise
+        # Routes returning a Response bypass the headers of the injected one
+        target = result if isinstance(result, Response) else profiled_request.response
+        target.headers.update(_profile_headers(profiler))
+        return result
+
+    return wrapper
+
+
+router = APIRouter(prefix = '/profiles', tags = ['observability'])
+
+@router.get('/{profile_id}/{artifact}',
+            summary = 'Download a request profile',
+            description = f"Artifacts: {', '.join(PROFILE_ARTIFACTS)}. Needs the X-Profile-Token header.",
+            include_in_schema = False)
+def get_profile_report(profile_id: str, artifact: str, x_profile_token: str | None = Header(None)):
+    _check_profile_token(x_profile_token)
+    path = profile_report_path(profile_id, artifact)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f'No {artifact} report for profile {profile_id}')
+    if artifact == 'pstats':
+        return FileResponse(path, media_type='application/octet-stream', filename=f'{profile_id}.pstats')
+    return FileResponse(path, media_type='text/plain; charset=utf-8')
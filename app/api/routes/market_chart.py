@@ -1,17 +1,21 @@
 from typing import Optional
-from fastapi import APIRouter, HTTPException, Query
-from fastapi.responses import Response
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import Response, StreamingResponse
 import tempfile
 import os
 
 from app.api.schemas import MarketChartResponse, StatsResponse, DataFrameResponse
 from app.domain.entities import ResampleFrequency, Symbol, Currency, Provider
-from app.domain.services import fetch_market_chart, compute_market_chart_stats, compute_enriched_market_chart
+from app.domain.services import fetch_market_chart, compute_market_chart_stats, compute_enriched_market_chart, stream_enriched_market_chart
 from app.domain import errors
-from app.services.analytics import convert_market_chart_data_to_dataframe
+from app.api.http_errors import retry_after_headers
+from app.api.deadlines import request_deadline
+from app.api.profiling import ProfiledRequest, profiled, request_profiler
+from app.domain.deadline import Deadline, deadline_scope, check_deadline
+from app.observability.metrics import stage
 from datetime import datetime
 
-from app.reports.plots import plot_enriched_price
+# app.reports.plots (matplotlib) is imported by the plot route on first use, see app/reports/warmup.py
 
 
 router = APIRouter(prefix = '/market_chart', tags = ['market-chart'])
@@ -20,11 +24,14 @@ router = APIRouter(prefix = '/market_chart', tags = ['market-chart'])
             response_model = MarketChartResponse, 
             summary = 'Fetch crypto data for market chart', 
             description='Retrieve historical market chart data for a specified cryptocurrency, currency, and number of days.')
-def get_market_chart(symbol: Symbol, currency: Currency, days: int, provider: Provider):   
+@profiled
+def get_market_chart(symbol: Symbol, currency: Currency, days: int, provider: Provider, deadline: Deadline = Depends(request_deadline),
+                     profiler: ProfiledRequest | None = Depends(request_profiler)):   
     
     try:
-        #Fetch market chart data from the business layer
-        data = fetch_market_chart(symbol, currency, days, provider) #Domain entity MarketChartData        
+        #Fetch market chart data from the business layer, within the request time budget
+        with deadline_scope(deadline):
+            data = fetch_market_chart(symbol, currency, days, provider) #Domain entity MarketChartData        
          
     except errors.BusinessValidationError as e:
         raise HTTPException(status_code=400, detail=str(e))     
@@ -32,6 +39,12 @@ def get_market_chart(symbol: Symbol, currency: Currency, days: int, provider: Pr
     except errors.BusinessProviderNotCompatible as e:
         raise HTTPException(status_code=400, detail=str(e))     
     
+    except errors.BusinessProviderRateLimitedError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers=retry_after_headers(e))
+    
+    except errors.BusinessProviderUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers=retry_after_headers(e))
+    
     except errors.BusinessProviderGeneralError as e:
         raise HTTPException(status_code=500, detail=str(e))     
     
@@ -41,23 +54,39 @@ def get_market_chart(symbol: Symbol, currency: Currency, days: int, provider: Pr
     except errors.BusinessNoDataError as e:
         raise HTTPException(status_code=404, detail=str(e))     
     
+    except errors.BusinessDeadlineExceededError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    
     #return pydantic model response
-    return MarketChartResponse.from_domain(data) #Pydantic model
+    with stage('serialize'):
+        return MarketChartResponse.from_domain(data) #Pydantic model
 
 @router.get('/stats', 
             response_model = StatsResponse,
             summary = 'Fetch statistics for market chart data',
             description='Retrieve statistical information (mean, median, std deviation) for historical market chart data of a specified cryptocurrency, currency, and number of days.')
-def get_market_chart_stats(symbol: Symbol, currency: Currency, days: int, provider: Provider):
+@profiled
+def get_market_chart_stats(symbol: Symbol, currency: Currency, days: int, provider: Provider,
+                           start: datetime | None = Query(None, description="Optional start datetime (ISO-8601) of the statistics window."),
+                           end: datetime | None = Query(None, description="Optional end datetime (ISO-8601) of the statistics window."),
+                           deadline: Deadline = Depends(request_deadline),
+                           profiler: ProfiledRequest | None = Depends(request_profiler)):
     
     try:
-        stats = compute_market_chart_stats(symbol, currency, days, provider)
+        with deadline_scope(deadline):
+            stats = compute_market_chart_stats(symbol, currency, days, provider, start=start, end=end)
     except errors.BusinessValidationError as e:
         raise HTTPException(status_code=400, detail=str(e))     
     
     except errors.BusinessProviderNotCompatible as e:
         raise HTTPException(status_code=400, detail=str(e))     
     
+    except errors.BusinessProviderRateLimitedError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers=retry_after_headers(e))
+    
+    except errors.BusinessProviderUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers=retry_after_headers(e))
+    
     except errors.BusinessProviderGeneralError as e:
         raise HTTPException(status_code=500, detail=str(e))     
     
@@ -70,47 +99,71 @@ def get_market_chart_stats(symbol: Symbol, currency: Currency, days: int, provid
     except errors.BusinessComputationError as e:
         raise HTTPException(status_code=500, detail=str(e))     
     
-    stats = StatsResponse.from_dict(stats)
+    except errors.BusinessDeadlineExceededError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    
+    with stage('serialize'):
+        stats = StatsResponse.from_dict(stats)
     
     return stats
 
 @router.get('/dataframe', response_model = DataFrameResponse,
             summary =  'Fetch enriched market chart data as DataFrame',
             description='Retrieve enriched historical market chart data for a specified cryptocurrency, currency, and number of days, with optional analytics such as resampling frequency, rolling window, normalization, and volatility calculation.')
+@profiled
 def get_market_chart_dataframe(
     symbol: Symbol, 
     currency: Currency, 
     days: int, 
     provider: Provider, 
     frequency: Optional[ResampleFrequency] = None,
-    window_size: Optional[int] = None,
+    window_size: Optional[list[str]] = Query(None, description="Rolling mean window(s): a number of points or a duration (7D, 12h), repeat for several: window_size=20&window_size=7D."),
     normalize_base: Optional[float] = None,
-    volatility_window: Optional[int] = None,
+    volatility_window: Optional[list[str]] = Query(None, description="Volatility window(s), points or duration, repeatable."),
     start: Optional[datetime] = None,
     end: Optional[datetime] = None,
+    ema_span: Optional[list[int]] = Query(None, description="EMA span(s), repeatable."),
+    bollinger_window: Optional[list[str]] = Query(None, description="Bollinger bands window(s) (2 standard deviations), points or duration, repeatable."),
+    rsi_period: Optional[list[int]] = Query(None, description="RSI period(s) (Wilder), repeatable."),
+    macd: bool = Query(False, description="Add MACD (12, 26, 9): macd, macd_signal, macd_hist."),
+    extrema_window: Optional[list[str]] = Query(None, description="Rolling max / min window(s), points or duration, repeatable."),
+    drawdown_window: Optional[list[str]] = Query(None, description="Drawdown (% below the rolling max) window(s), points or duration, repeatable."),
+    donchian_window: Optional[list[str]] = Query(None, description="Donchian channel window(s), points or duration, repeatable."),
+    deadline: Deadline = Depends(request_deadline),
+    profiler: ProfiledRequest | None = Depends(request_profiler),
     ):
     """
     Endpoint returning an enriched DataFrame:
     - timestamp, price
     - pct_change, acum_pct_change
-    - rolling mean (if window_size)
-    - volatility (if volatility_window)
+    - rolling mean per window (if window_size)
+    - volatility per window (if volatility_window)
+    - ema_*, bollinger_*, rsi_*, macd* (if ema_span, bollinger_window, rsi_period, macd)
+    - rolling_max_*, rolling_min_*, drawdown_*, donchian_* (if extrema_window, drawdown_window, donchian_window)
     - normalized price (if normalize_base)
     - plus weekly fields if resampled to weekly
     """
     try:
-        df = compute_enriched_market_chart(
-            symbol=symbol,
-            currency=currency,
-            days=days,
-            provider=provider,
-            frequency=frequency,
-            window_size=window_size,
-            normalize_base=normalize_base,
-            volatility_window=volatility_window,
-            start=start,
-            end=end,
-        )    
+        with deadline_scope(deadline):
+            df = compute_enriched_market_chart(
+                symbol=symbol,
+                currency=currency,
+                days=days,
+                provider=provider,
+                frequency=frequency,
+                window_size=window_size,
+                normalize_base=normalize_base,
+                volatility_window=volatility_window,
+                start=start,
+                end=end,
+                ema_span=ema_span,
+                bollinger_window=bollinger_window,
+                rsi_period=rsi_period,
+                macd=macd,
+                extrema_window=extrema_window,
+                drawdown_window=drawdown_window,
+                donchian_window=donchian_window,
+            )    
          
     except errors.BusinessValidationError as e:
         raise HTTPException(status_code=400, detail=str(e))     
@@ -118,6 +171,12 @@ def get_market_chart_dataframe(
     except errors.BusinessProviderNotCompatible as e:
         raise HTTPException(status_code=400, detail=str(e))     
     
+    except errors.BusinessProviderRateLimitedError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers=retry_after_headers(e))
+    
+    except errors.BusinessProviderUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers=retry_after_headers(e))
+    
     except errors.BusinessProviderGeneralError as e:
         raise HTTPException(status_code=500, detail=str(e))     
     
@@ -131,8 +190,70 @@ def get_market_chart_dataframe(
         # raised by compute_enriched_market_chart when pandas layer fails
         raise HTTPException(status_code=500, detail=str(e)) 
     
+    except errors.BusinessDeadlineExceededError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    
     #Convert Enriched DataFrame to DataFrameResponse
-    return DataFrameResponse.from_dataframe(df)
+    with stage('serialize'):
+        return DataFrameResponse.from_dataframe(df)
+
+@router.get('/dataframe/stream', response_class=StreamingResponse,
+            summary='Stream enriched market chart data as NDJSON',
+            description='Enriched market chart data (returns, rolling means, volatility, normalization) computed and sent in chunks, one JSON object per line: for long series that do not fit the /dataframe response.')
+def stream_market_chart_dataframe(
+    symbol: Symbol,
+    currency: Currency,
+    days: int,
+    provider: Provider,
+    window_size: Optional[list[str]] = Query(None, description="Rolling mean window(s): a number of points or a duration (7D, 12h), repeatable."),
+    normalize_base: Optional[float] = None,
+    volatility_window: Optional[list[str]] = Query(None, description="Volatility window(s), points or duration, repeatable."),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    deadline: Deadline = Depends(request_deadline),
+    ):
+    """
+    Same rows and columns as /dataframe without resampling, as NDJSON (application/x-ndjson):
+    {"timestamp": ..., "price": ..., "pct_change": ..., ...} per line, missing values as null.
+    Errors are detected before the first line is sent and mapped like /dataframe; the deadline is also checked
+    between chunks, a stream running past it is cut. Not profiled: the chunks are computed after the route returns.
+    """
+    try:
+        with deadline_scope(deadline):
+            chunks = stream_enriched_market_chart(
+                symbol=symbol,
+                currency=currency,
+                days=days,
+                provider=provider,
+                window_size=window_size,
+                normalize_base=normalize_base,
+                volatility_window=volatility_window,
+                start=start,
+                end=end,
+            )
+
+    except errors.BusinessValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except errors.BusinessProviderNotCompatible as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except errors.BusinessProviderRateLimitedError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers=retry_after_headers(e))
+    except errors.BusinessProviderUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers=retry_after_headers(e))
+    except errors.BusinessProviderGeneralError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    except errors.BusinessMalformedDataError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    except errors.BusinessNoDataError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except errors.BusinessComputationError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    except errors.BusinessDeadlineExceededError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+
+    # Each chunk is computed, serialized and dropped while the previous one is being sent
+    from app.services.streaming import ndjson_lines
+    return StreamingResponse(ndjson_lines(chunks), media_type='application/x-ndjson')
 
 @router.get(    "/{symbol}/{currency}/plot-enriched",
     summary="Get enriched market chart plot as PNG",
@@ -142,6 +263,7 @@ def get_market_chart_dataframe(
     ),
     response_class=Response,
 )
+@profiled
 def get_market_chart_plot_enriched(
     symbol: Symbol,
     currency: Currency,
@@ -154,7 +276,8 @@ def get_market_chart_plot_enriched(
     volatility_window: int | None = Query(None, gt=1, description="Rolling window size for volatility calculation."),
     start: datetime | None = Query(None, description="Optional start datetime (ISO-8601) to trim the dataset."),
     end: datetime | None = Query(None, description="Optional end datetime (ISO-8601) to trim the dataset."),
-
+    deadline: Deadline = Depends(request_deadline),
+    profiler: ProfiledRequest | None = Depends(request_profiler),
 ):
     """
     REST-ful endpoint:
@@ -179,23 +302,28 @@ def get_market_chart_plot_enriched(
     # Step 1: Compute enriched DataFrame using business services
     # ---------------------------------------------------------
     try:
-        df = compute_enriched_market_chart(
-            symbol=symbol,
-            currency=currency,
-            days=days,
-            provider=provider,
-            frequency=frequency,
-            window_size=window_size,
-            normalize_base=normalize_base,
-            volatility_window=volatility_window,
-            start=start,
-            end=end,
-        )
+        with deadline_scope(deadline):
+            df = compute_enriched_market_chart(
+                symbol=symbol,
+                currency=currency,
+                days=days,
+                provider=provider,
+                frequency=frequency,
+                window_size=window_size,
+                normalize_base=normalize_base,
+                volatility_window=volatility_window,
+                start=start,
+                end=end,
+            )
 
     except errors.BusinessValidationError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except errors.BusinessProviderNotCompatible as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except errors.BusinessProviderRateLimitedError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers=retry_after_headers(e))
+    except errors.BusinessProviderUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers=retry_after_headers(e))
     except errors.BusinessProviderGeneralError as e:
         raise HTTPException(status_code=500, detail=str(e))
     except errors.BusinessMalformedDataError as e:
@@ -204,12 +332,21 @@ def get_market_chart_plot_enriched(
         raise HTTPException(status_code=404, detail=str(e))
     except errors.BusinessComputationError as e:
         raise HTTPException(status_code=500, detail=str(e))
+    except errors.BusinessDeadlineExceededError as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {e}")
 
     # ---------------------------------------------------------
     # Step 2: Generate a temporary PNG file
     # ---------------------------------------------------------
+    # Rendering is the most expensive step: don't start it for a client that already gave up
+    try:
+        with deadline_scope(deadline):
+            check_deadline('render')
+    except errors.BusinessDeadlineExceededError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+
     tmp_path: str | None = None
     try:
         # Create a temp file that we will write the plot into
@@ -217,20 +354,23 @@ def get_market_chart_plot_enriched(
             tmp_path = tmp.name
 
         # Produce the enriched plot
-        plot_enriched_price(
-            df=df,
-            out_path=tmp_path,
-            symbol=symbol,
-            currency=currency,
-            provider=provider,
-            price_key="price",
-            resample_frequency=frequency,  # purely visual overlay
-        )
+        with stage('plot', provider.value):
+            from app.reports.plots import plot_enriched_price  # matplotlib: loaded by the first plot (or the warm-up)
+            plot_enriched_price(
+                df=df,
+                out_path=tmp_path,
+                symbol=symbol,
+                currency=currency,
+                provider=provider,
+                price_key="price",
+                resample_frequency=frequency,  # purely visual overlay
+                df_resampled=df if frequency is not None else None,  # df is already at that frequency
+            )
 
         # ---------------------------------------------------------
         # Step 3: Load the PNG into memory and return it
         # ---------------------------------------------------------
-        with open(tmp_path, "rb") as f:
+        with stage('serialize', provider.value), open(tmp_path, "rb") as f:
             img_bytes = f.read()
 
         return Response(content=img_bytes, media_type="image/png") #other media_type posibilities are: "image/jpeg", "image/svg+xml"
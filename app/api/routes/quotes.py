@@ -0,0 +1,54 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from app.api.schemas import LatestQuotesResponse
+from app.domain.entities import Symbol, Currency, Provider
+from app.domain.services import fetch_latest_quotes
+from app.domain import errors
+from app.api.http_errors import retry_after_headers
+from app.api.deadlines import request_deadline
+from app.domain.deadline import Deadline, deadline_scope
+from app.observability.metrics import stage
+
+
+router = APIRouter(prefix = '/quotes', tags = ['quotes'])
+
+@router.get('/latest',
+            response_model = LatestQuotesResponse,
+            summary = 'Fetch the latest quotes for several symbols and currencies',
+            description = 'Retrieve the latest price of every requested symbol in every requested currency. Concurrent requests are merged into a single provider call.')
+def get_latest_quotes(
+    symbol: list[Symbol] = Query(..., description="One or more symbols, e.g. symbol=bitcoin&symbol=ethereum."),
+    currency: list[Currency] = Query(..., description="One or more currencies, e.g. currency=usd&currency=eur."),
+    provider: Provider = Query(..., description="Data provider to use."),
+    deadline: Deadline = Depends(request_deadline),
+):
+    try:
+        with deadline_scope(deadline):
+            quotes = fetch_latest_quotes(symbol, currency, provider)
+
+    except errors.BusinessValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    except errors.BusinessProviderNotCompatible as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    except errors.BusinessProviderRateLimitedError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers=retry_after_headers(e))
+
+    except errors.BusinessProviderUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers=retry_after_headers(e))
+
+    except errors.BusinessProviderGeneralError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    except errors.BusinessMalformedDataError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    except errors.BusinessNoDataError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    except errors.BusinessDeadlineExceededError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+
+    with stage('serialize'):
+        return LatestQuotesResponse.from_domain(quotes)
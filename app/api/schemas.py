@@ -1,8 +1,10 @@
 from datetime import datetime
-from typing import Any
+from typing import Any, TYPE_CHECKING
 from pydantic import BaseModel
-from app.domain.entities import Symbol, Currency, MarketChartData, PricePoint
-import pandas as pd
+from app.domain.entities import Symbol, Currency, MarketChartData, PricePoint, LatestQuote
+
+if TYPE_CHECKING:
+    import pandas as pd  # annotations only: the JSON routes don't need pandas loaded
 
 class PricePointResponse(BaseModel):
     timestamp: datetime
@@ -81,7 +83,7 @@ class DataFrameResponse(BaseModel):
     rows: list[list[Any]]
     
     @classmethod
-    def from_dataframe(cls, df: pd.DataFrame) -> 'DataFrameResponse':
+    def from_dataframe(cls, df: 'pd.DataFrame') -> 'DataFrameResponse':
         columns =  list(df.columns)
         rows = df.values.tolist()
         return cls(columns=columns, rows=rows)
@@ -89,4 +91,21 @@ class DataFrameResponse(BaseModel):
         
         
         
-        
\ No newline at end of file
+        
+
+class LatestQuoteResponse(BaseModel):
+    symbol: Symbol
+    currency: Currency
+    price: float
+    last_updated: datetime | None = None
+
+    @classmethod
+    def from_domain(cls, quote: LatestQuote) -> 'LatestQuoteResponse':
+        return cls(symbol=quote.symbol, currency=quote.currency, price=quote.price, last_updated=quote.last_updated)
+
+class LatestQuotesResponse(BaseModel):
+    quotes: list[LatestQuoteResponse]
+
+    @classmethod
+    def from_domain(cls, quotes: list[LatestQuote]) -> 'LatestQuotesResponse':
+        return cls(quotes=[LatestQuoteResponse.from_domain(q) for q in quotes])
@@ -0,0 +1,62 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterator
+
+from app.domain import errors
+
+# Request-scoped deadlines.
+# The API layer creates a Deadline when the request arrives and activates it with deadline_scope(). Every layer below
+# (domain services, provider scheduler, cache, HTTP client) reads it from a context variable, so a request that already
+# spent most of its budget queueing only gets the remaining time for its upstream call, and doomed work is abandoned
+# early instead of running to completion for nobody.
+
+
+@dataclass(frozen=True)
+class Deadline:
+    expires_at: float  # time.monotonic() reference
+
+    @classmethod
+    def after(cls, seconds: float, start: float | None = None) -> 'Deadline':
+        start = time.monotonic() if start is None else start
+        return cls(expires_at=start + seconds)
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+_CURRENT_DEADLINE: ContextVar[Deadline | None] = ContextVar('current_deadline', default=None)
+
+
+@contextmanager
+def deadline_scope(deadline: Deadline | None) -> Iterator[Deadline | None]:
+    token = _CURRENT_DEADLINE.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _CURRENT_DEADLINE.reset(token)
+
+
+def current_deadline() -> Deadline | None:
+    return _CURRENT_DEADLINE.get()
+
+
+def remaining_seconds(default: float | None = None) -> float | None:
+    # Remaining budget of the current request, capped by `default` (e.g. a hard-coded HTTP timeout).
+    # Without an active deadline returns `default`.
+    deadline = _CURRENT_DEADLINE.get()
+    if deadline is None:
+        return default
+    remaining = deadline.remaining()
+    return remaining if default is None else min(default, remaining)
+
+
+def check_deadline(stage: str) -> None:
+    # Call between pipeline stages: abandons the request as soon as its budget is spent
+    deadline = _CURRENT_DEADLINE.get()
+    if deadline is not None and deadline.expired():
+        raise errors.BusinessDeadlineExceededError(f'Request deadline exceeded before stage "{stage}"')
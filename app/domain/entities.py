@@ -1,7 +1,10 @@
+from collections.abc import Sequence
 from dataclasses import dataclass
 from enum import Enum
 from datetime import datetime
 
+import numpy as np
+
 
 class Symbol(Enum):
     BTC = 'bitcoin'
@@ -21,9 +24,10 @@ class Currency(Enum):
 
 
 class Provider(Enum):
-    COINGECKO   = 'coingecko' # For the moment this is the only supported provider. I created more enum values for future use, practice with Enums and code scalability.
-    BINANCE     = 'binance' #not supported yet
-    KRAKEN      = 'kraken' #not supported yet
+    COINGECKO   = 'coingecko'
+    BINANCE     = 'binance' # klines of the <SYMBOL><QUOTE> spot pair (USD is served from USDT pairs)
+    KRAKEN      = 'kraken'  # public OHLC endpoint
+    SYNTHETIC   = 'synthetic'  # generated, seedable price paths of any length (scale / stress tests)
     __UNSUPPORTED__ = '__unsupported__'
 
 #---
@@ -37,12 +41,39 @@ class PricePoint:
     price: float
 
 
+class PricePointSeries(Sequence):
+    '''
+    Read-only sequence of PricePoint backed by two numpy arrays (datetime64[ns] timestamps, float64 prices).
+    PricePoint objects are only built when accessed, so millions of points cost two arrays, not millions of objects.
+    The analytics layer reads the arrays directly.
+    '''
+    __slots__ = ('timestamps', 'prices')
+
+    def __init__(self, timestamps: np.ndarray, prices: np.ndarray):
+        self.timestamps = np.asarray(timestamps, dtype='datetime64[ns]')
+        self.prices = np.asarray(prices, dtype=np.float64)
+        if self.timestamps.shape != self.prices.shape or self.timestamps.ndim != 1:
+            raise ValueError('timestamps and prices must be 1-D arrays of the same length')
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return PricePointSeries(self.timestamps[index], self.prices[index])
+        return PricePoint(self.timestamps[index].astype('datetime64[us]').item(), float(self.prices[index]))
+
+    def __iter__(self):
+        for timestamp, price in zip(self.timestamps.astype('datetime64[us]').tolist(), self.prices.tolist()):
+            yield PricePoint(timestamp, price)
+
+
 class MarketChartData:
     symbol: Symbol
     currency: Currency
-    points: list[PricePoint]
+    points: Sequence[PricePoint]  # a list, or a PricePointSeries for array backed series
     
-    def __init__(self, symbol: Symbol, currency: Currency, points: list[PricePoint]):
+    def __init__(self, symbol: Symbol, currency: Currency, points: Sequence[PricePoint]):
         self.symbol = symbol
         self.currency = currency
         self.points = points #Reference assignment, no copy of the list, keep in mind.
@@ -50,6 +81,8 @@ class MarketChartData:
 
 #Class for resampling frequency options in analytics module.
 class ResampleFrequency(Enum):
+    HOURLY      = 'hourly'
+    FOUR_HOURLY = 'four_hourly'
     DAILY       = 'daily'
     WEEKLY      = 'weekly'
     MONTHLY     = 'monthly'
@@ -57,8 +90,19 @@ class ResampleFrequency(Enum):
 
 #Mapping from ResampleFrequency enum to pandas resampling rules.    
 PANDAS_RESAMPLING_RULES = {
+    ResampleFrequency.HOURLY: 'h',
+    ResampleFrequency.FOUR_HOURLY: '4h',
     ResampleFrequency.DAILY: 'D',
     ResampleFrequency.WEEKLY: 'W-SUN',  # Week ends on Sunday
     ResampleFrequency.MONTHLY: 'ME', # Month End. 
-    ResampleFrequency.YEARLY: 'Y'
-}
\ No newline at end of file
+    ResampleFrequency.YEARLY: 'YE'  # Year End
+}
+
+
+#Latest spot quote for a crypto/fiat pair. Immutable, same idea as PricePoint but carrying its own pair.
+@dataclass(frozen=True)
+class LatestQuote:
+    symbol: Symbol
+    currency: Currency
+    price: float
+    last_updated: datetime | None = None
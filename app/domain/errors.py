@@ -14,4 +14,19 @@ class BusinessNoDataError(Exception):
     pass
 
 class BusinessComputationError(Exception):
-    pass
\ No newline at end of file
+    pass
+
+class BusinessProviderRateLimitedError(BusinessProviderGeneralError):
+    def __init__(self, message: str = '', retry_after: float | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class BusinessProviderUnavailableError(BusinessProviderGeneralError):
+    def __init__(self, message: str = '', retry_after: float | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class BusinessDeadlineExceededError(Exception):
+    pass
@@ -1,21 +1,24 @@
-from app.domain.entities import Symbol, Currency, Provider, MarketChartData, PricePoint, ResampleFrequency
-from app.infrastructure.coingecko import infra_get_parsed_market_chart_coingecko
+from app.domain.entities import Symbol, Currency, Provider, MarketChartData, PricePoint, ResampleFrequency, LatestQuote
+from app.infrastructure.coingecko import infra_get_parsed_market_chart_coingecko, infra_get_parsed_latest_quotes_coingecko
+from app.infrastructure.providers import infra_get_parsed_market_chart, infra_get_hedged_market_chart, hedging_enabled
 from app.infrastructure import errors as errors_infra
 from app.domain import errors as errors_domain
-import pandas as pd
-from app.services.analytics import (
-    convert_market_chart_data_to_dataframe,
-    calculate_stats,
-    compute_returns,
-    compute_rolling_window,
-    resample_price_series,
-    trim_date_range,
-    normalize_series,
-    compute_volatility,
-)
+from app.domain.deadline import check_deadline, current_deadline
+from app.observability.metrics import stage
+from app.services.stats import calculate_price_stats, price_array, range_stats_index, timestamp_array
+from app.services.pyramid import MARKET_CHART_PYRAMIDS
+from app.services.online import MARKET_CHART_ONLINE
 from datetime import datetime
+from typing import TYPE_CHECKING, Iterator
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# The analytics layer (pandas) is imported by the use cases that need it, not here: fetching raw series and quotes
+# must not pay for pandas at startup (cold start of the API process)
 
 DEFAULT_PROVIDER = Provider.COINGECKO
+MARKET_CHART_PROVIDERS = (Provider.COINGECKO, Provider.BINANCE, Provider.KRAKEN, Provider.SYNTHETIC)
 # Business Logic Layer (Domain Services)
 # This layer contains business functions that orchestrate the use of entities and infrastructure functions to fulfill business use cases.
 
@@ -26,16 +29,27 @@ def fetch_market_chart(
     symbol: Symbol, 
     currency: Currency, 
     days: int, 
-    provider: Provider = DEFAULT_PROVIDER
+    provider: Provider = DEFAULT_PROVIDER,
+    hedged: bool | None = None,
 ) -> MarketChartData:
     #This business function will fetch market chart data for a given symbol, currency, and number of days from the specified provider.
-    if provider is not Provider.COINGECKO:
+    #hedged: ask a second provider if the first one is slow (None -> HEDGED_REQUESTS_ENABLED env setting)
+    if provider not in MARKET_CHART_PROVIDERS:
             raise errors_domain.BusinessProviderNotCompatible(f'Provider {provider} not supported yet in this use case')    
     if days <= 0:
         raise errors_domain.BusinessValidationError(f'Invalid parameters: days={days} must be positive integer')
+    if hedged is None:
+        hedged = hedging_enabled()
     
+    check_deadline('fetch')
     try:        
-        data = infra_get_parsed_market_chart_coingecko(symbol, currency, days)
+        with stage('fetch', provider.value):  # cache lookup + (if needed) queue, upstream call and cleaning
+            if hedged:
+                data = infra_get_hedged_market_chart(symbol, currency, days, provider)
+            elif provider is Provider.COINGECKO:
+                data = infra_get_parsed_market_chart_coingecko(symbol, currency, days)
+            else:
+                data = infra_get_parsed_market_chart(symbol, currency, days, provider)
     except errors_infra.InfrastructureProviderNotCompatibleError as e:
         raise errors_domain.BusinessProviderNotCompatible(f'Provider {provider} not compatible with symbol {symbol} and/or currency {currency}: {e}')
     
@@ -48,9 +62,21 @@ def fetch_market_chart(
     except errors_infra.InfrastructureValidationError as e:        
         raise errors_domain.BusinessProviderGeneralError(f'Validation error in provider {provider}: {e}')
     
+    except errors_infra.InfrastructureRateLimitedError as e:
+        raise errors_domain.BusinessProviderRateLimitedError(f'Rate limit reached for provider {provider}: {e}', retry_after=e.retry_after)
+    
+    except errors_infra.InfrastructureCircuitOpenError as e:
+        raise errors_domain.BusinessProviderUnavailableError(f'Provider {provider} temporarily unavailable: {e}', retry_after=e.retry_after)
+    
+    except errors_infra.InfrastructureExternalApiNotFound as e:
+        raise errors_domain.BusinessProviderNotCompatible(f'Provider {provider} does not know the requested pair: {e}')
+    
     except errors_infra.InfrastructureExternalApiError as e:        
         raise errors_domain.BusinessProviderGeneralError( f'External API error from provider {provider}: {e}')
     
+    except errors_infra.InfrastructureDeadlineExceeded as e:
+        raise errors_domain.BusinessDeadlineExceededError(f'Request deadline exceeded waiting for provider {provider}: {e}')
+    
     except errors_infra.InfrastructureExternalApiTimeout as e:        
         raise errors_domain.BusinessProviderGeneralError( f'External API timeout from provider {provider}: {e}')
     
@@ -64,75 +90,278 @@ def fetch_market_chart(
     
     return data
 
+def _check_date_range(start: datetime | None, end: datetime | None) -> None:
+    # An inverted window is a bad request (400), not a window without data (404)
+    if start is not None and end is not None and start > end:
+        raise errors_domain.BusinessValidationError(f'Invalid parameters: start={start} is after end={end}')
+
 # Use case 2: Compute basic statistics from market chart data using pandas
 
 def compute_market_chart_stats(
     symbol: Symbol, 
     currency: Currency, 
     days: int, 
-    provider: Provider = DEFAULT_PROVIDER 
+    provider: Provider = DEFAULT_PROVIDER,
+    start: datetime | None = None,
+    end: datetime | None = None,
     ) -> dict:   
          
+    _check_date_range(start, end)
     #Get MarketChartData
     mcd = fetch_market_chart(symbol = symbol, currency=currency, days=days, provider=provider)  #reuse the fetch function to validate and get data    
-    #Convert to DataFrame
-    df = convert_market_chart_data_to_dataframe(marketchartdata=mcd)    
+    check_deadline('stats')
     try:
-        #Compute stats of the DataFrame
-        stats = calculate_stats(df = df, stats_key='price')    
+        #Compute stats on the price array: no DataFrame, no pandas (see app/services/stats.py)
+        with stage('analytics', provider.value):
+            if start is None and end is None:
+                # Whole series: running stats kept with the cached series, updated incrementally by its refreshes
+                online = MARKET_CHART_ONLINE.get((provider, symbol, currency, days), mcd)
+                stats = online.price_stats() if online is not None else calculate_price_stats(price_array(mcd))
+            else:
+                # Sub-window: answered by the range index of the (cached) series, built by the first window request
+                index = range_stats_index(mcd)
+                lo, hi = index.bounds(start, end)
+                if lo == hi:
+                    raise errors_domain.BusinessNoDataError(f'No data for symbol {symbol}, currency {currency} between {start} and {end}')
+                stats = index.stats(start, end)
     except (ValueError, KeyError) as e:
         raise errors_domain.BusinessComputationError(f'Error computing statistics from market chart data: {e}')
     return stats
 
 # Use case 3: Compute enriched market chart data with optional analytics using pandas
 
+Windows = int | str | list[int | str] | None
+
+def _windows(value: Windows) -> list[int | str]:
+    # Indicator parameters accept one window or a list of windows (e.g. window_size=[5, 10, 20, 50, 200]); a window
+    # is a number of points ("20" from a query string is 20) or a duration ("7D", "30D")
+    if value is None:
+        return []
+    values = [value] if isinstance(value, (int, str)) else list(dict.fromkeys(value))
+    return [int(v) if isinstance(v, str) and v.strip().isdigit() else v for v in values]
+
 def compute_enriched_market_chart(
     symbol: Symbol,
     currency: Currency,
     days: int,
     provider: Provider,
     frequency: ResampleFrequency | None = None,
-    window_size: int | None = None,
+    window_size: Windows = None,
     normalize_base: float | None = None,
-    volatility_window: int | None = None,
+    volatility_window: Windows = None,
     start: datetime | None = None,
     end: datetime | None = None,
-) -> pd.DataFrame:
-    
+    ema_span: int | list[int] | None = None,
+    bollinger_window: Windows = None,
+    rsi_period: int | list[int] | None = None,
+    macd: bool = False,
+    extrema_window: Windows = None,
+    drawdown_window: Windows = None,
+    donchian_window: Windows = None,
+) -> 'pd.DataFrame':
+    from app.services.analytics import (
+        convert_market_chart_data_to_dataframe,
+        convert_ohlc_bars_to_dataframe,
+        compute_returns,
+        compute_indicators,
+        parse_window,
+        resample_price_series,
+        trim_date_range,
+        normalize_series,
+    )
+
+    # Windows given as durations must be valid ones ("7D", "12h"...)
+    windows = {name: _windows(value) for name, value in (
+        ('rolling', window_size), ('volatility', volatility_window), ('bollinger', bollinger_window),
+        ('extrema', extrema_window), ('drawdown', drawdown_window), ('donchian', donchian_window))}
+    try:
+        for specs in windows.values():
+            for spec in specs:
+                parse_window(spec)
+    except ValueError as e:
+        raise errors_domain.BusinessValidationError(f'Invalid parameters: {e}')
+    _check_date_range(start, end)
+
     # 1) Fetch raw chart
     raw_chart: MarketChartData = fetch_market_chart(symbol, currency, days, provider)
+    check_deadline('enrich')
     
+    # Whole series at a frequency: a lookup in the resolution pyramid of the series (app/services/pyramid.py), kept
+    # across requests and updated incrementally when the cache refreshes the series. No DataFrame of the raw points.
+    use_pyramid = frequency is not None and start is None and end is None
+    # Whole raw series: its rolling means and volatilities are kept with it the same way (app/services/online.py)
+    use_online = frequency is None and start is None and end is None and bool(windows['rolling'] or windows['volatility'])
+
     # 2) Domain -> DataFrame
-    df = convert_market_chart_data_to_dataframe(raw_chart)
+    if not use_pyramid:
+        with stage('dataframe', provider.value):
+            df = convert_market_chart_data_to_dataframe(raw_chart)
     
-    try:    
-        # 3) Optional range trim
-        df = trim_date_range(df, start, end)
-        
-        #4) Optional resampling
-        if frequency is not None:
-            df = resample_price_series(df, 'price', frequency)
+    try:
+        with stage('analytics', provider.value):
+            online = MARKET_CHART_ONLINE.get((provider, symbol, currency, days), raw_chart) if use_online else None
+            if use_pyramid:
+                pyramid = MARKET_CHART_PYRAMIDS.get((provider, symbol, currency, days), raw_chart)
+                df = convert_ohlc_bars_to_dataframe(pyramid.bars(frequency), 'price')
+            else:
+                # 3) Optional range trim
+                df = trim_date_range(df, start, end)
         
-        # 5) Always compute returns
-        compute_returns(df, 'price')
+                #4) Optional resampling (trimmed window: periods at the edges are partial, not in the pyramid)
+                if frequency is not None:
+                    df = resample_price_series(df, 'price', frequency)
         
-        # 6) Optional rolling
-        if window_size is not None:
-            if window_size <= 0:
-                raise ValueError(f'Window size must be greater than 0. Got {window_size}')
-            compute_rolling_window(df, window_size, "price")
+            # 5) Always compute returns
+            compute_returns(df, 'price')
         
-        # 7) Optional volatility
-        if volatility_window is not None:
-            if volatility_window <= 1:
-                raise ValueError(f'Volatility window must be greater than 1. Got {volatility_window}')
-            compute_volatility(df, "price", volatility_window)
+            # 6) Optional indicators: rolling means, volatility, EMA, Bollinger bands, RSI, MACD, rolling extrema,
+            # drawdowns, Donchian channels. One engine, so every window shares the same passes over the prices (see
+            # app/services/indicators.py)
+            for size in windows['rolling']:
+                if isinstance(size, int) and size <= 0:
+                    raise ValueError(f'Window size must be greater than 0. Got {size}')
+            for size in windows['volatility']:
+                if isinstance(size, int) and size <= 1:
+                    raise ValueError(f'Volatility window must be greater than 1. Got {size}')
+            if online is not None:
+                for size in windows['rolling']:
+                    df[f'rolling_mean_{size}'] = online.rolling_mean(parse_window(size))
+            compute_indicators(
+                df, "price",
+                rolling_windows=windows['rolling'] if online is None else [],
+                volatility_windows=windows['volatility'] if online is None else [],
+                ema_spans=_windows(ema_span),
+                bollinger_windows=windows['bollinger'],
+                rsi_periods=_windows(rsi_period),
+                macd=macd,
+                extrema_windows=windows['extrema'],
+                drawdown_windows=windows['drawdown'],
+                donchian_windows=windows['donchian'],
+            )
+            if online is not None:
+                for size in windows['volatility']:
+                    df[f'volatility_{size}'] = online.volatility(parse_window(size))
         
-        # 8) Optional normalization
-        if normalize_base is not None:
-            normalize_series(df, "price", normalize_base)
+            # 8) Optional normalization
+            if normalize_base is not None:
+                normalize_series(df, "price", normalize_base)
     
     except (KeyError, ValueError) as e:
         raise errors_domain.BusinessComputationError(f'Error computing enriched market chart with pandas {e}')
     
     return df
+
+
+# Use case 3b: Same enriched market chart, computed and returned chunk by chunk (long series)
+
+def stream_enriched_market_chart(
+    symbol: Symbol,
+    currency: Currency,
+    days: int,
+    provider: Provider,
+    window_size: Windows = None,
+    normalize_base: float | None = None,
+    volatility_window: Windows = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    chunk_size: int | None = None,
+) -> Iterator['pd.DataFrame']:
+    # Returns, rolling means, volatility and normalization of compute_enriched_market_chart, as a generator of
+    # DataFrames of chunk_size rows (app/services/streaming.py): memory is bounded by the chunk, not the series.
+    # Everything that can fail is checked before the first chunk, so callers can map errors before streaming.
+    from app.services.analytics import parse_window
+    from app.services.streaming import STREAM_CHUNK_SIZE, StreamingEnricher, iter_enriched_chunks, trim_arrays
+
+    chunk_size = STREAM_CHUNK_SIZE if chunk_size is None else chunk_size
+    rolling, volatility = _windows(window_size), _windows(volatility_window)
+    try:
+        if chunk_size <= 0:
+            raise ValueError(f'Chunk size must be greater than 0. Got {chunk_size}')
+        parsed = {spec: parse_window(spec) for spec in rolling + volatility}
+    except ValueError as e:
+        raise errors_domain.BusinessValidationError(f'Invalid parameters: {e}')
+    _check_date_range(start, end)
+
+    raw_chart: MarketChartData = fetch_market_chart(symbol, currency, days, provider)
+    check_deadline('enrich')
+
+    try:
+        with stage('analytics', provider.value):
+            timestamps, prices = trim_arrays(timestamp_array(raw_chart), price_array(raw_chart), start, end)
+            if not len(prices):
+                raise errors_domain.BusinessNoDataError(f'No data for symbol {symbol}, currency {currency} between {start} and {end}')
+            for spec in rolling:
+                if isinstance(parsed[spec], int) and parsed[spec] <= 0:
+                    raise ValueError(f'Window size must be greater than 0. Got {parsed[spec]}')
+            for spec in volatility:
+                if isinstance(parsed[spec], int) and parsed[spec] <= 1:
+                    raise ValueError(f'Volatility window must be greater than 1. Got {parsed[spec]}')
+            enricher = StreamingEnricher(rolling, volatility, normalize_base, 'price')
+            enricher.check(timestamps, prices)
+    except (KeyError, ValueError) as e:
+        raise errors_domain.BusinessComputationError(f'Error computing enriched market chart with pandas {e}')
+
+    # The chunks are computed while the response is sent, after the caller's deadline scope is gone: the deadline is
+    # captured here and checked before each chunk (a late stream is cut, the client gets an incomplete body)
+    deadline = current_deadline()
+
+    def chunks() -> Iterator['pd.DataFrame']:
+        try:
+            for chunk in iter_enriched_chunks(timestamps, prices, enricher, chunk_size):
+                yield chunk
+                if deadline is not None and deadline.expired():
+                    raise errors_domain.BusinessDeadlineExceededError('Request deadline exceeded while streaming the enriched market chart')
+        except (KeyError, ValueError) as e:
+            raise errors_domain.BusinessComputationError(f'Error computing enriched market chart with pandas {e}')
+
+    return chunks()
+
+
+# Use case 4: Fetch the latest quote of several symbols in several currencies (one batched provider call)
+
+def fetch_latest_quotes(
+    symbols: list[Symbol],
+    currencies: list[Currency],
+    provider: Provider = DEFAULT_PROVIDER
+) -> list[LatestQuote]:
+    if provider is not Provider.COINGECKO:
+        raise errors_domain.BusinessProviderNotCompatible(f'Provider {provider} not supported yet in this use case')
+    if not symbols or not currencies:
+        raise errors_domain.BusinessValidationError('Invalid parameters: at least one symbol and one currency are required')
+
+    # Remove duplicates but keep the order asked by the caller
+    symbols = list(dict.fromkeys(symbols))
+    currencies = list(dict.fromkeys(currencies))
+
+    check_deadline('fetch')
+    try:
+        with stage('fetch', provider.value):
+            quotes = infra_get_parsed_latest_quotes_coingecko(symbols, currencies)
+    except errors_infra.InfrastructureProviderNotCompatibleError as e:
+        raise errors_domain.BusinessProviderNotCompatible(f'Provider {provider} not compatible with symbols {symbols} and/or currencies {currencies}: {e}')
+
+    except errors_infra.InfrastructureExternalApiMalformedResponse as e:
+        raise errors_domain.BusinessMalformedDataError(f'Malformed data received from provider {provider}: {e}')
+
+    except errors_infra.InfrastructureRateLimitedError as e:
+        raise errors_domain.BusinessProviderRateLimitedError(f'Rate limit reached for provider {provider}: {e}', retry_after=e.retry_after)
+
+    except errors_infra.InfrastructureCircuitOpenError as e:
+        raise errors_domain.BusinessProviderUnavailableError(f'Provider {provider} temporarily unavailable: {e}', retry_after=e.retry_after)
+
+    except errors_infra.InfrastructureExternalApiNotFound as e:
+        raise errors_domain.BusinessProviderNotCompatible(f'Provider {provider} does not know the requested pair: {e}')
+
+    except errors_infra.InfrastructureExternalApiError as e:
+        raise errors_domain.BusinessProviderGeneralError(f'External API error from provider {provider}: {e}')
+
+    except errors_infra.InfrastructureDeadlineExceeded as e:
+        raise errors_domain.BusinessDeadlineExceededError(f'Request deadline exceeded waiting for provider {provider}: {e}')
+
+    except errors_infra.InfrastructureExternalApiTimeout as e:
+        raise errors_domain.BusinessProviderGeneralError(f'External API timeout from provider {provider}: {e}')
+
+    if not quotes:
+        raise errors_domain.BusinessNoDataError(f'No quotes available for symbols {symbols}, currencies {currencies} from provider {provider}')
+
+    return quotes
@@ -0,0 +1,239 @@
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, TypeVar
+
+import httpx
+import numpy as np
+
+from app.domain.entities import Symbol, Currency, Provider, PricePoint, MarketChartData
+from app.domain.deadline import remaining_seconds
+from app.infrastructure import errors
+from app.infrastructure.mapper import map_provider_currency_id, map_provider_symbol_id
+from app.infrastructure.scheduler import RequestPriority, get_provider_scheduler
+from app.infrastructure.cache import MARKET_CHART_CACHE, NEGATIVE_CACHE, DETERMINISTIC_PROVIDER_ERRORS
+from app.infrastructure.circuit_breaker import get_circuit_breaker
+from app.infrastructure.recording import http_get
+from app.observability.metrics import stage, record_upstream_status
+
+# Building blocks shared by the provider adapters (CoinGecko, Binance, Kraken...).
+# An adapter only has to know how to ask ONE provider for a market chart and how to parse the answer; the plumbing
+# (scheduler + circuit breaker, request deadline, HTTP status handling, cache + negative cache, latency tracking) is here.
+
+T = TypeVar('T')
+
+DEFAULT_PROVIDER_TIMEOUT_SECONDS = 5.0
+
+# Shared pool for the upstream calls a single request fans out (e.g. the chunks of a long history). Every call still
+# goes through its provider scheduler, so the pool size bounds concurrency, not the rate.
+_FANOUT_EXECUTOR = ThreadPoolExecutor(max_workers=int(os.getenv('PROVIDER_FANOUT_WORKERS', 4)), thread_name_prefix='provider-fanout')
+
+
+def call_provider(provider: Provider, fn: Callable[[], T], priority: RequestPriority = RequestPriority.INTERACTIVE) -> T:
+    # The upstream call goes through the circuit breaker (fail fast while the provider is down) and then the provider
+    # scheduler (rate budget, priority queue, Retry-After)
+    scheduler = get_provider_scheduler(provider)
+    return get_circuit_breaker(provider).call(lambda: scheduler.call(lambda: _timed_upstream(provider, fn), priority))
+
+
+def _timed_upstream(provider: Provider, fn: Callable[[], T]) -> T:
+    # Only the upstream call itself: the time spent queueing in the scheduler is measured by the scheduler
+    with stage('upstream', provider.value):
+        return fn()
+
+
+def run_concurrently(fns: list[Callable[[], T]]) -> list[T]:
+    '''
+    Run the calls on the fan-out pool and return their results in order. The first error (in order) is raised and the
+    calls that did not start yet are cancelled. Each call runs in a copy of the caller's context, so the request
+    deadline applies inside the workers too.
+    '''
+    if len(fns) == 1:
+        return [fns[0]()]
+    futures = [_FANOUT_EXECUTOR.submit(contextvars.copy_context().run, fn) for fn in fns]
+    results = []
+    try:
+        for future in futures:
+            results.append(future.result())
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
+    return results
+
+
+def provider_timeout(provider_name: str, cap: float = DEFAULT_PROVIDER_TIMEOUT_SECONDS) -> float:
+    # The HTTP timeout is the remaining budget of the request (see app/domain/deadline.py), never more than `cap`
+    timeout = remaining_seconds(cap)
+    if timeout <= 0:
+        # Doomed call: the caller is already out of time, don't even start it
+        raise errors.InfrastructureDeadlineExceeded(f'Request deadline exceeded before calling {provider_name}')
+    return timeout
+
+
+# Retry-After can be a number of seconds or an HTTP date (RFC 9110). Returns seconds, or None if missing/unreadable
+def parse_retry_after(value: str | None) -> float | None:
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def http_get_json(
+    provider_name: str,
+    url: str,
+    params: dict,
+    timeout_cap: float = DEFAULT_PROVIDER_TIMEOUT_SECONDS,
+    not_found_statuses: tuple[int, ...] = (404,),
+    is_not_found: Callable[[httpx.Response], bool] | None = None,
+):
+    '''
+    GET + status handling shared by the adapters, same error contract as the CoinGecko raw functions:
+    429/418 -> InfrastructureRateLimitedError, not_found_statuses (or answers is_not_found accepts) ->
+    InfrastructureExternalApiNotFound, other non 200 -> InfrastructureExternalApiError, unreadable JSON ->
+    InfrastructureExternalApiMalformedResponse.
+    '''
+    timeout = provider_timeout(provider_name, timeout_cap)
+    metric_provider = provider_name.lower()
+    try:
+        response = http_get(url, params = params, timeout = timeout)
+    except httpx.TimeoutException:
+        record_upstream_status(metric_provider, 'timeout')
+        raise errors.InfrastructureExternalApiTimeout(f'{provider_name} API timeout for URL: {url}')
+    except httpx.RequestError as e:
+        record_upstream_status(metric_provider, 'error')
+        raise errors.InfrastructureExternalApiError(f'{provider_name} API request error for URL: {url}: {e}')
+    except Exception as e:
+        record_upstream_status(metric_provider, 'error')
+        raise errors.InfrastructureExternalApiError(f'{provider_name} API unexpected error for URL: {url}: {e}')
+    record_upstream_status(metric_provider, response.status_code)
+
+    if response.status_code in (418, 429):  # Binance answers 418 when an IP keeps ignoring its 429s
+        raise errors.InfrastructureRateLimitedError(f'{provider_name} API rate limit ({response.status_code}) for URL: {url}',
+                                                    retry_after = parse_retry_after(response.headers.get('Retry-After')))
+    if response.status_code in not_found_statuses or (is_not_found is not None and is_not_found(response)):
+        raise errors.InfrastructureExternalApiNotFound(f'{provider_name} API {response.status_code} for URL: {url}\nResponse body: {response.text[:200]}')
+    if response.status_code != 200:
+        raise errors.InfrastructureExternalApiError(f'{provider_name} API error {response.status_code} for URL: {url}\nResponse body: {response.text[:200]}')
+    try:
+        return response.json()
+    except Exception as e:
+        raise errors.InfrastructureExternalApiMalformedResponse(e)
+
+
+def points_from_arrays(seconds: np.ndarray, prices: np.ndarray) -> list[PricePoint]:
+    '''
+    Vectorized cleanup of a parsed series (epoch seconds, prices): drops non finite rows, sorts by time and removes
+    duplicated timestamps (overlapping pages), keeping the last price seen. Only the final conversion to PricePoint
+    is a Python loop.
+    '''
+    seconds = np.asarray(seconds, dtype=np.float64)
+    prices = np.asarray(prices, dtype=np.float64)
+    keep = np.isfinite(seconds) & np.isfinite(prices)
+    seconds, prices = seconds[keep], prices[keep]
+    # unique() on the reversed arrays returns the index of the LAST occurrence of every timestamp
+    unique_seconds, reversed_index = np.unique(seconds[::-1], return_index=True)
+    unique_prices = prices[::-1][reversed_index]
+    return [PricePoint(timestamp=datetime.fromtimestamp(ts), price=price)
+            for ts, price in zip(unique_seconds.tolist(), unique_prices.tolist())]
+
+
+def table_columns(payload, columns: tuple[int, ...], provider_name: str) -> list[np.ndarray]:
+    # Rows of a JSON table (list of lists) -> one float64 array per requested column, without a per-row Python loop
+    if not isinstance(payload, list):
+        raise errors.InfrastructureExternalApiMalformedResponse(f'{provider_name} answer is not a list of rows')
+    if not payload:
+        return [np.empty(0, dtype=np.float64) for _ in columns]
+    try:
+        table = np.asarray(payload, dtype=object)
+        if table.ndim != 2 or table.shape[1] <= max(columns):
+            raise ValueError(f'unexpected table shape {table.shape}')
+        return [table[:, c].astype(np.float64) for c in columns]
+    except (ValueError, TypeError) as e:
+        raise errors.InfrastructureExternalApiMalformedResponse(f'Malformed {provider_name} rows: {e}')
+
+
+class LatencyTracker:
+    # Recent latencies of one provider, used by the hedging logic ("slower than its p95")
+
+    def __init__(self, max_samples: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._samples: deque = deque(maxlen=max_samples)
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def p95(self) -> float | None:
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None  # not enough history to call a request "slow"
+            samples = sorted(self._samples)
+        return samples[int(0.95 * (len(samples) - 1))]
+
+
+class ProviderAdapter:
+    '''
+    Market chart access for one provider. Subclasses implement fetch_market_chart (one uncached upstream fetch,
+    already parsed into MarketChartData); caching, negative caching and latency tracking are shared.
+    '''
+
+    provider: Provider
+
+    def __init__(self):
+        self.latency = LatencyTracker()
+
+    def fetch_market_chart(self, sym: Symbol, curr: Currency, days: int, priority: RequestPriority) -> MarketChartData:
+        raise NotImplementedError
+
+    def supports(self, sym: Symbol, curr: Currency) -> bool:
+        try:
+            map_provider_symbol_id(sym, self.provider)
+            map_provider_currency_id(curr, self.provider)
+        except errors.InfrastructureProviderNotCompatibleError:
+            return False
+        return True
+
+    def get_parsed_market_chart(self, sym: Symbol, curr: Currency, days: int,
+                                priority: RequestPriority = RequestPriority.INTERACTIVE) -> MarketChartData:
+        start = time.monotonic()
+        data = self._get_cached_market_chart(sym, curr, days, priority)
+        self.latency.record(time.monotonic() - start)
+        return data
+
+    def refresh_market_chart(self, sym: Symbol, curr: Currency, days: int,
+                             priority: RequestPriority = RequestPriority.PREFETCH) -> MarketChartData:
+        return MARKET_CHART_CACHE.refresh(
+            (self.provider, sym, curr, days),
+            lambda prio: self.fetch_market_chart(sym, curr, days, prio),
+            priority,
+        )
+
+    def _get_cached_market_chart(self, sym: Symbol, curr: Currency, days: int, priority: RequestPriority) -> MarketChartData:
+        # Same caching policy as CoinGecko: stale-while-revalidate cache + negative cache for deterministic failures
+        negative_key = (self.provider, sym, curr)
+        NEGATIVE_CACHE.check(negative_key)
+        try:
+            return MARKET_CHART_CACHE.get_or_fetch(
+                (self.provider, sym, curr, days),
+                lambda prio: self.fetch_market_chart(sym, curr, days, prio),
+                priority,
+            )
+        except DETERMINISTIC_PROVIDER_ERRORS as e:
+            NEGATIVE_CACHE.remember(negative_key, e)
+            raise
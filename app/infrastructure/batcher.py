@@ -0,0 +1,104 @@
+import copy
+import threading
+import time
+from typing import Callable
+
+from app.domain.deadline import remaining_seconds
+from app.infrastructure import errors
+
+# Micro-batching of provider calls.
+# Callers that arrive within the same short window are merged into ONE upstream request covering the union of all
+# requested ids and vs_currencies. The first caller of a window is the "leader": it waits for the window to close,
+# performs the call and publishes the result. The other callers just wait for that result and take their own slice.
+
+BatchFetch = Callable[[list[str], list[str]], dict]
+
+
+class _PendingBatch:
+    def __init__(self):
+        self.ids: set[str] = set()
+        self.vs_currencies: set[str] = set()
+        self.done = threading.Event()
+        self.result: dict | None = None
+        self.error: BaseException | None = None
+
+
+class MicroBatcher:
+    '''
+    Merge concurrent (ids, vs_currencies) requests into a single upstream call.
+
+    fetch(ids, vs_currencies) must return a dict shaped like CoinGecko's simple price answer:
+        {id: {vs_currency: price, ...}, ...}
+    '''
+
+    def __init__(self, fetch: BatchFetch, window_seconds: float = 0.05, wait_timeout: float = 10.0):
+        self._fetch = fetch
+        self._window_seconds = window_seconds
+        self._wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._pending: _PendingBatch | None = None
+        self.upstream_calls = 0  # handy for tests and metrics
+
+    def submit(self, ids: list[str], vs_currencies: list[str]) -> dict:
+        with self._lock:
+            batch = self._pending
+            is_leader = batch is None
+            if is_leader:
+                batch = _PendingBatch()
+                self._pending = batch
+            batch.ids.update(ids)
+            batch.vs_currencies.update(vs_currencies)
+
+        if is_leader:
+            self._run_batch(batch)
+        else:
+            budget = remaining_seconds()
+            deadline_bound = budget is not None and budget < self._wait_timeout
+            if not batch.done.wait(max(0.0, budget) if deadline_bound else self._wait_timeout):
+                if deadline_bound:
+                    raise errors.InfrastructureDeadlineExceeded('Request deadline exceeded waiting for batched provider call')
+                raise errors.InfrastructureExternalApiTimeout('Timed out waiting for batched provider call')
+
+        if batch.error is not None:
+            # One exception per caller, chained to the shared one: raising the same instance from several threads
+            # would mix up their tracebacks
+            raise _caller_error(batch.error) from batch.error
+        return _split_result(batch.result or {}, ids, vs_currencies)
+
+    def _run_batch(self, batch: _PendingBatch) -> None:
+        # Leave the window open so that concurrent callers can join this batch
+        if self._window_seconds > 0:
+            time.sleep(self._window_seconds)
+        # Close the window: from now on new callers start a new batch
+        with self._lock:
+            if self._pending is batch:
+                self._pending = None
+            self.upstream_calls += 1
+        try:
+            batch.result = self._fetch(sorted(batch.ids), sorted(batch.vs_currencies))
+        except BaseException as e:
+            batch.error = e
+        finally:
+            batch.done.set()
+
+
+def _caller_error(error: BaseException) -> BaseException:
+    # Same type and attributes (e.g. retry_after), without the traceback of another thread
+    try:
+        return copy.copy(error)
+    except Exception:
+        return errors.InfrastructureExternalApiError(f'Batched provider call failed: {error!r}')
+
+
+def _split_result(result: dict, ids: list[str], vs_currencies: list[str]) -> dict:
+    # Keep only what this caller asked for (plus 'last_updated_at', which is shared by all currencies of an id)
+    split = {}
+    for id_ in ids:
+        prices = result.get(id_)
+        if not isinstance(prices, dict):
+            continue
+        selected = {vs: prices[vs] for vs in vs_currencies if vs in prices}
+        if 'last_updated_at' in prices:
+            selected['last_updated_at'] = prices['last_updated_at']
+        split[id_] = selected
+    return split
@@ -0,0 +1,99 @@
+import math
+import os
+import time
+
+import numpy as np
+
+from app.domain.entities import Symbol, Currency, Provider, MarketChartData
+from app.infrastructure import errors
+from app.infrastructure.mapper import map_provider_currency_id, map_provider_symbol_id
+from app.infrastructure.scheduler import RequestPriority
+from app.observability.metrics import stage
+from app.infrastructure.adapters import ProviderAdapter, call_provider, http_get_json, table_columns, points_from_arrays
+
+# Binance spot klines (https://api.binance.com/api/v3/klines).
+# One kline row: [open_time_ms, open, high, low, close, volume, close_time_ms, ...], prices as strings.
+# Max 1000 rows per call: longer ranges are fetched page by page, every page is a scheduled upstream call.
+
+BINANCE_BASE_URL = os.getenv('BINANCE_BASE_URL', 'https://api.binance.com')  # overridable, e.g. to point at a local stand-in
+BINANCE_TIMEOUT_SECONDS = 5.0
+BINANCE_KLINES_LIMIT = 1000
+
+# Same granularity as CoinGecko's automatic one: 5 minutes for 1 day, hourly up to 90 days, daily beyond
+_INTERVALS: list[tuple[int, str, int]] = [  # (max days, interval, interval in ms)
+    (1, '5m', 5 * 60_000),
+    (90, '1h', 60 * 60_000),
+]
+_DAILY = ('1d', 24 * 60 * 60_000)
+
+
+def binance_interval(days: int) -> tuple[str, int]:
+    for max_days, interval, interval_ms in _INTERVALS:
+        if days <= max_days:
+            return interval, interval_ms
+    return _DAILY
+
+
+BINANCE_INVALID_SYMBOL = -1121
+
+
+def _invalid_symbol(response) -> bool:
+    # Binance answers 400 {"code": -1121, "msg": "Invalid symbol."} for unknown pairs: deterministic, like a 404.
+    # Other 400s (bad startTime, endTime, limit...) are ordinary API errors
+    if response.status_code != 400:
+        return False
+    try:
+        body = response.json()
+    except Exception:
+        return False
+    return isinstance(body, dict) and body.get('code') == BINANCE_INVALID_SYMBOL
+
+
+# 1 ) Raw call: one page of klines -> the raw JSON list
+def infra_get_raw_klines_binance(pair: str, interval: str, start_ms: int, end_ms: int, limit: int = BINANCE_KLINES_LIMIT) -> list:
+    params = {'symbol': pair, 'interval': interval, 'startTime': start_ms, 'endTime': end_ms, 'limit': limit}
+    return http_get_json('Binance', f'{BINANCE_BASE_URL}/api/v3/klines', params, BINANCE_TIMEOUT_SECONDS,
+                         is_not_found=_invalid_symbol)
+
+
+# 2 ) Vectorized parsing of one or several pages -> (epoch seconds, close prices)
+def infra_parse_klines_binance(pages: list[list], now_ms: int) -> tuple[np.ndarray, np.ndarray]:
+    columns = [table_columns(page, (4, 6), 'Binance') for page in pages]
+    close = np.concatenate([c[0] for c in columns]) if columns else np.empty(0)
+    close_time_ms = np.concatenate([c[1] for c in columns]) if columns else np.empty(0)
+    # The close price belongs to the END of the kline. The current kline is still open: stamp it "now"
+    seconds = np.minimum(close_time_ms + 1, now_ms) / 1000.0
+    return seconds, close
+
+
+class BinanceAdapter(ProviderAdapter):
+    provider = Provider.BINANCE
+
+    def fetch_market_chart(self, sym: Symbol, curr: Currency, days: int, priority: RequestPriority) -> MarketChartData:
+        # Could raise errors.InfrastructureProviderNotCompatibleError. We let them go up
+        pair = map_provider_symbol_id(sym, Provider.BINANCE) + map_provider_currency_id(curr, Provider.BINANCE)
+        interval, interval_ms = binance_interval(days)
+        now_ms = int(time.time() * 1000)
+        start_ms = now_ms - days * 86_400_000
+        max_pages = math.ceil(days * 86_400_000 / interval_ms / BINANCE_KLINES_LIMIT) + 1
+
+        pages = []
+        for _ in range(max_pages):
+            page = call_provider(Provider.BINANCE,
+                                 lambda: infra_get_raw_klines_binance(pair, interval, start_ms, now_ms), priority)
+            if not isinstance(page, list):
+                raise errors.InfrastructureExternalApiMalformedResponse('Binance klines answer is not a list')
+            pages.append(page)
+            if len(page) < BINANCE_KLINES_LIMIT:
+                break
+            try:
+                start_ms = int(page[-1][0]) + interval_ms  # next page starts after the last open time
+            except (IndexError, TypeError, ValueError) as e:
+                raise errors.InfrastructureExternalApiMalformedResponse(f'Malformed Binance kline: {e}')
+            if start_ms > now_ms:
+                break
+
+        with stage('clean', Provider.BINANCE.value):
+            seconds, close = infra_parse_klines_binance(pages, now_ms)
+            points = points_from_arrays(seconds, close)
+        return MarketChartData(sym, curr, points)
@@ -0,0 +1,303 @@
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, Generic, Hashable, TypeVar
+
+from app.domain.deadline import remaining_seconds
+from app.infrastructure import errors
+from app.infrastructure.scheduler import RequestPriority
+
+# In-memory cache for provider answers with stale-while-revalidate semantics.
+#
+#   age < ttl                          -> fresh hit
+#   ttl <= age < ttl + grace           -> stale hit: served right away, refreshed in the background
+#   age >= ttl + grace                 -> synchronous refresh (callers of the same key share one upstream call)
+#   refresh fails and age < max_stale  -> stale served anyway instead of an error (provider outage)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+Fetch = Callable[[RequestPriority], T]
+
+# Errors that mean "the provider is failing right now". Anything else (malformed data, unsupported pair...) is raised.
+TRANSIENT_PROVIDER_ERRORS: tuple[type[Exception], ...] = (
+    errors.InfrastructureExternalApiError,
+    errors.InfrastructureExternalApiTimeout,
+)
+
+
+class AccessTracker:
+    '''
+    Exponentially decayed request counter per key: recent traffic weighs more than old traffic.
+    A key requested once `half_life_seconds` ago counts 0.5.
+    '''
+
+    def __init__(self, half_life_seconds: float = 600.0, max_keys: int = 1024, clock: Callable[[], float] = time.monotonic):
+        self._decay = math.log(2) / half_life_seconds
+        self._max_keys = max_keys
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._scores: dict[Hashable, tuple[float, float]] = {}  # key -> (score, last update)
+
+    def _decayed(self, score: float, updated: float, now: float) -> float:
+        return score * math.exp(-self._decay * (now - updated))
+
+    def record(self, key: Hashable) -> None:
+        now = self._clock()
+        with self._lock:
+            score, updated = self._scores.get(key, (0.0, now))
+            self._scores[key] = (self._decayed(score, updated, now) + 1.0, now)
+            if len(self._scores) > self._max_keys:
+                # Forget the coldest key so the tracker stays bounded
+                coldest = min(self._scores, key=lambda k: self._decayed(*self._scores[k], now))
+                del self._scores[coldest]
+
+    def hottest(self, n: int) -> list[tuple[Hashable, float]]:
+        now = self._clock()
+        with self._lock:
+            scored = [(k, self._decayed(s, u, now)) for k, (s, u) in self._scores.items()]
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:n]
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.stale_on_error = 0
+        self.background_refreshes = 0
+        self.refresh_errors = 0
+        self.evictions = 0
+
+    def as_dict(self) -> dict:
+        return dict(vars(self))
+
+
+class _Entry(Generic[T]):
+    __slots__ = ('value', 'stored_at')
+
+    def __init__(self, value: T, stored_at: float):
+        self.value = value
+        self.stored_at = stored_at
+
+
+class StaleWhileRevalidateCache(Generic[T]):
+
+    def __init__(
+        self,
+        name: str,
+        ttl_seconds: float,
+        grace_seconds: float,
+        max_stale_seconds: float,
+        max_entries: int = 256,
+        refresh_workers: int = 2,
+        stale_on: tuple[type[Exception], ...] = TRANSIENT_PROVIDER_ERRORS,
+        access_tracker: AccessTracker | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if not (0 <= ttl_seconds <= ttl_seconds + grace_seconds <= max_stale_seconds):
+            raise ValueError('Cache windows must satisfy 0 <= ttl <= ttl + grace <= max_stale')
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.grace_seconds = grace_seconds
+        self.max_stale_seconds = max_stale_seconds
+        self.max_entries = max_entries
+        self.stale_on = stale_on
+        self.access_tracker = access_tracker
+        self.stats = CacheStats()
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Hashable, _Entry[T]] = OrderedDict()
+        self._inflight: dict[Hashable, Future] = {}
+        self._executor = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix=f'{name}-refresh')
+
+    # ------------------------------------------------------------------ public API
+
+    def get_or_fetch(self, key: Hashable, fetch: Fetch, priority: RequestPriority = RequestPriority.INTERACTIVE) -> T:
+        if self.access_tracker is not None:
+            self.access_tracker.record(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                age = self._clock() - entry.stored_at
+                if age < self.ttl_seconds:
+                    self.stats.hits += 1
+                    return entry.value
+                if age < self.ttl_seconds + self.grace_seconds:
+                    self.stats.stale_hits += 1
+                    self._refresh_in_background_locked(key, fetch)
+                    return entry.value
+            self.stats.misses += 1  # not cached, or too old to be served without refreshing first
+            future, is_owner = self._join_inflight_locked(key)
+
+        if is_owner:
+            self._run_fetch(key, fetch, priority, future)
+        try:
+            return self._wait(future)
+        except self.stale_on as e:
+            stale = self._servable_stale(key)
+            if stale is None:
+                raise
+            self.stats.stale_on_error += 1
+            logger.warning('%s: serving stale value for %s after provider error: %s', self.name, key, e)
+            return stale.value
+
+    def refresh(self, key: Hashable, fetch: Fetch, priority: RequestPriority = RequestPriority.PREFETCH) -> T:
+        # Synchronous refresh regardless of the age of the entry (used by background jobs)
+        with self._lock:
+            future, is_owner = self._join_inflight_locked(key)
+        if is_owner:
+            self._run_fetch(key, fetch, priority, future)
+        return self._wait(future)
+
+    def expires_in(self, key: Hashable) -> float | None:
+        # Seconds until the entry stops being fresh (negative if already stale), None if not cached
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            return self.ttl_seconds - (self._clock() - entry.stored_at)
+
+    def peek(self, key: Hashable) -> T | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry.value if entry is not None else None
+
+    def keys(self) -> list[Hashable]:
+        with self._lock:
+            return list(self._entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.stats = CacheStats()
+
+    def wait_for_refreshes(self, timeout: float | None = None) -> None:
+        # Wait for the in-flight upstream calls (mostly useful in tests)
+        with self._lock:
+            pending = list(self._inflight.values())
+        for future in pending:
+            try:
+                future.exception(timeout)
+            except Exception:
+                pass
+
+    # ------------------------------------------------------------------ internals
+
+    @staticmethod
+    def _wait(future: Future) -> T:
+        # A caller waiting for somebody else's upstream call only waits for its own remaining budget
+        try:
+            return future.result(timeout=remaining_seconds())
+        except FutureTimeoutError:
+            raise errors.InfrastructureDeadlineExceeded('Request deadline exceeded while waiting for the provider')
+
+    def _join_inflight_locked(self, key: Hashable) -> tuple[Future, bool]:
+        future = self._inflight.get(key)
+        if future is not None:
+            return future, False
+        future = Future()
+        self._inflight[key] = future
+        return future, True
+
+    def _refresh_in_background_locked(self, key: Hashable, fetch: Fetch) -> None:
+        if key in self._inflight:
+            return  # someone is already refreshing this key
+        future, _ = self._join_inflight_locked(key)
+        self.stats.background_refreshes += 1
+        self._executor.submit(self._run_fetch, key, fetch, RequestPriority.PREFETCH, future)
+
+    def _run_fetch(self, key: Hashable, fetch: Fetch, priority: RequestPriority, future: Future) -> None:
+        try:
+            value = fetch(priority)
+        except BaseException as e:
+            logger.warning('%s: upstream fetch for %s failed: %s', self.name, key, e)
+            with self._lock:
+                self.stats.refresh_errors += 1
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            return
+        with self._lock:
+            self._entries[key] = _Entry(value, self._clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+            self._inflight.pop(key, None)
+        future.set_result(value)
+
+    def _servable_stale(self, key: Hashable) -> _Entry[T] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._clock() - entry.stored_at >= self.max_stale_seconds:
+                return None
+            return entry
+
+
+class NegativeCache:
+    '''
+    Short-lived memory of deterministic failures (unsupported pair, unknown id / 404...).
+    A repeated bad request is answered from here in microseconds instead of reaching the provider again.
+    '''
+
+    def __init__(self, ttl_seconds: float = 300.0, max_entries: int = 1024, clock: Callable[[], float] = time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Hashable, tuple[Exception, float]] = OrderedDict()
+
+    def check(self, key: Hashable) -> None:
+        # Raise (a fresh copy of) the remembered error, if any
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return
+            error, stored_at = item
+            if self._clock() - stored_at >= self.ttl_seconds:
+                del self._entries[key]
+                return
+            self.hits += 1
+        raise type(error)(*error.args)
+
+    def remember(self, key: Hashable, error: Exception) -> None:
+        with self._lock:
+            self._entries[key] = (error, self._clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+
+
+# Deterministic failures that are worth remembering
+DETERMINISTIC_PROVIDER_ERRORS: tuple[type[Exception], ...] = (
+    errors.InfrastructureProviderNotCompatibleError,
+    errors.InfrastructureExternalApiNotFound,
+)
+
+
+# -------- Market chart cache -------- #
+# Keys are (provider, symbol, currency, days). Windows can be tuned with env vars.
+
+MARKET_CHART_CACHE: StaleWhileRevalidateCache = StaleWhileRevalidateCache(
+    name = 'market_chart',
+    ttl_seconds = float(os.getenv('MARKET_CHART_CACHE_TTL_SECONDS', 60)),
+    grace_seconds = float(os.getenv('MARKET_CHART_CACHE_GRACE_SECONDS', 300)),
+    max_stale_seconds = float(os.getenv('MARKET_CHART_CACHE_MAX_STALE_SECONDS', 3600)),
+    max_entries = int(os.getenv('MARKET_CHART_CACHE_MAX_ENTRIES', 256)),
+    access_tracker = AccessTracker(half_life_seconds = float(os.getenv('PREFETCH_HALF_LIFE_SECONDS', 600))),
+)
+
+# Keys are (provider, symbol, currency): an unknown id is unknown whatever the number of days
+NEGATIVE_CACHE = NegativeCache(ttl_seconds = float(os.getenv('NEGATIVE_CACHE_TTL_SECONDS', 300)))
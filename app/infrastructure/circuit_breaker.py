@@ -0,0 +1,162 @@
+import os
+import threading
+import time
+from enum import Enum
+from typing import Callable, TypeVar
+
+from app.domain.entities import Provider
+from app.infrastructure import errors
+
+# Per-provider circuit breaker.
+# When the provider keeps failing (timeouts, 5xx, connection errors) there is no point in making every request wait
+# for the full HTTP timeout: after `failure_threshold` consecutive failures the circuit OPENS and calls fail in
+# microseconds with InfrastructureCircuitOpenError. After `recovery_timeout_seconds` the circuit goes HALF-OPEN and lets
+# a few trial calls through: a success closes it again, a failure re-opens it for another recovery period.
+
+T = TypeVar('T')
+
+
+class CircuitState(Enum):
+    CLOSED    = 'closed'
+    OPEN      = 'open'
+    HALF_OPEN = 'half_open'
+
+
+# Errors that say nothing about the provider health: the provider answered, we (or the caller) asked something wrong
+# or too fast. They never trip the breaker.
+NEUTRAL_ERRORS: tuple[type[Exception], ...] = (
+    errors.InfrastructureDeadlineExceeded,  # the client ran out of time, not the provider
+    errors.InfrastructureRateLimitedError,
+    errors.InfrastructureExternalApiNotFound,
+    errors.InfrastructureProviderNotCompatibleError,
+    errors.InfrastructureExternalApiMalformedResponse,
+)
+
+# Errors that count as a provider failure
+FAILURE_ERRORS: tuple[type[Exception], ...] = (
+    errors.InfrastructureExternalApiError,
+    errors.InfrastructureExternalApiTimeout,
+)
+
+
+class CircuitBreaker:
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        recovery_timeout_seconds: float = 30.0,
+        half_open_max_calls: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout_seconds = recovery_timeout_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self.times_opened = 0
+        self.short_circuited = 0
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CircuitState.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+
+    @property
+    def state(self) -> CircuitState:
+        with self._lock:
+            self._maybe_half_open_locked(self._clock())
+            return self._state
+
+    def _maybe_half_open_locked(self, now: float) -> None:
+        if self._state is CircuitState.OPEN and now - self._opened_at >= self.recovery_timeout_seconds:
+            self._state = CircuitState.HALF_OPEN
+            self._half_open_calls = 0
+
+    def _open_locked(self, now: float) -> None:
+        self._state = CircuitState.OPEN
+        self._opened_at = now
+        self.times_opened += 1
+
+    def before_call(self) -> None:
+        now = self._clock()
+        with self._lock:
+            self._maybe_half_open_locked(now)
+            if self._state is CircuitState.CLOSED:
+                return
+            if self._state is CircuitState.HALF_OPEN and self._half_open_calls < self.half_open_max_calls:
+                self._half_open_calls += 1  # this call is a trial
+                return
+            self.short_circuited += 1
+            retry_after = max(0.0, self.recovery_timeout_seconds - (now - self._opened_at))
+            raise errors.InfrastructureCircuitOpenError(
+                f'Circuit open for provider {self.name} after {self._consecutive_failures} consecutive failures',
+                retry_after=retry_after)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._consecutive_failures = 0
+            self._state = CircuitState.CLOSED
+
+    def record_failure(self) -> None:
+        now = self._clock()
+        with self._lock:
+            self._consecutive_failures += 1
+            if self._state is CircuitState.HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                self._open_locked(now)
+
+    def record_neutral(self) -> None:
+        # The provider answered: a half-open trial slot is released, the failure streak is left as is
+        with self._lock:
+            if self._state is CircuitState.HALF_OPEN:
+                self._half_open_calls = max(0, self._half_open_calls - 1)
+
+    def call(self, fn: Callable[[], T]) -> T:
+        self.before_call()
+        try:
+            result = fn()
+        except NEUTRAL_ERRORS:
+            self.record_neutral()
+            raise
+        except FAILURE_ERRORS:
+            self.record_failure()
+            raise
+        except Exception:
+            self.record_neutral()
+            raise
+        self.record_success()
+        return result
+
+    def snapshot(self) -> dict:
+        return {
+            'provider': self.name,
+            'state': self.state.value,
+            'consecutive_failures': self._consecutive_failures,
+            'times_opened': self.times_opened,
+            'short_circuited': self.short_circuited,
+        }
+
+
+# -------- Per-provider breakers -------- #
+
+def _build_breaker(provider: Provider) -> CircuitBreaker:
+    prefix = provider.name
+    return CircuitBreaker(
+        provider.value,
+        failure_threshold = int(os.getenv(f'{prefix}_CIRCUIT_FAILURE_THRESHOLD', 5)),
+        recovery_timeout_seconds = float(os.getenv(f'{prefix}_CIRCUIT_RECOVERY_SECONDS', 30)),
+    )
+
+
+PROVIDER_CIRCUIT_BREAKERS: dict[Provider, CircuitBreaker] = {
+    Provider.COINGECKO: _build_breaker(Provider.COINGECKO),
+    Provider.BINANCE:   _build_breaker(Provider.BINANCE),
+    Provider.KRAKEN:    _build_breaker(Provider.KRAKEN),
+}
+
+
+def get_circuit_breaker(provider: Provider) -> CircuitBreaker:
+    try:
+        return PROVIDER_CIRCUIT_BREAKERS[provider]
+    except KeyError:
+        raise errors.InfrastructureProviderNotCompatibleError(f'No circuit breaker configured for Provider: {provider}')
@@ -1,18 +1,94 @@
+import os
+import time
 from datetime import datetime
+
+import numpy as np
+
 from app.infrastructure import errors
 from app.domain.entities import Symbol, Currency, Provider
 from app.infrastructure.mapper import map_provider_currency_id, map_provider_symbol_id
-from app.domain.entities import PricePoint, MarketChartData
+from app.domain.entities import PricePoint, MarketChartData, LatestQuote
+from app.infrastructure.batcher import MicroBatcher
+from app.infrastructure.scheduler import RequestPriority
+from app.infrastructure.cache import MARKET_CHART_CACHE, NEGATIVE_CACHE, DETERMINISTIC_PROVIDER_ERRORS
+from app.observability.metrics import stage, record_upstream_status
+from app.infrastructure.adapters import call_provider, provider_timeout, parse_retry_after, http_get_json, run_concurrently, points_from_arrays
+from app.infrastructure.recording import http_get
 
 import httpx 
 
+COINGECKO_BASE_URL = os.getenv('COINGECKO_BASE_URL', 'https://api.coingecko.com/api/v3')  # overridable, e.g. to point at a local stand-in
+COINGECKO_TIMEOUT_SECONDS = 5.0  # upper bound, the request deadline (if any) can only make it shorter
+
+# Long histories are fetched from /market_chart/range in chunks of MARKET_CHART_CHUNK_DAYS (fetched concurrently).
+# CoinGecko picks the granularity from the size of the window: hourly up to 90 days, daily beyond. Chunks of 90 days
+# give hourly points for any history length, and every chunk is a short transfer that can be retried on its own.
+# Every chunk is one call of the rate budget shared with the other requests (30 per minute, bursts of 5 by default):
+# off by default, and histories that need more than MARKET_CHART_MAX_CHUNKS chunks are fetched with the single
+# `days=N` call (daily points) instead of queueing past the request deadline.
+MARKET_CHART_CHUNKED_FETCH = os.getenv('MARKET_CHART_CHUNKED_FETCH', 'false').lower() in ('1', 'true', 'yes')
+MARKET_CHART_CHUNK_DAYS = int(os.getenv('MARKET_CHART_CHUNK_DAYS', 90))
+MARKET_CHART_MAX_CHUNKS = int(os.getenv('MARKET_CHART_MAX_CHUNKS', 4))
+
 # 3) High level function to get parsed market chart data from CoinGecko API -> returns MarketChartData (domain entity)
-def infra_get_parsed_market_chart_coingecko(    sym: Symbol,     curr: Currency,     days: int) -> MarketChartData:
-    raw_data =      infra_get_raw_market_chart_coingecko(sym, curr, days)    
-    clean_data =    infra_clean_raw_market_chart_coingecko(raw_data, 'prices')
+# Answers are served from MARKET_CHART_CACHE with stale-while-revalidate semantics: expired series are returned right
+# away while a background refresh runs, and during a provider outage stale data is served up to a hard limit.
+# Deterministic failures (unsupported pair, unknown id) are remembered for a while in NEGATIVE_CACHE.
+def infra_get_parsed_market_chart_coingecko(    sym: Symbol,     curr: Currency,     days: int, priority: RequestPriority = RequestPriority.INTERACTIVE) -> MarketChartData:
+    negative_key = (Provider.COINGECKO, sym, curr)
+    NEGATIVE_CACHE.check(negative_key)
+    try:
+        return MARKET_CHART_CACHE.get_or_fetch(
+            (Provider.COINGECKO, sym, curr, days),
+            lambda prio: _fetch_parsed_market_chart_coingecko(sym, curr, days, prio),
+            priority,
+        )
+    except DETERMINISTIC_PROVIDER_ERRORS as e:
+        NEGATIVE_CACHE.remember(negative_key, e)
+        raise
+
+# Synchronous refresh of one cached series (used by the background prefetcher)
+def infra_refresh_market_chart_coingecko(sym: Symbol, curr: Currency, days: int, priority: RequestPriority = RequestPriority.PREFETCH) -> MarketChartData:
+    return MARKET_CHART_CACHE.refresh(
+        (Provider.COINGECKO, sym, curr, days),
+        lambda prio: _fetch_parsed_market_chart_coingecko(sym, curr, days, prio),
+        priority,
+    )
+
+def _fetch_parsed_market_chart_coingecko(    sym: Symbol,     curr: Currency,     days: int, priority: RequestPriority) -> MarketChartData:
+    if MARKET_CHART_CHUNKED_FETCH and MARKET_CHART_CHUNK_DAYS < days <= MARKET_CHART_CHUNK_DAYS * MARKET_CHART_MAX_CHUNKS:
+        return _fetch_chunked_market_chart_coingecko(sym, curr, days, priority)
+    # The upstream call goes through the circuit breaker (fail fast while the provider is down) and then the provider
+    # scheduler (rate budget, priority queue, Retry-After)
+    raw_data =      _call_coingecko(lambda: infra_get_raw_market_chart_coingecko(sym, curr, days), priority)
+    with stage('clean', Provider.COINGECKO.value):
+        clean_data = infra_clean_raw_market_chart_coingecko(raw_data, 'prices')
     market_chart = MarketChartData(sym, curr, clean_data)
     return market_chart
 
+def _fetch_chunked_market_chart_coingecko(sym: Symbol, curr: Currency, days: int, priority: RequestPriority) -> MarketChartData:
+    # Every chunk is its own scheduled call: concurrency is bounded by the fan-out pool, the rate by the scheduler
+    windows = market_chart_chunk_windows(int(time.time()), days, MARKET_CHART_CHUNK_DAYS)
+    raw_chunks = run_concurrently([
+        (lambda start=start, end=end: _call_coingecko(lambda: infra_get_raw_market_chart_range_coingecko(sym, curr, start, end), priority))
+        for start, end in windows
+    ])
+    with stage('clean', Provider.COINGECKO.value):
+        points = infra_merge_market_chart_chunks_coingecko(raw_chunks)
+    return MarketChartData(sym, curr, points)
+
+def market_chart_chunk_windows(now_s: int, days: int, chunk_days: int) -> list[tuple[int, int]]:
+    # [(from, to)] unix seconds, oldest first, covering the last `days` days with equally sized windows of at most
+    # chunk_days (a short trailing window would come back at 5 minute granularity). Consecutive windows share their
+    # boundary, the duplicated point is removed by the merge
+    n_chunks = max(1, -(-days // chunk_days))
+    start = now_s - days * 86_400
+    edges = [start + (now_s - start) * i // n_chunks for i in range(n_chunks + 1)]
+    return list(zip(edges[:-1], edges[1:]))
+
+def _call_coingecko(fn, priority: RequestPriority = RequestPriority.INTERACTIVE):
+    return call_provider(Provider.COINGECKO, fn, priority)
+
 # 1 ) Function to get raw market chart data from CoinGecko API -> returns the raw JSON data as a dict
 def infra_get_raw_market_chart_coingecko(    sym: Symbol,     curr: Currency,     days: int) -> dict:
     '''
@@ -28,7 +104,7 @@ def infra_get_raw_market_chart_coingecko(    sym: Symbol,     curr: Currency,
     
     try:
         #Build the URL for the request:
-        URL =  f'https://api.coingecko.com/api/v3/coins/{id_sym}/market_chart'
+        URL =  f'{COINGECKO_BASE_URL}/coins/{id_sym}/market_chart'
     except errors.InfrastructureBadURL as e: #this error would be raised by us if something is wrong with the URL construction. But in this moment there is no possible error here.
         raise e  
         
@@ -38,15 +114,21 @@ def infra_get_raw_market_chart_coingecko(    sym: Symbol,     curr: Currency,
         'vs_currency': id_curr, 
         'days': days
     }
+    # The timeout is the remaining budget of the request (see app/domain/deadline.py), never more than 5 s
+    timeout = _request_timeout()
     try:
-        response = httpx.get(URL, params = params, timeout = 5.0) 
+        response = http_get(URL, params = params, timeout = timeout) 
         #response2 = httpx.request("GET", URL, params = params, timeout = 5.0)
     except httpx.TimeoutException:
+        record_upstream_status(Provider.COINGECKO.value, 'timeout')
         raise errors.InfrastructureExternalApiTimeout
     except httpx.RequestError:
+        record_upstream_status(Provider.COINGECKO.value, 'error')
         raise errors.InfrastructureExternalApiError
     except Exception: #Generic exception for any other unexpected error
+        record_upstream_status(Provider.COINGECKO.value, 'error')
         raise errors.InfrastructureExternalApiError
+    record_upstream_status(Provider.COINGECKO.value, response.status_code)
     
     #the reason why we first catch timeout, then requestError and then generic exception is because TimeoutException is a subclass of RequestError (https://www.python-httpx.org/exceptions/), so if we catch first RequestError, TimeoutException will never be catched. Besides that, TimeoutException is a specific case that we want to handle separately. RequestError is a more general case that includes other types of request-related errors, such as connection errors, DNS resolution failures, etc. Anyway, it's important that whatever the error catcher structure is, we must be sure that all exceptions raised in the try block are catched, otherwise the function would fail without raising our defined Infrastructure errors.
     #The most simple way to catch all errors is:
@@ -60,6 +142,12 @@ def infra_get_raw_market_chart_coingecko(    sym: Symbol,     curr: Currency,
     # 4xx: Client errors (e.g., 400 Bad Request, 404 Not Found)
     # 5xx: Server errors (e.g., 500 Internal Server Error)
     # Everything that is not 200 means that the request was not successful.
+    # 429 is special: the provider tells us to slow down (and often for how long), the scheduler needs that information
+    if response.status_code == 429:
+        raise errors.InfrastructureRateLimitedError(f'CoinGecko API rate limit (429) for URL: {URL}', retry_after = parse_retry_after(response.headers.get('Retry-After')))
+    # 404 is deterministic (unknown coin id): it is remembered by the negative cache and doesn't trip the circuit breaker
+    if response.status_code == 404:
+        raise errors.InfrastructureExternalApiNotFound(f'CoinGecko API 404 for URL: {URL}\nResponse body: {response.text[:200]}')
     if response.status_code != 200:
         raise errors.InfrastructureExternalApiError(f'CoinGecko API error {response.status_code} for URL: {URL}\nResponse body: {response.text[:200]}')
     #in this point the status code is 200, we need to parse the JSON response:    
@@ -70,6 +158,38 @@ def infra_get_raw_market_chart_coingecko(    sym: Symbol,     curr: Currency,
     #in this point we have the parsed JSON data. 
     return parsed_data
 
+def _request_timeout() -> float:
+    return provider_timeout('CoinGecko', COINGECKO_TIMEOUT_SECONDS)
+
+# 1b ) Raw market chart for an explicit time window (/market_chart/range, from/to in unix seconds)
+def infra_get_raw_market_chart_range_coingecko(sym: Symbol, curr: Currency, from_s: int, to_s: int) -> dict:
+    # Could raise errors.InfrastructureProviderNotCompatibleError. We let them go up
+    id_curr = map_provider_currency_id(curr, Provider.COINGECKO)
+    id_sym = map_provider_symbol_id(sym, Provider.COINGECKO)
+    URL = f'{COINGECKO_BASE_URL}/coins/{id_sym}/market_chart/range'
+    params = {'vs_currency': id_curr, 'from': from_s, 'to': to_s}
+    return http_get_json('CoinGecko', URL, params, COINGECKO_TIMEOUT_SECONDS)
+
+# 2b ) Vectorized merge of several raw chunks -> one sorted list of PricePoint without duplicated timestamps
+def infra_merge_market_chart_chunks_coingecko(raw_chunks: list[dict], mandatory_key: str = 'prices') -> list[PricePoint]:
+    tables = []
+    for raw_data in raw_chunks:
+        if not isinstance(raw_data, dict) or not isinstance(raw_data.get(mandatory_key), list):
+            raise errors.InfrastructureExternalApiMalformedResponse("Missing 'prices' in CoinGecko response")
+        if not raw_data[mandatory_key]:
+            continue
+        try:
+            table = np.asarray(raw_data[mandatory_key], dtype=np.float64)
+        except (TypeError, ValueError) as e:
+            raise errors.InfrastructureExternalApiMalformedResponse(f'Malformed CoinGecko prices: {e}')
+        if table.ndim != 2 or table.shape[1] < 2:
+            raise errors.InfrastructureExternalApiMalformedResponse(f'Malformed CoinGecko prices, shape {table.shape}')
+        tables.append(table[:, :2])
+    if not tables:
+        return []
+    merged = np.concatenate(tables)
+    return points_from_arrays(merged[:, 0] / 1000.0, merged[:, 1])
+
 # 2 ) Function to clean the raw market chart data from CoinGecko API -> returns a list of PricePoint (domain entity)
 def infra_clean_raw_market_chart_coingecko(raw_data: dict, mandatory_key: str = 'prices') -> list[PricePoint]:
     #raw data must have the 'prices' field
@@ -83,3 +203,75 @@ def infra_clean_raw_market_chart_coingecko(raw_data: dict, mandatory_key: str =
         price_points.append(price_point)        
     return price_points
 
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+# Latest quotes (simple price endpoint). One call can carry several ids and several vs_currencies, so concurrent
+# callers are merged by a MicroBatcher into a single upstream request.
+# ---------------------------------------------------------------------------------------------------------------------
+
+SIMPLE_PRICE_BATCH_WINDOW_SECONDS = 0.05
+
+# 4 ) Raw multi-id simple price call -> returns the raw JSON data as a dict: {id: {vs_currency: price, 'last_updated_at': ts}}
+def infra_get_raw_simple_price_coingecko(ids: list[str], vs_currencies: list[str]) -> dict:
+    URL = f'{COINGECKO_BASE_URL}/simple/price'
+    params = {
+        'ids': ','.join(ids),
+        'vs_currencies': ','.join(vs_currencies),
+        'include_last_updated_at': 'true',
+    }
+    timeout = _request_timeout()
+    try:
+        response = http_get(URL, params = params, timeout = timeout)
+    except httpx.TimeoutException:
+        record_upstream_status(Provider.COINGECKO.value, 'timeout')
+        raise errors.InfrastructureExternalApiTimeout
+    except httpx.RequestError:
+        record_upstream_status(Provider.COINGECKO.value, 'error')
+        raise errors.InfrastructureExternalApiError
+    except Exception:
+        record_upstream_status(Provider.COINGECKO.value, 'error')
+        raise errors.InfrastructureExternalApiError
+    record_upstream_status(Provider.COINGECKO.value, response.status_code)
+
+    if response.status_code == 429:
+        raise errors.InfrastructureRateLimitedError(f'CoinGecko API rate limit (429) for URL: {URL}', retry_after = parse_retry_after(response.headers.get('Retry-After')))
+    if response.status_code != 200:
+        raise errors.InfrastructureExternalApiError(f'CoinGecko API error {response.status_code} for URL: {URL}\nResponse body: {response.text[:200]}')
+    try:
+        parsed_data = response.json()
+    except Exception as e:
+        raise errors.InfrastructureExternalApiMalformedResponse(e)
+    if not isinstance(parsed_data, dict):
+        raise errors.InfrastructureExternalApiMalformedResponse('Simple price response is not a JSON object')
+    return parsed_data
+
+# One batch = one scheduled upstream call. infra_get_raw_simple_price_coingecko is looked up at call time, so
+# monkeypatching it also affects the batcher
+def _fetch_simple_price_batch(ids: list[str], vs_currencies: list[str]) -> dict:
+    return _call_coingecko(lambda: infra_get_raw_simple_price_coingecko(ids, vs_currencies))
+
+SIMPLE_PRICE_BATCHER = MicroBatcher(_fetch_simple_price_batch, window_seconds = SIMPLE_PRICE_BATCH_WINDOW_SECONDS)
+
+# 5 ) High level function to get the latest quotes -> returns a list of LatestQuote (domain entity)
+def infra_get_parsed_latest_quotes_coingecko(symbols: list[Symbol], currencies: list[Currency]) -> list[LatestQuote]:
+    # Could raise errors.InfrastructureProviderNotCompatibleError. We let them go up
+    id_syms = {map_provider_symbol_id(sym, Provider.COINGECKO): sym for sym in symbols}
+    id_currs = {map_provider_currency_id(curr, Provider.COINGECKO): curr for curr in currencies}
+
+    raw_data = SIMPLE_PRICE_BATCHER.submit(list(id_syms), list(id_currs))
+
+    quotes = []
+    for id_sym, sym in id_syms.items():
+        prices = raw_data.get(id_sym, {})
+        last_updated_at = prices.get('last_updated_at')
+        last_updated = datetime.fromtimestamp(last_updated_at) if last_updated_at is not None else None
+        for id_curr, curr in id_currs.items():
+            if id_curr not in prices:
+                continue  # pair not quoted by the provider, the domain decides what to do with missing pairs
+            try:
+                price = float(prices[id_curr])
+            except (TypeError, ValueError) as e:
+                raise errors.InfrastructureExternalApiMalformedResponse(f'Invalid price for {id_sym}/{id_curr}: {e}')
+            quotes.append(LatestQuote(symbol=sym, currency=curr, price=price, last_updated=last_updated))
+    return quotes
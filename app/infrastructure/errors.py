@@ -27,4 +27,36 @@ class InfrastructureValidationError(Exception):
 class InfrastructureExternalApiMalformedResponse(Exception):
     '''__
     Raises if the response from the external API is malformed or cannot be parsed
-    '''
\ No newline at end of file
+    '''
+
+class InfrastructureRateLimitedError(InfrastructureExternalApiError):
+    '''__
+    HTTP 429 from the external API (or no slot left in our own rate budget).
+    retry_after: seconds to wait before trying again, taken from the Retry-After header when present
+    '''
+    def __init__(self, message: str = '', retry_after: float | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class InfrastructureExternalApiNotFound(Exception):
+    '''__
+    HTTP 404 from the external API (unknown id for this provider). Deterministic: retrying won't help, so it is not an
+    InfrastructureExternalApiError (never treated as a transient provider failure, e.g. served from stale cache)
+    '''
+
+
+class InfrastructureCircuitOpenError(InfrastructureExternalApiError):
+    '''__
+    The provider circuit breaker is open: the call is rejected without reaching the provider.
+    retry_after: seconds until the breaker lets a trial call through
+    '''
+    def __init__(self, message: str = '', retry_after: float | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class InfrastructureDeadlineExceeded(InfrastructureExternalApiTimeout):
+    '''__
+    The caller's request deadline leaves no time (or not enough time) for the external call
+    '''
@@ -0,0 +1,78 @@
+import os
+import time
+
+import numpy as np
+
+from app.domain.entities import Symbol, Currency, Provider, MarketChartData
+from app.infrastructure import errors
+from app.infrastructure.mapper import map_provider_currency_id, map_provider_symbol_id
+from app.infrastructure.scheduler import RequestPriority
+from app.observability.metrics import stage
+from app.infrastructure.adapters import ProviderAdapter, call_provider, http_get_json, table_columns, points_from_arrays
+
+# Kraken public OHLC (https://api.kraken.com/0/public/OHLC).
+# Answer: {"error": [], "result": {"<PAIR NAME>": [[time_s, open, high, low, close, vwap, volume, count], ...], "last": ts}}
+# Kraken keeps only the last 720 candles of each interval, so the interval is chosen to cover the requested days.
+# Errors come with HTTP 200 and a non empty "error" list.
+
+KRAKEN_BASE_URL = os.getenv('KRAKEN_BASE_URL', 'https://api.kraken.com')  # overridable, e.g. to point at a local stand-in
+KRAKEN_TIMEOUT_SECONDS = 5.0
+KRAKEN_MAX_CANDLES = 720
+KRAKEN_INTERVALS_MINUTES = (5, 15, 30, 60, 240, 1440, 10080)
+
+
+def kraken_interval(days: int) -> int:
+    # Finest interval whose 720 candles still cover the requested days
+    for minutes in KRAKEN_INTERVALS_MINUTES:
+        if days * 1440 / minutes <= KRAKEN_MAX_CANDLES:
+            return minutes
+    return KRAKEN_INTERVALS_MINUTES[-1]
+
+
+# 1 ) Raw call -> the raw JSON dict
+def infra_get_raw_ohlc_kraken(pair: str, interval_minutes: int, since_s: int) -> dict:
+    params = {'pair': pair, 'interval': interval_minutes, 'since': since_s}
+    data = http_get_json('Kraken', f'{KRAKEN_BASE_URL}/0/public/OHLC', params, KRAKEN_TIMEOUT_SECONDS)
+    if not isinstance(data, dict):
+        raise errors.InfrastructureExternalApiMalformedResponse('Kraken OHLC answer is not a JSON object')
+    kraken_errors = data.get('error') or []
+    if kraken_errors:
+        message = '; '.join(str(e) for e in kraken_errors)
+        if any('Unknown asset pair' in str(e) for e in kraken_errors):
+            raise errors.InfrastructureExternalApiNotFound(f'Kraken: {message}')
+        if any('Rate limit' in str(e) or 'Too many requests' in str(e) for e in kraken_errors):
+            raise errors.InfrastructureRateLimitedError(f'Kraken: {message}')
+        raise errors.InfrastructureExternalApiError(f'Kraken: {message}')
+    return data
+
+
+# 2 ) Vectorized parsing -> (epoch seconds, close prices)
+def infra_parse_ohlc_kraken(raw_data: dict, interval_minutes: int, now_s: float) -> tuple[np.ndarray, np.ndarray]:
+    result = raw_data.get('result')
+    if not isinstance(result, dict):
+        raise errors.InfrastructureExternalApiMalformedResponse("Missing 'result' in Kraken response")
+    # The pair key is Kraken's own name for the pair (XBTUSD -> XXBTZUSD), the only other key is 'last'
+    rows = [value for key, value in result.items() if key != 'last']
+    if len(rows) != 1:
+        raise errors.InfrastructureExternalApiMalformedResponse('Kraken response must contain exactly one pair')
+    open_s, close = table_columns(rows[0], (0, 4), 'Kraken')
+    # Candles are stamped with their start: the close price belongs to the end (the last candle is still open)
+    seconds = np.minimum(open_s + interval_minutes * 60, now_s)
+    return seconds, close
+
+
+class KrakenAdapter(ProviderAdapter):
+    provider = Provider.KRAKEN
+
+    def fetch_market_chart(self, sym: Symbol, curr: Currency, days: int, priority: RequestPriority) -> MarketChartData:
+        # Could raise errors.InfrastructureProviderNotCompatibleError. We let them go up
+        pair = map_provider_symbol_id(sym, Provider.KRAKEN) + map_provider_currency_id(curr, Provider.KRAKEN)
+        interval = kraken_interval(days)
+        now_s = time.time()
+        since_s = int(now_s - days * 86_400)
+        raw_data = call_provider(Provider.KRAKEN, lambda: infra_get_raw_ohlc_kraken(pair, interval, since_s), priority)
+        with stage('clean', Provider.KRAKEN.value):
+            seconds, close = infra_parse_ohlc_kraken(raw_data, interval, now_s)
+            keep = seconds >= since_s
+            points = points_from_arrays(seconds[keep], close[keep])
+        return MarketChartData(sym, curr, points)
@@ -12,10 +12,15 @@ MAPPER_SYMBOL_PROVIDER: Dict[Provider, SymbolMap] = {
         Symbol.XRP : "ripple",
         Symbol.ETH : "ethereum"
         }, 
-    Provider.BINANCE : {
-        Symbol.BTC : "??",     
-        Symbol.XRP : "??",
-        Symbol.ETH : "??"
+    Provider.BINANCE : {    # base asset of the trading pair
+        Symbol.BTC : "BTC",     
+        Symbol.XRP : "XRP",
+        Symbol.ETH : "ETH"
+        },
+    Provider.KRAKEN : {
+        Symbol.BTC : "XBT",     
+        Symbol.XRP : "XRP",
+        Symbol.ETH : "ETH"
         }
  }
 
@@ -28,13 +33,20 @@ MAPPER_CURRENCY_PROVIDER: Dict[Provider, CurrencyMap] = {
         Currency.CHF : "chf",
         Currency.JPY : "jpy"
         }, 
-    Provider.BINANCE : {
-        Currency.USD : "???",
-        Currency.EUR : "???",
-        Currency.GBP : "???",
-        Currency.AUD : "???",
-        Currency.CHF : "???",
-        Currency.JPY : "???"
+    Provider.BINANCE : {    # quote asset of the trading pair. No USD book on binance.com: USDT is used instead. No CHF pairs.
+        Currency.USD : "USDT",
+        Currency.EUR : "EUR",
+        Currency.GBP : "GBP",
+        Currency.AUD : "AUD",
+        Currency.JPY : "JPY"
+        },
+    Provider.KRAKEN : {
+        Currency.USD : "USD",
+        Currency.EUR : "EUR",
+        Currency.GBP : "GBP",
+        Currency.AUD : "AUD",
+        Currency.CHF : "CHF",
+        Currency.JPY : "JPY"
         }
     }
 
@@ -0,0 +1,137 @@
+import logging
+import os
+import threading
+from typing import Callable, Hashable
+
+from app.domain.entities import Provider
+from app.infrastructure import errors
+from app.infrastructure.cache import MARKET_CHART_CACHE, AccessTracker, StaleWhileRevalidateCache
+from app.infrastructure.scheduler import PROVIDER_SCHEDULERS, RequestPriority, get_provider_scheduler
+from app.infrastructure.providers import PROVIDER_ADAPTERS
+
+# Background prefetch of hot keys.
+# Traffic follows a power law: a few (provider, symbol, currency, days) keys make most of the requests. The cache
+# records every access in its AccessTracker; the Prefetcher periodically refreshes the hottest keys shortly before
+# they expire, so those requests are (almost) always fresh hits. Prefetch calls use PREFETCH priority in the provider
+# scheduler and never spend more than a configurable share of the provider rate budget.
+
+logger = logging.getLogger(__name__)
+
+Refresher = Callable[[Hashable], object]
+
+
+class Prefetcher:
+    '''
+    Refresh the hottest keys of a cache before they expire, within a share of each provider's rate budget.
+
+    Keys must start with the Provider (market chart keys are (provider, symbol, currency, days)).
+    refreshers[provider](key) performs a synchronous refresh of that key (cache.refresh with PREFETCH priority).
+    '''
+
+    def __init__(
+        self,
+        cache: StaleWhileRevalidateCache,
+        tracker: AccessTracker,
+        refreshers: dict[Provider, Refresher],
+        interval_seconds: float = 15.0,
+        top_k: int = 10,
+        refresh_margin_seconds: float = 20.0,
+        budget_share: float = 0.25,
+        min_score: float = 2.0,
+    ):
+        if not 0 < budget_share <= 1:
+            raise ValueError('budget_share must be in (0, 1]')
+        self.cache = cache
+        self.tracker = tracker
+        self.refreshers = refreshers
+        self.interval_seconds = interval_seconds
+        self.top_k = top_k
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self.budget_share = budget_share
+        self.min_score = min_score
+        self.refreshed = 0
+        self.failed = 0
+        self._budget: dict[Provider, float] = {}
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _refill_budget(self, provider: Provider) -> float:
+        # Budget accumulates over cycles (capped), so slow providers still get an occasional refresh
+        rate = get_provider_scheduler(provider).rate_per_second
+        per_cycle = self.budget_share * rate * self.interval_seconds
+        budget = min(self._budget.get(provider, 0.0) + per_cycle, max(1.0, per_cycle))
+        self._budget[provider] = budget
+        return budget
+
+    def run_once(self) -> int:
+        # One prefetch cycle. Returns the number of keys refreshed.
+        refreshed = 0
+        for provider in self.refreshers:
+            self._refill_budget(provider)
+        for key, score in self.tracker.hottest(self.top_k):
+            if score < self.min_score:
+                break  # sorted by score: the rest is even colder
+            provider = key[0]
+            refresher = self.refreshers.get(provider)
+            if refresher is None:
+                continue
+            expires_in = self.cache.expires_in(key)
+            if expires_in is not None and expires_in > self.refresh_margin_seconds:
+                continue  # still fresh for a while
+            if self._budget.get(provider, 0.0) < 1.0:
+                continue  # this provider's prefetch budget is spent for this cycle
+            scheduler = get_provider_scheduler(provider)
+            acquired = scheduler.acquired(RequestPriority.PREFETCH)
+            try:
+                refresher(key)
+                refreshed += 1
+                self.refreshed += 1
+            except (errors.InfrastructureExternalApiError, errors.InfrastructureExternalApiTimeout) as e:
+                # Includes rate limiting: interactive traffic has priority, we'll try again next cycle
+                self.failed += 1
+                logger.info('prefetch of %s skipped: %s', key, e)
+            except Exception as e:
+                self.failed += 1
+                logger.warning('prefetch of %s failed: %s', key, e)
+            finally:
+                # Charge the upstream calls the refresh made (paged or chunked fetches make several), at least one.
+                # Going below zero is a debt paid back by the next refills
+                self._budget[provider] -= max(1, scheduler.acquired(RequestPriority.PREFETCH) - acquired)
+        return refreshed
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception('prefetch cycle failed')
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='market-chart-prefetch', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float | None = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+def prefetch_enabled() -> bool:
+    return os.getenv('PREFETCH_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+
+
+def build_market_chart_prefetcher() -> Prefetcher:
+    return Prefetcher(
+        cache = MARKET_CHART_CACHE,
+        tracker = MARKET_CHART_CACHE.access_tracker,
+        refreshers = {provider: (lambda key, adapter=adapter: adapter.refresh_market_chart(*key[1:]))
+                      for provider, adapter in PROVIDER_ADAPTERS.items() if provider in PROVIDER_SCHEDULERS},
+        interval_seconds = float(os.getenv('PREFETCH_INTERVAL_SECONDS', 15)),
+        top_k = int(os.getenv('PREFETCH_TOP_K', 10)),
+        refresh_margin_seconds = float(os.getenv('PREFETCH_REFRESH_MARGIN_SECONDS', 20)),
+        budget_share = float(os.getenv('PREFETCH_BUDGET_SHARE', 0.25)),
+    )
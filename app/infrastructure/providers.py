@@ -0,0 +1,156 @@
+import contextvars
+import logging
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+from app.domain.entities import Symbol, Currency, Provider, MarketChartData
+from app.domain.deadline import remaining_seconds
+from app.infrastructure import errors
+from app.infrastructure import coingecko
+from app.infrastructure.scheduler import RequestPriority
+from app.infrastructure.adapters import ProviderAdapter
+from app.infrastructure.binance import BinanceAdapter
+from app.infrastructure.kraken import KrakenAdapter
+from app.infrastructure.synthetic import SyntheticAdapter
+
+# Provider adapter registry + hedged requests.
+#
+# Hedging: the request goes to the asked provider first. If it has not answered after that provider's p95 latency,
+# the same series is asked to the next provider that supports the pair, and whichever answers first wins (the slower
+# call keeps running in the background and just warms the cache). Tail latency is cut for ~5% extra upstream calls.
+# Note that the hedge answer comes from another exchange: prices of the same pair differ slightly between providers.
+
+logger = logging.getLogger(__name__)
+
+
+class CoinGeckoAdapter(ProviderAdapter):
+    # CoinGecko keeps its own module (market chart + latest quotes); the adapter just plugs it in the registry
+    provider = Provider.COINGECKO
+
+    def fetch_market_chart(self, sym: Symbol, curr: Currency, days: int, priority: RequestPriority) -> MarketChartData:
+        return coingecko._fetch_parsed_market_chart_coingecko(sym, curr, days, priority)
+
+    def _get_cached_market_chart(self, sym: Symbol, curr: Currency, days: int, priority: RequestPriority) -> MarketChartData:
+        return coingecko.infra_get_parsed_market_chart_coingecko(sym, curr, days, priority)
+
+
+PROVIDER_ADAPTERS: dict[Provider, ProviderAdapter] = {
+    Provider.COINGECKO: CoinGeckoAdapter(),
+    Provider.BINANCE:   BinanceAdapter(),
+    Provider.KRAKEN:    KrakenAdapter(),
+    Provider.SYNTHETIC: SyntheticAdapter(),
+}
+
+# Order in which providers are tried as a hedge
+HEDGE_ORDER: tuple[Provider, ...] = (Provider.COINGECKO, Provider.KRAKEN, Provider.BINANCE)
+
+
+def get_provider_adapter(provider: Provider) -> ProviderAdapter:
+    try:
+        return PROVIDER_ADAPTERS[provider]
+    except KeyError:
+        raise errors.InfrastructureProviderNotCompatibleError(f'No adapter registered for Provider: {provider}')
+
+
+def infra_get_parsed_market_chart(sym: Symbol, curr: Currency, days: int, provider: Provider) -> MarketChartData:
+    return get_provider_adapter(provider).get_parsed_market_chart(sym, curr, days)
+
+
+# -------- Hedged requests -------- #
+
+def hedging_enabled() -> bool:
+    return os.getenv('HEDGED_REQUESTS_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+
+
+class HedgedMarketChartFetcher:
+    '''
+    Market chart fetch with a hedge request to a second provider when the first one is slower than its p95.
+
+    default_delay_seconds is used while a provider has too little latency history for a meaningful p95;
+    min_delay_seconds avoids hedging everything when the p95 is tiny (cache hits).
+    '''
+
+    def __init__(
+        self,
+        adapters: dict[Provider, ProviderAdapter],
+        hedge_order: tuple[Provider, ...] = HEDGE_ORDER,
+        default_delay_seconds: float = 1.0,
+        min_delay_seconds: float = 0.05,
+        max_workers: int = 8,
+    ):
+        self.adapters = adapters
+        self.hedge_order = hedge_order
+        self.default_delay_seconds = default_delay_seconds
+        self.min_delay_seconds = min_delay_seconds
+        self.hedges_sent = 0
+        self.hedges_won = 0
+        self._lock = threading.Lock()  # the counters are updated by concurrent requests
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='hedge')
+
+    def hedge_provider(self, provider: Provider, sym: Symbol, curr: Currency) -> Provider | None:
+        if provider not in self.hedge_order:
+            return None  # e.g. synthetic data: no other provider serves the same series
+        for candidate in self.hedge_order:
+            adapter = self.adapters.get(candidate)
+            if candidate is not provider and adapter is not None and adapter.supports(sym, curr):
+                return candidate
+        return None
+
+    def hedge_delay(self, provider: Provider) -> float:
+        p95 = self.adapters[provider].latency.p95()
+        return max(self.min_delay_seconds, self.default_delay_seconds if p95 is None else p95)
+
+    def _adapter(self, provider: Provider) -> ProviderAdapter:
+        try:
+            return self.adapters[provider]
+        except KeyError:
+            raise errors.InfrastructureProviderNotCompatibleError(f'No adapter registered for Provider: {provider}')
+
+    def _submit(self, provider: Provider, sym: Symbol, curr: Currency, days: int) -> Future:
+        # Each task gets its own copy of the context so the request deadline follows the call into the worker thread
+        adapter = self._adapter(provider)
+        return self._executor.submit(contextvars.copy_context().run, adapter.get_parsed_market_chart, sym, curr, days)
+
+    def fetch(self, sym: Symbol, curr: Currency, days: int, provider: Provider) -> MarketChartData:
+        primary = self._adapter(provider)
+        hedge = self.hedge_provider(provider, sym, curr)
+        if hedge is None:
+            return primary.get_parsed_market_chart(sym, curr, days)
+
+        first = self._submit(provider, sym, curr, days)
+        delay = self.hedge_delay(provider)
+        budget = remaining_seconds()
+        if budget is not None:
+            delay = min(delay, max(0.0, budget))
+        done, _ = wait([first], timeout=delay)
+        if done:
+            return first.result()
+
+        with self._lock:
+            self.hedges_sent += 1
+        logger.info('hedging %s/%s %sd: %s slower than %.3fs, asking %s', sym.value, curr.value, days, provider.value, delay, hedge.value)
+        second = self._submit(hedge, sym, curr, days)
+        pending = {first, second}
+        while pending:
+            done, pending = wait(pending, timeout=remaining_seconds(), return_when=FIRST_COMPLETED)
+            if not done:
+                raise errors.InfrastructureDeadlineExceeded(f'Request deadline exceeded waiting for {provider.value} and {hedge.value}')
+            for future in done:
+                if future.exception() is None:
+                    if future is second:
+                        with self._lock:
+                            self.hedges_won += 1
+                    return future.result()
+        # Both failed: report the error of the provider the caller asked for
+        raise first.exception()
+
+
+HEDGED_FETCHER = HedgedMarketChartFetcher(
+    PROVIDER_ADAPTERS,
+    default_delay_seconds = float(os.getenv('HEDGE_DEFAULT_DELAY_SECONDS', 1.0)),
+)
+
+
+def infra_get_hedged_market_chart(sym: Symbol, curr: Currency, days: int, provider: Provider) -> MarketChartData:
+    return HEDGED_FETCHER.fetch(sym, curr, days, provider)
@@ -0,0 +1,104 @@
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+import httpx
+
+# Record / replay of provider HTTP answers, for offline and deterministic runs (benchmarks, profiling, regressions).
+#
+#   PROVIDER_RECORDING_MODE=record  every provider answer is also saved to PROVIDER_RECORDING_DIR
+#   PROVIDER_RECORDING_MODE=replay  answers are read back from PROVIDER_RECORDING_DIR, no network at all;
+#                                   PROVIDER_REPLAY_LATENCY_SECONDS (+ jitter) simulates the provider latency
+#
+# One JSON file per request, named after a hash of (url, params). Time parameters (from/to, startTime/endTime, since)
+# change with the clock, so they are keyed by their distance to "now" rounded to the hour: a chunked CoinGecko fetch
+# recorded yesterday replays today. Replayed payloads keep their recorded timestamps.
+# Everything above the HTTP call (scheduler, circuit breaker, cache, parsing, analytics, plots) runs as usual.
+
+logger = logging.getLogger(__name__)
+
+PROVIDER_RECORDING_MODE = os.getenv('PROVIDER_RECORDING_MODE', 'off').lower()  # off | record | replay
+PROVIDER_RECORDING_DIR = os.getenv('PROVIDER_RECORDING_DIR', 'recordings')
+PROVIDER_REPLAY_LATENCY_SECONDS = float(os.getenv('PROVIDER_REPLAY_LATENCY_SECONDS', 0.0))
+PROVIDER_REPLAY_JITTER_SECONDS = float(os.getenv('PROVIDER_REPLAY_JITTER_SECONDS', 0.0))
+
+# parameter -> unit in seconds
+TIME_PARAMS = {'from': 1, 'to': 1, 'since': 1, 'startTime': 0.001, 'endTime': 0.001}
+KEPT_HEADERS = ('content-type', 'retry-after')
+
+_write_lock = threading.Lock()
+
+
+class ReplayMissError(httpx.RequestError):
+    # No recording for a request in replay mode: handled like any network error by the callers
+    pass
+
+
+def recording_key(url: str, params: dict | None, now_s: float | None = None) -> str:
+    now_s = time.time() if now_s is None else now_s
+    normalized = {}
+    for name, value in (params or {}).items():
+        if name in TIME_PARAMS:
+            try:
+                value = f'now-{round((now_s - float(value) * TIME_PARAMS[name]) / 3600)}h'
+            except (TypeError, ValueError):
+                pass
+        normalized[name] = str(value)
+    raw = json.dumps([url, sorted(normalized.items())])
+    return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+
+def _recording_path(key: str, directory: str) -> str:
+    return os.path.join(directory, f'{key}.json')
+
+
+def record_response(url: str, params: dict | None, response: httpx.Response, directory: str) -> str:
+    key = recording_key(url, params)
+    entry = {
+        'url': url,
+        'params': params or {},
+        'recorded_at': time.time(),
+        'status_code': response.status_code,
+        'headers': {name: response.headers[name] for name in KEPT_HEADERS if name in response.headers},
+        'body': response.text,
+    }
+    path = _recording_path(key, directory)
+    with _write_lock:
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)  # readers never see a half written file
+    return path
+
+
+def replay_response(url: str, params: dict | None, directory: str) -> httpx.Response:
+    path = _recording_path(recording_key(url, params), directory)
+    try:
+        with open(path, encoding='utf-8') as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        logger.warning('replay: no recording for %s %s', url, params)
+        raise ReplayMissError(f'No recorded response for {url} {params} in {directory}')
+    return httpx.Response(entry['status_code'], headers=entry['headers'], content=entry['body'].encode('utf-8'),
+                          request=httpx.Request('GET', url, params=params))
+
+
+def http_get(url: str, params: dict | None = None, timeout: float | None = None):
+    # The single HTTP entry point of the provider adapters. httpx.get is looked up at call time (tests patch it)
+    mode = PROVIDER_RECORDING_MODE
+    if mode == 'replay':
+        latency = PROVIDER_REPLAY_LATENCY_SECONDS + random.uniform(0.0, PROVIDER_REPLAY_JITTER_SECONDS)
+        if latency > 0:
+            time.sleep(latency if timeout is None else min(latency, timeout))
+            if timeout is not None and latency > timeout:
+                raise httpx.ReadTimeout(f'Replayed latency {latency:.3f}s over the timeout', request=httpx.Request('GET', url))
+        return replay_response(url, params, PROVIDER_RECORDING_DIR)
+    response = httpx.get(url, params = params, timeout = timeout)
+    if mode == 'record':
+        record_response(url, params, response, PROVIDER_RECORDING_DIR)
+    return response
@@ -0,0 +1,247 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from enum import IntEnum
+from typing import Callable, TypeVar
+
+from app.domain.entities import Provider
+from app.domain.deadline import remaining_seconds
+from app.infrastructure import errors
+
+# Provider-level request scheduler.
+# Every upstream call goes through the scheduler of its provider, which:
+#   - keeps a token bucket sized to the plan's rate limit (so bursts are smoothed instead of turning into 429s),
+#   - serves waiting callers by priority (interactive requests before background prefetch),
+#   - honors Retry-After when the provider still answers 429 (the whole bucket is paused, not only the caller),
+#   - records queue wait times so they can be surfaced as metrics.
+
+T = TypeVar('T')
+
+
+class RequestPriority(IntEnum):
+    INTERACTIVE = 0   # a client is waiting for this answer
+    PREFETCH    = 1   # background refresh, can always wait
+
+
+class TokenBucket:
+    '''
+    Classic token bucket: `rate` tokens per second, at most `capacity` tokens stored.
+    Not thread-safe by itself, the scheduler holds its lock while using it.
+    '''
+
+    def __init__(self, rate: float, capacity: float):
+        if rate <= 0 or capacity < 1:
+            raise ValueError('Token bucket needs rate > 0 and capacity >= 1')
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        start = max(self._updated, self._paused_until)
+        if now > start:
+            self._tokens = min(self.capacity, self._tokens + (now - start) * self.rate)
+        self._updated = max(now, self._updated)
+
+    def time_until_available(self, now: float) -> float:
+        # Seconds until one token can be taken (0 means right now)
+        self._refill(now)
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self._tokens >= 1:
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def consume(self) -> None:
+        self._tokens -= 1
+
+    def pause(self, seconds: float, now: float) -> None:
+        # Retry-After: nothing goes out until the provider says so, then a single call is allowed and the
+        # bucket refills at its normal rate
+        self._refill(now)
+        self._paused_until = max(self._paused_until, now + seconds)
+        self._tokens = min(self._tokens, 1.0)
+
+
+class SchedulerStats:
+    def __init__(self, max_samples: int = 1000):
+        self.acquired = {p: 0 for p in RequestPriority}
+        self.wait_seconds_total = {p: 0.0 for p in RequestPriority}
+        self.wait_seconds_max = {p: 0.0 for p in RequestPriority}
+        self.recent_waits: dict[RequestPriority, deque] = {p: deque(maxlen=max_samples) for p in RequestPriority}
+        self.rate_limited_responses = 0
+        self.rejected = 0
+
+    def record_wait(self, priority: RequestPriority, waited: float) -> None:
+        self.acquired[priority] += 1
+        self.wait_seconds_total[priority] += waited
+        self.wait_seconds_max[priority] = max(self.wait_seconds_max[priority], waited)
+        self.recent_waits[priority].append(waited)
+
+
+class ProviderScheduler:
+    '''
+    Token bucket + priority queue in front of one provider.
+
+    acquire() blocks until the caller is at the head of the queue AND a token is available.
+    call() wraps acquire() and the upstream function, retrying after Retry-After on 429.
+    '''
+
+    def __init__(
+        self,
+        name: str,
+        rate_per_second: float,
+        capacity: float,
+        max_queue_wait_seconds: float = 10.0,
+        max_rate_limit_retries: int = 1,
+        default_retry_after_seconds: float = 5.0,
+    ):
+        self.name = name
+        self.max_queue_wait_seconds = max_queue_wait_seconds
+        self.max_rate_limit_retries = max_rate_limit_retries
+        self.default_retry_after_seconds = default_retry_after_seconds
+        self.stats = SchedulerStats()
+        self._bucket = TokenBucket(rate_per_second, capacity)
+        self._cond = threading.Condition()
+        self._queue: list[tuple[int, int]] = []
+        self._counter = itertools.count()
+
+    @property
+    def rate_per_second(self) -> float:
+        return self._bucket.rate
+
+    def queue_depth(self) -> int:
+        with self._cond:
+            return len(self._queue)
+
+    def acquired(self, priority: RequestPriority) -> int:
+        # Slots handed out so far at this priority (upstream calls made, retries included)
+        with self._cond:
+            return self.stats.acquired[priority]
+
+    def acquire(self, priority: RequestPriority = RequestPriority.INTERACTIVE, timeout: float | None = None) -> float:
+        '''
+        Wait for a slot. Returns the seconds spent in the queue.
+        Raises InfrastructureRateLimitedError if no slot is available within `timeout` seconds, or
+        InfrastructureDeadlineExceeded if the request deadline expires first.
+        '''
+        timeout = self.max_queue_wait_seconds if timeout is None else timeout
+        budget = remaining_seconds()
+        deadline_bound = budget is not None and budget < timeout
+        if deadline_bound:
+            timeout = max(0.0, budget)
+        start = time.monotonic()
+        limit = start + timeout
+        entry = (int(priority), next(self._counter))
+        with self._cond:
+            heapq.heappush(self._queue, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = None
+                    if self._queue[0] is entry:
+                        wait = self._bucket.time_until_available(now)
+                        if wait <= 0:
+                            heapq.heappop(self._queue)
+                            self._bucket.consume()
+                            waited = now - start
+                            self.stats.record_wait(priority, waited)
+                            self._cond.notify_all()  # the next one in line may also have a token
+                            return waited
+                        if now + wait > limit:
+                            # Don't hold the caller for nothing: it would not get a slot in time anyway
+                            raise self._no_slot_error(f'next slot in {wait:.2f}s', wait, deadline_bound)
+                    remaining = limit - now
+                    if remaining <= 0:
+                        raise self._no_slot_error(f'queue wait exceeded {timeout:.2f}s', wait, deadline_bound)
+                    self._cond.wait(remaining if wait is None else min(wait, remaining))
+            except BaseException:
+                self.stats.rejected += 1
+                if entry in self._queue:
+                    self._queue.remove(entry)
+                    heapq.heapify(self._queue)
+                    self._cond.notify_all()
+                raise
+
+    def _no_slot_error(self, reason: str, retry_after: float | None, deadline_bound: bool) -> Exception:
+        if deadline_bound:
+            return errors.InfrastructureDeadlineExceeded(f'{self.name}: request deadline reached while queued ({reason})')
+        return errors.InfrastructureRateLimitedError(f'{self.name} rate budget exhausted ({reason})', retry_after=retry_after)
+
+    def penalize(self, retry_after: float | None) -> float:
+        # Called when the provider answered 429 anyway. Pauses every caller of this provider.
+        seconds = self.default_retry_after_seconds if retry_after is None else max(0.0, retry_after)
+        with self._cond:
+            self.stats.rate_limited_responses += 1
+            self._bucket.pause(seconds, time.monotonic())
+            self._cond.notify_all()
+        return seconds
+
+    def call(
+        self,
+        fn: Callable[[], T],
+        priority: RequestPriority = RequestPriority.INTERACTIVE,
+        timeout: float | None = None,
+    ) -> T:
+        attempt = 0
+        while True:
+            self.acquire(priority, timeout)
+            try:
+                return fn()
+            except errors.InfrastructureRateLimitedError as e:
+                self.penalize(e.retry_after)
+                if attempt >= self.max_rate_limit_retries:
+                    raise
+                attempt += 1
+                # loop: acquire() will now wait for the Retry-After pause (or give up if it is too long)
+
+    def snapshot(self) -> dict:
+        # Plain dict with the scheduler metrics (queue depth, waits per priority, 429s)
+        with self._cond:
+            result = {
+                'provider': self.name,
+                'queue_depth': len(self._queue),
+                'rate_limited_responses': self.stats.rate_limited_responses,
+                'rejected': self.stats.rejected,
+                'priorities': {},
+            }
+            for p in RequestPriority:
+                waits = sorted(self.stats.recent_waits[p])
+                acquired = self.stats.acquired[p]
+                result['priorities'][p.name.lower()] = {
+                    'acquired': acquired,
+                    'wait_seconds_total': self.stats.wait_seconds_total[p],
+                    'wait_seconds_max': self.stats.wait_seconds_max[p],
+                    'wait_seconds_mean': self.stats.wait_seconds_total[p] / acquired if acquired else 0.0,
+                    'wait_seconds_p95': waits[int(0.95 * (len(waits) - 1))] if waits else 0.0,
+                }
+            return result
+
+
+# -------- Per-provider schedulers -------- #
+# Limits can be tuned per plan through env vars, e.g. COINGECKO_RATE_LIMIT_PER_MINUTE=500 for a paid plan.
+
+def _build_scheduler(provider: Provider, default_per_minute: float, default_burst: float) -> ProviderScheduler:
+    prefix = provider.name
+    per_minute = float(os.getenv(f'{prefix}_RATE_LIMIT_PER_MINUTE', default_per_minute))
+    burst = float(os.getenv(f'{prefix}_RATE_BURST', default_burst))
+    max_wait = float(os.getenv(f'{prefix}_MAX_QUEUE_WAIT_SECONDS', 10.0))
+    return ProviderScheduler(provider.value, per_minute / 60.0, burst, max_queue_wait_seconds=max_wait)
+
+
+PROVIDER_SCHEDULERS: dict[Provider, ProviderScheduler] = {
+    Provider.COINGECKO: _build_scheduler(Provider.COINGECKO, default_per_minute=30, default_burst=5),
+    Provider.BINANCE:   _build_scheduler(Provider.BINANCE, default_per_minute=600, default_burst=20),
+    Provider.KRAKEN:    _build_scheduler(Provider.KRAKEN, default_per_minute=60, default_burst=10),
+}
+
+
+def get_provider_scheduler(provider: Provider) -> ProviderScheduler:
+    try:
+        return PROVIDER_SCHEDULERS[provider]
+    except KeyError:
+        raise errors.InfrastructureProviderNotCompatibleError(f'No scheduler configured for Provider: {provider}')
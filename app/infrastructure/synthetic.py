@@ -0,0 +1,134 @@
+import os
+import time
+import zlib
+from datetime import datetime
+
+import numpy as np
+
+from app.domain.entities import Symbol, Currency, Provider, MarketChartData, PricePointSeries
+from app.infrastructure import errors
+from app.infrastructure.scheduler import RequestPriority
+from app.infrastructure.adapters import ProviderAdapter
+from app.observability.metrics import stage
+
+# Synthetic provider: deterministic price paths of any length, to stress the pipeline far beyond real series sizes.
+#
+# Model: geometric Brownian motion with Poisson jumps (Merton), sampled every SYNTHETIC_INTERVAL_SECONDS and ending
+# "now". The path only depends on (SYNTHETIC_SEED, symbol, currency, number of points): same request, same prices.
+# The series is generated with numpy and returned as a PricePointSeries (two arrays, no PricePoint objects), so 10M
+# points take a few hundred ms. It goes through the usual adapter path (cache, fetch stage, analytics...), without
+# scheduler or circuit breaker since there is no upstream.
+
+SYNTHETIC_INTERVAL_SECONDS = int(os.getenv('SYNTHETIC_INTERVAL_SECONDS', 300))
+SYNTHETIC_SEED = int(os.getenv('SYNTHETIC_SEED', 0))
+SYNTHETIC_MAX_POINTS = int(os.getenv('SYNTHETIC_MAX_POINTS', 50_000_000))  # 800 MB of arrays
+
+SECONDS_PER_YEAR = 365.25 * 86_400
+
+SYNTHETIC_START_PRICES = {Symbol.BTC: 30_000.0, Symbol.ETH: 2_000.0, Symbol.XRP: 0.5}  # in USD
+SYNTHETIC_FX = {Currency.USD: 1.0, Currency.EUR: 0.92, Currency.GBP: 0.79, Currency.AUD: 1.5,
+                Currency.CHF: 0.88, Currency.JPY: 150.0}
+
+
+def synthetic_price_path(
+    n: int,
+    interval_seconds: float,
+    rng: np.random.Generator,
+    start_price: float = 100.0,
+    drift: float = 0.05,             # annual
+    volatility: float = 0.6,         # annual, crypto-like
+    jump_intensity: float = 12.0,    # expected jumps per year
+    jump_mean: float = -0.01,        # mean log jump size
+    jump_std: float = 0.05,
+) -> np.ndarray:
+    # log S_t+1 - log S_t = (mu - sigma^2/2) dt + sigma sqrt(dt) Z + sum of the jumps of the step
+    dt = interval_seconds / SECONDS_PER_YEAR
+    log_returns = rng.standard_normal(n)
+    log_returns *= volatility * np.sqrt(dt)
+    log_returns += (drift - 0.5 * volatility ** 2) * dt
+    # Jump count of the whole path, then random steps for them: no per-step draw (intensity * dt << 1)
+    jumps = rng.integers(0, n, rng.poisson(jump_intensity * dt * n))
+    np.add.at(log_returns, jumps, rng.normal(jump_mean, jump_std, len(jumps)))
+    log_returns[0] = 0.0  # the path starts at start_price
+    np.cumsum(log_returns, out=log_returns)
+    np.exp(log_returns, out=log_returns)
+    log_returns *= start_price
+    return log_returns
+
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _utc_offset_s(utc_s: int) -> int:
+    # Local UTC offset at that instant, as datetime.fromtimestamp applies it
+    return int((datetime.fromtimestamp(utc_s) - _EPOCH).total_seconds()) - utc_s
+
+
+def _offset_changes(first_s: int, last_s: int, step_s: int = 86_400) -> list[tuple[int, int]]:
+    # (instant, offset from then on) of every change of the local UTC offset in [first_s, last_s] (DST, zone rules).
+    # Offsets are read once a day, each change is then located to the second by bisection
+    changes = []
+    previous_s, previous = first_s, _utc_offset_s(first_s)
+    while previous_s < last_s:
+        probe_s = min(previous_s + step_s, last_s)
+        offset = _utc_offset_s(probe_s)
+        if offset != previous:
+            lo, hi = previous_s, probe_s  # offset(lo) == previous, offset(hi) != previous
+            while hi - lo > 1:
+                mid = (lo + hi) // 2
+                if _utc_offset_s(mid) == previous:
+                    lo = mid
+                else:
+                    hi = mid
+            changes.append((hi, _utc_offset_s(hi)))
+            previous = changes[-1][1]
+            probe_s = hi
+        previous_s = probe_s
+    return changes
+
+
+def synthetic_timestamps(n: int, interval_seconds: int, now_s: float) -> np.ndarray:
+    # n regular timestamps ending at the last interval boundary before now, as local naive datetime64[ns] (like the
+    # datetime.fromtimestamp values of the other providers): each one gets the UTC offset of its own instant, so
+    # series crossing a DST change have the same wall-clock jump as the real ones
+    end_s = int(now_s) // interval_seconds * interval_seconds
+    first_s = end_s - (n - 1) * interval_seconds
+    timestamps = np.arange(n, dtype=np.int64)
+    timestamps *= interval_seconds * 1_000_000_000
+    timestamps += (first_s + _utc_offset_s(first_s)) * 1_000_000_000
+    previous = _utc_offset_s(first_s)
+    for change_s, offset in _offset_changes(first_s, end_s):
+        # first timestamp at or after the change
+        timestamps[-(-(change_s - first_s) // interval_seconds):] += (offset - previous) * 1_000_000_000
+        previous = offset
+    return timestamps.view('datetime64[ns]')
+
+
+class SyntheticAdapter(ProviderAdapter):
+    provider = Provider.SYNTHETIC
+
+    def __init__(self, interval_seconds: int = SYNTHETIC_INTERVAL_SECONDS, seed: int = SYNTHETIC_SEED,
+                 max_points: int = SYNTHETIC_MAX_POINTS):
+        super().__init__()
+        self.interval_seconds = interval_seconds
+        self.seed = seed
+        self.max_points = max_points
+
+    def supports(self, sym: Symbol, curr: Currency) -> bool:
+        return sym in SYNTHETIC_START_PRICES and curr in SYNTHETIC_FX
+
+    def fetch_market_chart(self, sym: Symbol, curr: Currency, days: int, priority: RequestPriority) -> MarketChartData:
+        if not self.supports(sym, curr):
+            raise errors.InfrastructureProviderNotCompatibleError(f'Pair {sym}/{curr} not supported by Provider: {self.provider}')
+        n = int(days * 86_400 // self.interval_seconds) + 1
+        if n > self.max_points:
+            raise errors.InfrastructureProviderNotCompatibleError(
+                f'{days} days at {self.interval_seconds}s are {n} points, over the synthetic limit of {self.max_points}')
+        if days * 86_400 > (time.time() + 9.2e9):  # datetime64[ns] can't go before 1677
+            raise errors.InfrastructureProviderNotCompatibleError(f'{days} days of history go beyond the year 1677')
+
+        with stage('upstream', self.provider.value):  # generation replaces the provider call
+            rng = np.random.default_rng([self.seed, zlib.crc32(sym.value.encode()), zlib.crc32(curr.value.encode())])
+            prices = synthetic_price_path(n, self.interval_seconds, rng, SYNTHETIC_START_PRICES[sym] * SYNTHETIC_FX[curr])
+            timestamps = synthetic_timestamps(n, self.interval_seconds, time.time())
+        return MarketChartData(sym, curr, PricePointSeries(timestamps, prices))
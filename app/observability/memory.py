@@ -0,0 +1,93 @@
+import os
+import threading
+import tracemalloc
+
+# Optional per-stage memory accounting (MEMORY_TRACKING_ENABLED, off by default: tracemalloc slows every allocation).
+#
+# tracemalloc only has ONE process-wide peak. To still get the peak of each stage, every stage enter/exit closes an
+# interval: the tracker reads the peak of the interval, resets it, and credits it to every stage active during the
+# interval. A stage's peak is then the max over the intervals it overlapped -> exact for nested stages, and an upper
+# bound (memory of the whole process) when several requests run at once.
+# RSS (/proc/self/statm) is read on the same events: what the OS sees, including numpy / matplotlib native buffers.
+
+MEMORY_TRACKING_ENABLED = os.getenv('MEMORY_TRACKING_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+MEMORY_LOG_THRESHOLD_BYTES = int(os.getenv('MEMORY_LOG_THRESHOLD_BYTES', 256 * 1024 * 1024))
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def rss_bytes() -> int:
+    # Current resident set size, 0 where /proc is not available
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+class StageMemory:
+    __slots__ = ('traced_start', 'rss_start', 'peak', 'retained', 'rss_delta')
+
+    def __init__(self, traced_start: int, rss_start: int):
+        self.traced_start = traced_start
+        self.rss_start = rss_start
+        self.peak = traced_start      # absolute traced peak seen while the stage was active
+        self.retained = 0             # traced bytes still allocated at the end of the stage
+        self.rss_delta = 0
+
+    @property
+    def peak_bytes(self) -> int:
+        # Peak allocated ON TOP of what was allocated when the stage started
+        return max(0, self.peak - self.traced_start)
+
+
+class MemoryTracker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active: set[StageMemory] = set()
+
+    @staticmethod
+    def start() -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(1)  # one frame per allocation: the cheapest setting
+
+    def _close_interval(self) -> int:
+        # Called under the lock: credit the interval peak to the active stages, return the current traced size
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        for stage_memory in self._active:
+            if peak > stage_memory.peak:
+                stage_memory.peak = peak
+        return current
+
+    def enter(self) -> StageMemory | None:
+        if not tracemalloc.is_tracing():
+            return None
+        with self._lock:
+            current = self._close_interval()
+            stage_memory = StageMemory(current, rss_bytes())
+            self._active.add(stage_memory)
+        return stage_memory
+
+    def exit(self, stage_memory: StageMemory) -> StageMemory:
+        with self._lock:
+            current = self._close_interval()
+            self._active.discard(stage_memory)
+        stage_memory.retained = max(0, current - stage_memory.traced_start)
+        stage_memory.rss_delta = rss_bytes() - stage_memory.rss_start
+        return stage_memory
+
+
+MEMORY_TRACKER = MemoryTracker()
+
+
+def days_class(days: str | int | None) -> str:
+    # Parameter class used as metric label: the history length drives the series size
+    try:
+        days = int(days)
+    except (TypeError, ValueError):
+        return ''
+    for limit in (1, 30, 90, 365):
+        if days <= limit:
+            return f'<={limit}d'
+    return '>365d'
@@ -0,0 +1,246 @@
+import bisect
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator
+
+from app.observability.memory import MEMORY_TRACKER, MEMORY_LOG_THRESHOLD_BYTES, StageMemory
+
+# Minimal Prometheus metrics (text exposition format 0.0.4), no client library needed.
+#
+# Stage timings: code wraps each pipeline stage in `with stage('clean', provider='coingecko'):`. Inside an HTTP request
+# the observation is buffered in the request context and flushed by the API middleware once the route template is
+# known, so every histogram sample carries route + provider + stage labels. Outside a request (prefetch, background
+# refresh) samples are recorded right away with route="background".
+# When memory tracking is on (app/observability/memory.py) the same timer records the peak / retained bytes of the
+# stage, labelled with the `days` class of the request, and requests above MEMORY_LOG_THRESHOLD_BYTES are logged.
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MEMORY_BUCKETS = tuple(float(2 ** exponent) for exponent in range(20, 33, 2))  # 1 MiB ... 4 GiB
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = '') -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name, self.help, self.labelnames = name, help, labelnames
+        self._lock = threading.Lock()
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        with self._lock:
+            return self._values.get(labels, 0.0)
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, labelnames
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._series: dict[tuple[str, ...], list] = {}  # labels -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)  # first bucket with le >= value
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, *labels: str) -> int:
+        with self._lock:
+            series = self._series.get(labels)
+            return series[-1] if series else 0
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+        for labels, series in sorted(snapshot.items()):
+            cumulative = 0
+            for le, bucket_count in zip(self.buckets, series):
+                cumulative += bucket_count
+                le_label = f'le="{le}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, labels, le_label)} {cumulative}')
+            inf_label = 'le="+Inf"'
+            lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, labels, inf_label)} {series[-1]}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(series[-2])}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, labels)} {series[-1]}')
+        return lines
+
+
+# A collector returns already formatted samples for values that live elsewhere (cache stats, scheduler queues...):
+# (metric name, type, help, [(labels dict, value)])
+Sample = tuple[str, str, str, list[tuple[dict[str, str], float]]]
+Collector = Callable[[], list[Sample]]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: list[Counter | Histogram] = []
+        self._collectors: list[Collector] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Collector) -> Collector:
+        with self._lock:
+            self._collectors.append(collector)
+        return collector
+
+    def render(self, extra_collectors: tuple[Collector, ...] = ()) -> str:
+        with self._lock:
+            metrics, collectors = list(self._metrics), list(self._collectors)
+        lines: list[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        for collector in (*collectors, *extra_collectors):
+            for name, kind, help, samples in collector():
+                lines.append(f'# HELP {name} {help}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in samples:
+                    names = tuple(labels)
+                    lines.append(f'{name}{_format_labels(names, tuple(labels[n] for n in names))} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'crypto_stage_duration_seconds', 'Duration of each pipeline stage.', ('route', 'provider', 'stage')))
+HTTP_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'crypto_http_request_duration_seconds', 'End to end duration of HTTP requests.', ('route', 'method', 'status')))
+UPSTREAM_RESPONSES = REGISTRY.register(Counter(
+    'crypto_upstream_responses_total', 'Upstream provider answers by status code (or timeout / error).', ('provider', 'status')))
+STAGE_MEMORY_PEAK_BYTES = REGISTRY.register(Histogram(
+    'crypto_stage_memory_peak_bytes', 'Peak traced memory allocated during each pipeline stage.',
+    ('route', 'provider', 'stage', 'days_class'), buckets=MEMORY_BUCKETS))
+STAGE_MEMORY_RETAINED_BYTES = REGISTRY.register(Histogram(
+    'crypto_stage_memory_retained_bytes', 'Traced memory still allocated at the end of each pipeline stage.',
+    ('route', 'provider', 'stage', 'days_class'), buckets=MEMORY_BUCKETS))
+MEMORY_HEAVY_REQUESTS = REGISTRY.register(Counter(
+    'crypto_memory_heavy_requests_total', 'Requests whose stage peak went over MEMORY_LOG_THRESHOLD_BYTES.', ('route',)))
+
+
+# -------- Stage timers -------- #
+
+class RequestMetrics:
+    # Per-request buffer of stage samples, flushed with the route label at the end of the request
+    __slots__ = ('provider', 'days_class', 'query', 'samples', 'memory', '_lock')
+
+    def __init__(self, provider: str = '', days_class: str = '', query: str = ''):
+        self.provider = provider
+        self.days_class = days_class
+        self.query = query  # only used to identify memory heavy requests in the logs
+        self.samples: list[tuple[str, str, float]] = []  # (provider, stage, seconds)
+        self.memory: list[tuple[str, str, StageMemory]] = []  # (provider, stage, memory)
+        self._lock = threading.Lock()  # stages of one request can run in several threads (chunks, hedging)
+
+    def add(self, provider: str, stage_name: str, seconds: float) -> None:
+        with self._lock:
+            self.samples.append((provider, stage_name, seconds))
+
+    def add_memory(self, provider: str, stage_name: str, stage_memory: StageMemory) -> None:
+        with self._lock:
+            self.memory.append((provider, stage_name, stage_memory))
+
+    def flush(self, route: str) -> None:
+        with self._lock:
+            samples, self.samples = self.samples, []
+            memory, self.memory = self.memory, []
+        for provider, stage_name, seconds in samples:
+            STAGE_SECONDS.observe(seconds, route, provider or self.provider, stage_name)
+        for provider, stage_name, stage_memory in memory:
+            _observe_stage_memory(stage_memory, route, provider or self.provider, stage_name, self.days_class)
+        peak = max((m.peak_bytes for _, _, m in memory), default=0)
+        if peak > MEMORY_LOG_THRESHOLD_BYTES:
+            MEMORY_HEAVY_REQUESTS.inc(route)
+            stages = ', '.join(f'{name}={m.peak_bytes / 2**20:.1f}MiB' for _, name, m in memory)
+            logger.warning('memory heavy request %s?%s: peak %.1f MiB (%s)', route, self.query, peak / 2**20, stages)
+
+
+def _observe_stage_memory(stage_memory: StageMemory, route: str, provider: str, stage_name: str, days_class: str) -> None:
+    STAGE_MEMORY_PEAK_BYTES.observe(stage_memory.peak_bytes, route, provider, stage_name, days_class)
+    STAGE_MEMORY_RETAINED_BYTES.observe(stage_memory.retained, route, provider, stage_name, days_class)
+
+
+_REQUEST_METRICS: ContextVar[RequestMetrics | None] = ContextVar('request_metrics', default=None)
+
+
+@contextmanager
+def request_metrics_scope(request_metrics: RequestMetrics) -> Iterator[RequestMetrics]:
+    token = _REQUEST_METRICS.set(request_metrics)
+    try:
+        yield request_metrics
+    finally:
+        _REQUEST_METRICS.reset(token)
+
+
+def record_stage(stage_name: str, seconds: float, provider: str = '') -> None:
+    request_metrics = _REQUEST_METRICS.get()
+    if request_metrics is None:
+        STAGE_SECONDS.observe(seconds, 'background', provider, stage_name)
+    else:
+        request_metrics.add(provider, stage_name, seconds)
+
+
+def record_stage_memory(stage_name: str, stage_memory: StageMemory, provider: str = '') -> None:
+    request_metrics = _REQUEST_METRICS.get()
+    if request_metrics is None:
+        _observe_stage_memory(stage_memory, 'background', provider, stage_name, '')
+    else:
+        request_metrics.add_memory(provider, stage_name, stage_memory)
+
+
+@contextmanager
+def stage(stage_name: str, provider: str = '') -> Iterator[None]:
+    # Times the block, also when it raises (a slow failing stage is still a slow stage)
+    start = time.perf_counter()
+    stage_memory = MEMORY_TRACKER.enter()  # None unless memory tracking is on
+    try:
+        yield
+    finally:
+        record_stage(stage_name, time.perf_counter() - start, provider)
+        if stage_memory is not None:
+            record_stage_memory(stage_name, MEMORY_TRACKER.exit(stage_memory), provider)
+
+
+def record_upstream_status(provider: str, status: int | str) -> None:
+    UPSTREAM_RESPONSES.inc(provider, str(status))
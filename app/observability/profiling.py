@@ -0,0 +1,164 @@
+import cProfile
+import io
+import os
+import pstats
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter as StackCounter
+
+# Per-request profiling.
+# A RequestProfiler runs the code of ONE request under two profilers at once:
+#   - cProfile (deterministic): exact call counts and own/cumulative time per function -> top functions
+#   - a stack sampler: a side thread that snapshots the request thread's stack every few ms -> collapsed stacks
+#     ("a;b;c 12", the input format of flamegraph.pl / speedscope) and an indented call tree with sample counts
+# Reports are written to PROFILE_DIR/<profile id>/. Only the request thread is profiled: work fanned out to other
+# threads (range chunks, hedged calls) shows up as time spent waiting.
+
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'crypto-profiles'))
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', 20))
+PROFILE_SAMPLE_INTERVAL_SECONDS = float(os.getenv('PROFILE_SAMPLE_INTERVAL_SECONDS', 0.002))
+
+PROFILE_ARTIFACTS = {
+    'summary':   'summary.txt',       # top functions (cProfile)
+    'tree':      'tree.txt',          # call tree (sampled)
+    'collapsed': 'stacks.collapsed',  # flamegraph input (sampled)
+    'pstats':    'profile.pstats',    # raw cProfile dump (snakeviz, pstats)
+}
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return f'{module}:{getattr(code, "co_qualname", code.co_name)}'.replace(';', ',').replace(' ', '_')
+
+
+class StackSampler:
+    # Samples the stack of one thread at a fixed interval from a daemon thread
+
+    def __init__(self, thread_id: int, interval_seconds: float = PROFILE_SAMPLE_INTERVAL_SECONDS):
+        self.thread_id = thread_id
+        self.interval_seconds = interval_seconds
+        self.stacks: StackCounter = StackCounter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self) -> str:
+        return ''.join(f'{stack} {count}\n' for stack, count in sorted(self.stacks.items()))
+
+    def call_tree(self, min_share: float = 0.01) -> str:
+        # Indented tree with the number (and share) of samples spent in each node and its children
+        root: dict = {}
+        for stack, count in self.stacks.items():
+            node = root
+            for label in stack.split(';'):
+                entry = node.setdefault(label, [0, {}])
+                entry[0] += count
+                node = entry[1]
+        total = max(1, self.samples)
+        lines = [f'{self.samples} samples, {self.interval_seconds * 1000:.1f} ms interval']
+
+        def walk(node: dict, depth: int) -> None:
+            for label, (count, children) in sorted(node.items(), key=lambda item: -item[1][0]):
+                if count / total < min_share:
+                    continue
+                lines.append(f'{"  " * depth}{count:6d} {100 * count / total:5.1f}%  {label}')
+                walk(children, depth + 1)
+
+        walk(root, 0)
+        return '\n'.join(lines) + '\n'
+
+
+class RequestProfiler:
+    '''
+    Context manager profiling the code run in its block (current thread only). On exit the reports are written to
+    PROFILE_DIR/<profile_id>/ and `report_dir` is set.
+    '''
+
+    def __init__(self, label: str = '', profile_dir: str | None = None, keep: int | None = None):
+        self.label = label
+        self.profile_dir = profile_dir or PROFILE_DIR
+        self.keep = PROFILE_KEEP if keep is None else keep
+        self.profile_id = f'{time.strftime("%Y%m%dT%H%M%S")}-{uuid.uuid4().hex[:8]}'
+        self.report_dir: str | None = None
+        self.wall_seconds = 0.0
+        self._profile = cProfile.Profile()
+        self._sampler: StackSampler | None = None
+        self._start = 0.0
+
+    def __enter__(self) -> 'RequestProfiler':
+        self._sampler = StackSampler(threading.get_ident())
+        self._start = time.perf_counter()
+        self._sampler.start()
+        self._profile.enable()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._profile.disable()
+        self._sampler.stop()
+        self.wall_seconds = time.perf_counter() - self._start
+        self._write_reports()
+
+    def _write_reports(self) -> None:
+        report_dir = os.path.join(self.profile_dir, self.profile_id)
+        os.makedirs(report_dir, exist_ok=True)
+
+        summary = io.StringIO()
+        summary.write(f'{self.label}\nwall time: {self.wall_seconds * 1000:.1f} ms\n\n')
+        stats = pstats.Stats(self._profile, stream=summary)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(30)
+        stats.sort_stats(pstats.SortKey.TIME).print_stats(15)
+        stats.dump_stats(os.path.join(report_dir, PROFILE_ARTIFACTS['pstats']))
+
+        files = {
+            'summary': summary.getvalue(),
+            'tree': self._sampler.call_tree(),
+            'collapsed': self._sampler.collapsed(),
+        }
+        for artifact, content in files.items():
+            with open(os.path.join(report_dir, PROFILE_ARTIFACTS[artifact]), 'w', encoding='utf-8') as f:
+                f.write(content)
+        self.report_dir = report_dir
+        _prune_old_reports(self.profile_dir, self.keep)
+
+
+def _prune_old_reports(profile_dir: str, keep: int) -> None:
+    try:
+        reports = [entry for entry in os.scandir(profile_dir) if entry.is_dir()]
+    except OSError:
+        return
+    reports.sort(key=lambda entry: entry.stat().st_mtime_ns)  # oldest first
+    for old in reports[:-keep] if keep > 0 else []:
+        shutil.rmtree(old.path, ignore_errors=True)
+
+
+def profile_report_path(profile_id: str, artifact: str, profile_dir: str | None = None) -> str | None:
+    # Path of a stored artifact, None if unknown. The id is checked so it can't be used to escape PROFILE_DIR
+    filename = PROFILE_ARTIFACTS.get(artifact)
+    if filename is None or not profile_id or os.path.basename(profile_id) != profile_id or profile_id.startswith('.'):
+        return None
+    path = os.path.join(profile_dir or PROFILE_DIR, profile_id, filename)
+    return path if os.path.isfile(path) else None
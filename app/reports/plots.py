@@ -60,6 +60,7 @@ def plot_enriched_price(
     provider: Provider | None = None,
     price_key: str = "price",
     resample_frequency: ResampleFrequency | None = None,
+    df_resampled: pd.DataFrame | None = None,
 ) -> None:
     """
     Enriched plot in a single PNG.
@@ -77,6 +78,9 @@ def plot_enriched_price(
       - Subplot 3: normalized + volatility (2nd Y axis)
 
     NOTE: Price is plotted ONLY in the first subplot.
+
+    df_resampled: the series already resampled at resample_frequency, if the caller has it (e.g. df itself when it
+    was resampled by compute_enriched_market_chart): the overlay is then drawn without resampling again.
     """
     df = df.copy()
     df["timestamp"] = pd.to_datetime(df["timestamp"])
@@ -98,8 +102,9 @@ def plot_enriched_price(
     )
 
     # Optional resampled series just for visualization (doesn't touch df)
-    df_resampled: pd.DataFrame | None = None
-    if resample_frequency is not None:
+    if resample_frequency is None:
+        df_resampled = None
+    elif df_resampled is None:
         df_resampled = resample_price_series(
             df[["timestamp", price_key]].copy(),
             price_key,
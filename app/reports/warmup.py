@@ -0,0 +1,60 @@
+import io
+import logging
+import os
+import threading
+import time
+
+# Background warm-up of the plotting stack.
+#
+# pandas and matplotlib are not imported at startup (see app/domain/services.py and the plot route): the process
+# starts answering sooner, which is what matters when new instances are added under load. The first analytics or plot
+# request would then pay for the imports, the font cache and the first Agg draw (~1s). With WARMUP_ENABLED the
+# lifespan does that work in a daemon thread right after startup, so the process is ready first and warm shortly after.
+
+logger = logging.getLogger(__name__)
+
+WARMUP_ENABLED = os.getenv('WARMUP_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+
+
+def warm_up_plotting() -> dict[str, float]:
+    # Returns the seconds spent in each step (a step is ~0 when already done, e.g. by a request)
+    timings = {}
+    start = time.perf_counter()
+    import app.services.analytics  # noqa: F401  pandas
+    timings['import_pandas'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    import matplotlib.pyplot as plt
+    import app.reports.plots  # noqa: F401
+    timings['import_matplotlib'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    from matplotlib import font_manager
+    font_manager.findfont(font_manager.FontProperties())  # loads (or builds, on a fresh container) the font cache
+    timings['font_cache'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fig, ax = plt.subplots(figsize=(2, 1))
+    ax.plot([0, 1], [0, 1], label='warm-up')
+    ax.set_title('warm-up')
+    ax.legend()
+    fig.savefig(io.BytesIO(), format='png', dpi=50)  # first Agg draw: text layout, png writer
+    plt.close(fig)
+    timings['first_draw'] = time.perf_counter() - start
+    return timings
+
+
+def _run_warm_up() -> None:
+    try:
+        timings = warm_up_plotting()
+    except Exception:
+        logger.exception('plotting warm-up failed')  # the first plot request will just be slower
+        return
+    logger.info('plotting warm-up done in %.3fs (%s)', sum(timings.values()),
+                ', '.join(f'{step} {seconds:.3f}s' for step, seconds in timings.items()))
+
+
+def start_background_warm_up() -> threading.Thread:
+    thread = threading.Thread(target=_run_warm_up, name='plotting-warm-up', daemon=True)
+    thread.start()
+    return thread
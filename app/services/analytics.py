@@ -1,6 +1,11 @@
-from app.domain.entities import MarketChartData, PANDAS_RESAMPLING_RULES, ResampleFrequency
+from app.domain.entities import MarketChartData, PricePointSeries, PANDAS_RESAMPLING_RULES, ResampleFrequency
+from app.services.indicators import BOLLINGER_K, IndicatorEngine
+from app.services.resampling import OHLCBars, resample_ohlc
+from app.services.stats import calculate_price_stats
+import numpy as np
 import pandas as pd
 from datetime import datetime
+from typing import Iterable
 
 #Analytics layer services
 
@@ -24,6 +29,9 @@ def _validate_numeric_series(df: pd.DataFrame, column: str) -> pd.Series:
     return series
 
 def convert_market_chart_data_to_dataframe(marketchartdata: MarketChartData) -> pd.DataFrame:
+    if isinstance(marketchartdata.points, PricePointSeries):
+        # Array backed series: no PricePoint objects at all
+        return pd.DataFrame({'timestamp': marketchartdata.points.timestamps, 'price': marketchartdata.points.prices})
     data = {
         'timestamp'  : [p.timestamp for p in marketchartdata.points],
         'price'     : [p.price for p in marketchartdata.points]
@@ -37,21 +45,8 @@ def calculate_stats(df: pd.DataFrame, stats_key: str) -> dict:
     Compute basic statistics for a numeric column in a price DataFrame.
     """
     series = _validate_numeric_series(df, stats_key)
-    
-    result_dic = {
-        "count": int(series.count()),
-        "min_price": float(series.min()),
-        "max_price": float(series.max()),
-        "mean_price": float(series.mean()),
-        "median_price": float(series.median()),
-        "std_dev": float(series.std()),
-        "variance": float(series.var()),
-        "first_price": float(series.iloc[0]),
-        "last_price": float(series.iloc[-1]),
-        "percent_change": float((series.iloc[-1] - series.iloc[0]) / series.iloc[0] * 100),
-    }
-    
-    return result_dic
+    # Same engine as /stats (app/services/stats.py): one pass over the values + selection for the median
+    return calculate_price_stats(series.to_numpy(dtype='float64'))
 
 def compute_returns (df: pd.DataFrame, stats_key: str) -> None:
     series = _validate_numeric_series(df, stats_key)
@@ -59,43 +54,147 @@ def compute_returns (df: pd.DataFrame, stats_key: str) -> None:
     df['acum_pct_change'] = (series - series.iloc[0]) / series.iloc[0] * 100
     #no return, it adds columns to the df
 
-def compute_rolling_window(df: pd.DataFrame, window_size: int, stats_key: str) -> None:    
-    series = _validate_numeric_series(df, stats_key)
+def parse_window(window: int | str) -> int | np.timedelta64:
+    # A number of prices (20, "20") or a duration in pandas notation ("7D", "12h", "30min")
+    if isinstance(window, str) and window.strip().isdigit():
+        window = int(window)
+    if isinstance(window, int):
+        return window
+    try:
+        duration = pd.Timedelta(window)
+    except (TypeError, ValueError):
+        raise ValueError(f'Invalid window {window!r}: expected a number of points or a duration such as "7D"')
+    if duration <= pd.Timedelta(0):
+        raise ValueError(f'Window duration must be positive. Got {window!r}')
+    return np.timedelta64(duration.value, 'ns')
+
+def _as_windows(window_size: int | str | Iterable[int | str]) -> list[int | str]:
+    # One window or several (e.g. 5, 10, 20, 50, 200 or "7D", "30D"), duplicates removed, order kept
+    windows = [window_size] if isinstance(window_size, (int, str)) else list(dict.fromkeys(window_size))
+    if not windows:
+        raise ValueError('At least one window size is required')
+    return windows
+
+def compute_rolling_window(df: pd.DataFrame, window_size: int | str | Iterable[int | str], stats_key: str) -> None:    
+    compute_indicators(df, stats_key, rolling_windows=_as_windows(window_size))
+    #no return, it adds one column per window to the df
+
+def compute_rolling_extrema(df: pd.DataFrame, window_size: int | str | Iterable[int | str], stats_key: str) -> None:
+    compute_indicators(df, stats_key, extrema_windows=_as_windows(window_size))
+    #no return, it adds rolling_max_{w} and rolling_min_{w} columns to the df
+
+def compute_indicators(
+    df: pd.DataFrame,
+    price_key: str,
+    rolling_windows: Iterable[int | str] = (),
+    volatility_windows: Iterable[int | str] = (),
+    ema_spans: Iterable[int] = (),
+    bollinger_windows: Iterable[int | str] = (),
+    rsi_periods: Iterable[int] = (),
+    macd: bool = False,
+    bollinger_k: float = BOLLINGER_K,
+    extrema_windows: Iterable[int | str] = (),
+    drawdown_windows: Iterable[int | str] = (),
+    donchian_windows: Iterable[int | str] = (),
+) -> None:
+    """
+    Every indicator asked, on the NumPy engine of app/services/indicators.py: the rolling moments of all the windows
+    (rolling means, Bollinger bands) come from one pass over the prices, those of the volatility windows from one pass
+    over the returns, MACD reuses the EMAs of ema_spans and the rolling extrema are shared by drawdowns and Donchian
+    channels. Windows are a number of rows or a duration ("7D", see parse_window). Columns:
+    rolling_mean_{w}, volatility_{w}, ema_{span}, bollinger_{lower|middle|upper}_{w}, rsi_{period}, macd,
+    macd_signal, macd_hist, rolling_max_{w}, rolling_min_{w}, drawdown_{w}, donchian_{lower|middle|upper}_{w}.
+    """
+    series = _validate_numeric_series(df, price_key)
+    windows = {
+        kind: {str(w): parse_window(w) for w in specs}
+        for kind, specs in (('rolling', rolling_windows), ('volatility', volatility_windows),
+                            ('bollinger', bollinger_windows), ('extrema', extrema_windows),
+                            ('drawdown', drawdown_windows), ('donchian', donchian_windows))
+    }
     
     #window size must be >0 and less than length of series
-    if window_size <=0:
-        raise ValueError('window_size must be a positive integer')
-    if window_size > len(series):
-        raise ValueError('window_size cannot be larger than the number of data points in the DataFrame')
-    
-    df[f'rolling_mean_{window_size}'] = series.rolling(window=window_size).mean()
-    #no return, it adds column to the df
+    timestamps = None
+    for kind, parsed in windows.items():
+        for window_size in parsed.values():
+            if isinstance(window_size, np.timedelta64):
+                timestamps = df['timestamp'].to_numpy(dtype='datetime64[ns]')
+            elif window_size <= 0:
+                raise ValueError('window_size must be a positive integer')
+            elif kind != 'volatility' and window_size > len(series):
+                raise ValueError('window_size cannot be larger than the number of data points in the DataFrame')
+    if timestamps is not None and len(timestamps) > 1 and np.any(timestamps[1:] < timestamps[:-1]):
+        raise ValueError('Time windows need rows sorted by timestamp')
+
+    columns = {}
+    prices = IndicatorEngine(series.to_numpy(dtype='float64'), timestamps)
+    prices.rolling(list(windows['rolling'].values()) + list(windows['bollinger'].values()))
+    for label, window_size in windows['rolling'].items():
+        columns[f'rolling_mean_{label}'] = prices.rolling_mean(window_size)
+    for label, window_size in windows['bollinger'].items():
+        lower, middle, upper = prices.bollinger_bands(window_size, bollinger_k)
+        columns[f'bollinger_lower_{label}'] = lower
+        columns[f'bollinger_middle_{label}'] = middle
+        columns[f'bollinger_upper_{label}'] = upper
+    for span in ema_spans:
+        columns[f'ema_{span}'] = prices.ema(span)
+    for period in rsi_periods:
+        columns[f'rsi_{period}'] = prices.rsi(period)
+    if macd:
+        columns['macd'], columns['macd_signal'], columns['macd_hist'] = prices.macd()
+    for label, window_size in windows['extrema'].items():
+        columns[f'rolling_max_{label}'] = prices.rolling_max(window_size)
+        columns[f'rolling_min_{label}'] = prices.rolling_min(window_size)
+    for label, window_size in windows['drawdown'].items():
+        columns[f'drawdown_{label}'] = prices.drawdown(window_size)
+    for label, window_size in windows['donchian'].items():
+        lower, middle, upper = prices.donchian_channel(window_size)
+        columns[f'donchian_lower_{label}'] = lower
+        columns[f'donchian_middle_{label}'] = middle
+        columns[f'donchian_upper_{label}'] = upper
+
+    if windows['volatility']:
+        # Keep in mind that volatility is the standard deviation of a rolling window of percent_changes. That's it.
+        returns = IndicatorEngine(series.pct_change().to_numpy(dtype='float64'), timestamps)
+        returns.rolling(windows['volatility'].values())
+        for label, window_size in windows['volatility'].items():
+            columns[f'volatility_{label}'] = returns.rolling_std(window_size)
+
+    for name, values in columns.items():
+        df[name] = values
+    #no return, it adds columns to the df
 
 def resample_price_series(df: pd.DataFrame, price_key: str, frequency: ResampleFrequency) -> pd.DataFrame:
+    """
+    One row per period between the first and the last price: `price_key` is the last price of the period (carried
+    forward over empty periods), plus open / high / low and the number of prices in the period (0 = empty period).
+    Bars come from the NumPy resampler (app/services/resampling.py).
+    """
     # Ensure timestamp is proper datetime
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    if not pd.api.types.is_datetime64_any_dtype(df['timestamp']):
+        df['timestamp'] = pd.to_datetime(df['timestamp'])
     
     # Validate the column exists and is numeric
-    _validate_numeric_series(df, price_key)
+    series = _validate_numeric_series(df, price_key)
     
-    # Map frequency -> pandas rule
     if frequency not in PANDAS_RESAMPLING_RULES:
         raise ValueError(f"Unsupported resampling frequency: {frequency}")    
-    rule = PANDAS_RESAMPLING_RULES[frequency]
-        
-    # Set timestamp as index
-    df_resampled = df.set_index('timestamp')
-    
-    # Resample using only the price_key column
-    df_resampled = df_resampled.resample(rule).agg({price_key: 'last'})
-    
-    # Forward fill missing values
-    df_resampled[price_key] = df_resampled[price_key].ffill()
 
-    # Restore timestamp as a column
-    df_resampled = df_resampled.reset_index()
-    
-    if frequency == ResampleFrequency.WEEKLY:
+    bars = resample_ohlc(df['timestamp'].to_numpy(dtype='datetime64[ns]'), series.to_numpy(dtype='float64'), [frequency])
+    return convert_ohlc_bars_to_dataframe(bars[frequency].dense(), price_key)
+
+def convert_ohlc_bars_to_dataframe(bars: OHLCBars, price_key: str = 'price') -> pd.DataFrame:
+    # Same columns as resample_price_series: also used for the bars of the resolution pyramid (app/services/pyramid.py)
+    df_resampled = pd.DataFrame({
+        'timestamp': bars.timestamp,
+        price_key: bars.close,
+        'open': bars.open,
+        'high': bars.high,
+        'low': bars.low,
+        'count': bars.count,
+    })
+    
+    if bars.frequency == ResampleFrequency.WEEKLY:
         #Add a column with the number of the week in the year
         df_resampled['week_number'] = df_resampled['timestamp'].dt.isocalendar().week
         
@@ -103,12 +202,21 @@ def resample_price_series(df: pd.DataFrame, price_key: str, frequency: ResampleF
     return df_resampled
 
 def trim_date_range(df: pd.DataFrame, start: datetime | None, end: datetime | None) -> pd.DataFrame:
-    df = df.copy()
-    if start is not None:
-        df = df[df['timestamp'] >= start]
-    if end is not None:
-        df = df[df['timestamp'] <= end]
-    return df
+    # Rows with start <= timestamp <= end, as a new frame (callers add columns to it). Timestamps are sorted (provider
+    # series are), so the bounds come from a binary search and only the kept rows are copied
+    if start is None and end is None:
+        return df.copy()
+    timestamps = df['timestamp']
+    if not timestamps.is_monotonic_increasing:
+        keep = pd.Series(True, index=df.index)
+        if start is not None:
+            keep &= timestamps >= start
+        if end is not None:
+            keep &= timestamps <= end
+        return df[keep]
+    lo = 0 if start is None else int(timestamps.searchsorted(start, side='left'))
+    hi = len(df) if end is None else int(timestamps.searchsorted(end, side='right'))
+    return df.iloc[lo:max(lo, hi)].copy()
 
 def normalize_series(df: pd.DataFrame, price_key: str, base: float = 100.0) -> None:
     series = _validate_numeric_series(df, price_key)
@@ -118,18 +226,7 @@ def normalize_series(df: pd.DataFrame, price_key: str, base: float = 100.0) -> N
     df[f'normalized_{price_key}_base_{round(float(base), 5)}'] = (series / first) * base
     #no return, modifies df in place
 
-def compute_volatility(df: pd.DataFrame, price_key: str, window_size: int) -> None:
-    series = _validate_numeric_series(df, price_key)
-    # Keep in mind that volatility is the standard deviation of a rolling window of percent_changes. That's it.    
-    # Step 1: Compute pct_change
-    aux_pct_changes = series.pct_change()
-    
-    #Construict the column name:
-    vol_col_name = f'volatility_{window_size}'
-    
-    # Step 2: Compute the rolling window (of window_size elements) of the pct_change
-    
-    df[vol_col_name] = aux_pct_changes.rolling(window=window_size).std() 
-    
-    #print(df[vol_col_name].head(30))
-    # No return, modifies df in place
\ No newline at end of file
+def compute_volatility(df: pd.DataFrame, price_key: str, window_size: int | str | Iterable[int | str]) -> None:
+    # Rolling std of the pct_change, one column per window
+    compute_indicators(df, price_key, volatility_windows=_as_windows(window_size))
+    # No return, modifies df in place
@@ -0,0 +1,347 @@
+import math
+from typing import Iterable
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# NumPy indicator engine: rolling means / standard deviations for many windows at once, EMA, Bollinger bands, RSI and
+# MACD, computed on the float64 price array with intermediates shared between indicators.
+#
+#   - Rolling moments: every window is a difference of cumulative sums (sum and sum of squares), so the cost of a
+#     window does not depend on its length, and ONE cumulative pass serves every window asked. Plain cumulative sums
+#     over millions of prices lose the small windows to rounding (difference of two huge sums), so the sums restart
+#     every `chunk_size` prices, from the chunk mean: chunks overlap by the longest window minus one. Short count
+#     windows (up to LOCAL_MOMENTS_MAX_WINDOW prices) are summed directly instead, around their own first price: a
+#     difference of chunk sums would leave rounding noise on flat runs (a constant price gets a std of 0, not 1e-4).
+#   - EMA: y[t] = a * x[t] + (1 - a) * y[t-1] is a linear recurrence; inside a chunk it is a cumulative sum of
+#     x[j] / (1 - a)^j, rescaled. Chunks are short enough for (1 - a)^-j to stay finite, the last value is carried.
+#   - Rolling max / min (van Herk / Gil-Werman, linear whatever the window): Donchian channels and drawdowns reuse them.
+#   - Rolling means, Bollinger bands and volatility read the same moments; MACD reuses the EMAs of the prices.
+#   - Windows are a number of prices (int) or a duration (np.timedelta64, the window (t - duration, t] like pandas'
+#     rolling('7D')): provider series don't all have a regular granularity.
+#
+# Conventions are those of pandas: count windows need `window` values (NaN before, and for windows containing a
+# NaN), time windows one value (NaN skipped), the std has ddof=1 (Bollinger bands use the population std, ddof=0, as Bollinger defined them), EMAs follow
+# ewm(span=..., adjust=False) with NaN prices carried forward, RSI is Wilder's (ewm(alpha=1/period, adjust=False)
+# of gains and losses, NaN for the first `period` prices).
+
+INDICATOR_CHUNK_SIZE = 1 << 12
+LOCAL_MOMENTS_MAX_WINDOW = 32
+BOLLINGER_K = 2.0
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+_EMA_MAX_EXPONENT = 500.0  # (1 - a)^-j stays below e^500 inside a chunk
+
+Window = int | np.timedelta64  # a number of prices, or a duration: (t - window, t] like pandas' rolling('7D')
+
+
+def _forward_filled(values: np.ndarray) -> np.ndarray:
+    missing = np.isnan(values)
+    if not missing.any():
+        return values
+    last = np.maximum.accumulate(np.where(missing, 0, np.arange(len(values))))
+    return values[last]  # leading NaN stay NaN (values[0] is NaN there)
+
+
+def pct_change(values: np.ndarray) -> np.ndarray:
+    # Series.pct_change() with its default padding: a missing value repeats the last valid one (return 0 on it)
+    filled = _forward_filled(np.asarray(values, dtype=np.float64))
+    out = np.full(len(filled), np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out[1:] = filled[1:] / filled[:-1] - 1
+    return out
+
+
+def ema(values: np.ndarray, alpha: float, chunk_size: int = INDICATOR_CHUNK_SIZE) -> np.ndarray:
+    '''
+    Exponential moving average y[t] = alpha * x[t] + (1 - alpha) * y[t-1], starting at the first non NaN value.
+    NaN values are carried forward.
+    '''
+    if not 0 < alpha <= 1:
+        raise ValueError(f'EMA alpha must be in (0, 1]. Got {alpha}')
+    values = _forward_filled(np.asarray(values, dtype=np.float64))
+    out = np.full(len(values), np.nan)
+    valid = np.flatnonzero(~np.isnan(values))
+    if not len(valid):
+        return out
+    start = int(valid[0])
+    decay = 1.0 - alpha
+    if decay == 0.0:
+        out[start:] = values[start:]
+        return out
+
+    log_decay = math.log(decay)
+    step = max(1, min(chunk_size, int(_EMA_MAX_EXPONENT / -log_decay)))
+    powers = np.exp(np.arange(step) * log_decay)  # (1 - a)^k
+    carry = values[start]                         # y[start - 1] such that y[start] = x[start]
+    for lo in range(start, len(values), step):
+        x = values[lo:lo + step]
+        k = len(x)
+        # y[lo + k] = (1 - a)^(k+1) * carry + a * (1 - a)^k * sum_{j <= k} x[lo + j] / (1 - a)^j
+        y = powers[:k] * decay * carry + alpha * powers[:k] * np.cumsum(x / powers[:k])
+        out[lo:lo + k] = y
+        carry = y[-1]
+    return out
+
+
+def _is_count(window: Window) -> bool:
+    return not isinstance(window, np.timedelta64)  # (np.timedelta64 is an np.integer)
+
+
+def _block_running_max(values: np.ndarray, block: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # Running max from the left (prefix) and from the right (suffix), restarted at every block (block ids
+    # nondecreasing). Blocks are the rows of a 2-D array padded with -inf, accumulated along the rows.
+    starts = np.flatnonzero(np.concatenate(([True], block[1:] != block[:-1])))
+    sizes = np.diff(np.append(starts, len(values)))
+    width = int(sizes.max())
+    grid = np.full(len(starts) * width, -np.inf)
+    if (sizes[:-1] == width).all():
+        # Regular blocks (count windows, evenly spaced series): a reshape, no scatter / gather
+        cell = slice(0, len(values))
+    else:
+        cell = np.arange(len(values)) + np.repeat(np.arange(len(starts)) * width - starts, sizes)
+    grid[cell] = values
+    grid = grid.reshape(len(starts), width)
+    prefix = np.maximum.accumulate(grid, axis=1).ravel()[cell]
+    suffix = np.maximum.accumulate(grid[:, ::-1], axis=1)[:, ::-1].ravel()[cell]
+    return prefix, suffix
+
+
+def span_alpha(span: int) -> float:
+    if span < 1:
+        raise ValueError(f'EMA span must be a positive integer. Got {span}')
+    return 2.0 / (span + 1)
+
+
+class IndicatorEngine:
+    '''
+    Indicators of one series. Intermediates (rolling moments and extrema per window, EMAs per alpha) are computed
+    once and shared by every indicator that needs them; rolling moments of all the count windows asked at once come
+    from one pass. Time windows (np.timedelta64) need the timestamps of the series, sorted.
+    '''
+
+    def __init__(self, values: np.ndarray, timestamps: np.ndarray | None = None, chunk_size: int = INDICATOR_CHUNK_SIZE):
+        self.values = np.asarray(values, dtype=np.float64)
+        self.timestamps = None if timestamps is None else np.asarray(timestamps, dtype='datetime64[ns]').astype(np.int64)
+        if self.timestamps is not None and len(self.timestamps) != len(self.values):
+            raise ValueError('timestamps and values must have the same length')
+        self.chunk_size = chunk_size
+        # window -> (mean, M2 = sum of squared deviations, number of values: an int for count windows)
+        self._moments: dict[Window, tuple[np.ndarray, np.ndarray, int | np.ndarray]] = {}
+        self._extrema: dict[tuple[Window, str], np.ndarray] = {}
+        self._left_edges: dict[np.timedelta64, np.ndarray] = {}
+        self._emas: dict[float, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def _span_ns(self, window: np.timedelta64) -> int:
+        if self.timestamps is None:
+            raise ValueError(f'Time window {window} needs the timestamps of the series')
+        span = int(window.astype('timedelta64[ns]').astype(np.int64))
+        if span <= 0:
+            raise ValueError(f'Time window must be positive. Got {window}')
+        return span
+
+    def left_edges(self, window: np.timedelta64) -> np.ndarray:
+        # Index of the first price of the window (t - window, t] ending at every price
+        if window not in self._left_edges:
+            span = self._span_ns(window)
+            self._left_edges[window] = np.searchsorted(self.timestamps, self.timestamps - span, side='right')
+        return self._left_edges[window]
+
+    def _compute_moments(self, windows: Iterable[Window]) -> None:
+        windows = {w for w in windows if w not in self._moments}
+        counts = sorted(w for w in windows if _is_count(w))
+        if counts:
+            self._count_moments(counts)
+        for window in windows.difference(counts):
+            self._time_moments(window)
+
+    def _count_moments(self, windows: list[int]) -> None:
+        if windows[0] < 1:
+            raise ValueError(f'Window size must be a positive integer. Got {windows[0]}')
+        for w in windows:
+            if w <= LOCAL_MOMENTS_MAX_WINDOW:
+                self._moments[w] = self._local_moments(w)
+        windows = [w for w in windows if w > LOCAL_MOMENTS_MAX_WINDOW]
+        if not windows:
+            return
+        n = len(self.values)
+        longest = windows[-1]
+        means = {w: np.full(n, np.nan) for w in windows}
+        m2s = {w: np.full(n, np.nan) for w in windows}
+        # chunks at least as long as the overlap: long windows would otherwise sum the same prices many times
+        step = max(self.chunk_size, longest - 1)
+        for start in range(0, n, step):
+            stop = min(start + step, n)
+            lo = max(0, start - longest + 1)
+            segment = self.values[lo:stop]
+            missing = np.isnan(segment)
+            has_missing = bool(missing.any())
+            center = float(np.mean(segment[~missing])) if not missing.all() else 0.0
+            z = segment - center
+            if has_missing:
+                z[missing] = 0.0
+            sums = np.concatenate(([0.0], np.cumsum(z)))
+            squares = np.concatenate(([0.0], np.cumsum(z * z)))
+            gaps = np.concatenate(([0], np.cumsum(missing))) if has_missing else None
+            # Cumulative indexes one past the output positions start..stop are a..b: window sums are slice differences
+            a, b = start - lo + 1, stop - lo + 1
+            for w in windows:
+                first = max(a, w)  # positions before w - 1 have no full window (left NaN)
+                if first >= b:
+                    continue
+                out = slice(start + first - a, stop)
+                total = sums[first:b] - sums[first - w:b - w]
+                m2 = squares[first:b] - squares[first - w:b - w] - total * total / w
+                np.maximum(m2, 0.0, out=m2)
+                mean = center + total / w
+                if has_missing:
+                    broken = gaps[first:b] != gaps[first - w:b - w]
+                    mean[broken] = np.nan
+                    m2[broken] = np.nan
+                means[w][out] = mean
+                m2s[w][out] = m2
+        for w in windows:
+            self._moments[w] = (means[w], m2s[w], w)
+
+    def _local_moments(self, window: int) -> tuple[np.ndarray, np.ndarray, int]:
+        # Sums of every window taken around its own first price: the rounding is that of the price moves inside the
+        # window, and a constant run gives exactly 0. O(n * window), for short windows only; a NaN gives NaN
+        n = len(self.values)
+        means, m2s = np.full(n, np.nan), np.full(n, np.nan)
+        for start in range(window - 1, n, self.chunk_size):
+            stop = min(start + self.chunk_size, n)
+            rows = sliding_window_view(self.values[start - window + 1:stop], window)
+            deviations = rows - rows[:, :1]
+            total = deviations.sum(axis=1)
+            m2 = np.einsum('ij,ij->i', deviations, deviations) - total * total / window
+            means[start:stop] = rows[:, 0] + total / window
+            m2s[start:stop] = np.maximum(m2, 0.0, out=m2)
+        return means, m2s, window
+
+    def _time_moments(self, window: np.timedelta64) -> None:
+        # Same chunked sums as the count windows; a window is the run left_edges[i]..i, at least one price (pandas'
+        # min_periods=1 for time windows), NaN skipped
+        left = self.left_edges(window)
+        n = len(self.values)
+        means, m2s, counts = np.full(n, np.nan), np.full(n, np.nan), np.zeros(n, dtype=np.int64)
+        start = 0
+        while start < n:
+            lo = int(left[start])
+            # chunks at least as long as the overlap: long windows would otherwise sum the same prices many times
+            stop = min(start + max(self.chunk_size, start - lo), n)
+            segment = self.values[lo:stop]
+            missing = np.isnan(segment)
+            center = float(np.mean(segment[~missing])) if not missing.all() else 0.0
+            z = np.where(missing, 0.0, segment - center)
+            sums = np.concatenate(([0.0], np.cumsum(z)))
+            squares = np.concatenate(([0.0], np.cumsum(z * z)))
+            valid = np.concatenate(([0], np.cumsum(~missing)))
+            ends = np.arange(start + 1, stop + 1) - lo
+            begins = left[start:stop] - lo
+            total = sums[ends] - sums[begins]
+            count = valid[ends] - valid[begins]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                means[start:stop] = np.where(count > 0, center + total / count, np.nan)
+                m2 = squares[ends] - squares[begins] - total * total / count
+            m2s[start:stop] = np.where(count > 0, np.maximum(m2, 0.0), np.nan)
+            counts[start:stop] = count
+            start = stop
+        self._moments[window] = (means, m2s, counts)
+
+    def rolling_mean(self, window: Window) -> np.ndarray:
+        self._compute_moments([window])
+        return self._moments[window][0]
+
+    def rolling_std(self, window: Window, ddof: int = 1) -> np.ndarray:
+        self._compute_moments([window])
+        _, m2, count = self._moments[window]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(np.asarray(count) - ddof > 0, np.sqrt(m2 / (count - ddof)), np.nan)
+
+    def _rolling_max(self, values: np.ndarray, window: Window) -> np.ndarray:
+        # van Herk / Gil-Werman: cut the series in blocks at least as long as the window, so that every window is a
+        # suffix of one block followed by a prefix of the next; the max is that of a running max from the left
+        # (prefix) and one from the right (suffix). Linear in n whatever the window: 2 running maxima + 1 gather.
+        # Count windows: blocks of `window` prices. Time windows: blocks of `window` on the clock (t0 + k * window).
+        n = len(values)
+        missing = np.isnan(values)
+        has_missing = bool(missing.any())
+        filled = np.where(missing, -np.inf, values) if has_missing else values
+
+        if _is_count(window):
+            if window < 1:
+                raise ValueError(f'Window size must be a positive integer. Got {window}')
+            prefix, suffix = _block_running_max(filled, np.arange(n) // window)
+            # The window ending at i starts at i - window + 1: slices instead of gathers (when it starts a block,
+            # suffix there is the whole block, which ends at i: same as prefix)
+            result = np.full(n, np.nan)
+            result[window - 1:] = np.maximum(suffix[:n - window + 1], prefix[window - 1:])
+            if has_missing:
+                # pandas' min_periods for count windows: `window` prices, none of them NaN
+                gaps = np.concatenate(([0], np.cumsum(missing)))
+                result[window - 1:][gaps[window:] != gaps[:n - window + 1]] = np.nan
+            return result
+
+        block = (self.timestamps - self.timestamps[0]) // self._span_ns(window)
+        left = self.left_edges(window)
+        prefix, suffix = _block_running_max(filled, block)
+        result = np.where(block[left] == block, prefix, np.maximum(suffix[left], prefix))
+        result[np.isneginf(result)] = np.nan  # no price in the window
+        return result
+
+    def rolling_max(self, window: Window) -> np.ndarray:
+        if (window, 'max') not in self._extrema:
+            self._extrema[(window, 'max')] = self._rolling_max(self.values, window)
+        return self._extrema[(window, 'max')]
+
+    def rolling_min(self, window: Window) -> np.ndarray:
+        if (window, 'min') not in self._extrema:
+            self._extrema[(window, 'min')] = -self._rolling_max(-self.values, window)
+        return self._extrema[(window, 'min')]
+
+    def drawdown(self, window: Window) -> np.ndarray:
+        # % below the highest price of the window (0 at a new high)
+        return (self.values / self.rolling_max(window) - 1.0) * 100
+
+    def donchian_channel(self, window: Window) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # (lower, middle, upper): the rolling extrema shared with rolling_min / rolling_max / drawdown
+        lower, upper = self.rolling_min(window), self.rolling_max(window)
+        return lower, (lower + upper) / 2, upper
+
+    def rolling(self, windows: Iterable[Window]) -> None:
+        # Moments of several windows in one pass (later rolling_* calls are lookups)
+        self._compute_moments(windows)
+
+    def ema(self, span: int) -> np.ndarray:
+        alpha = span_alpha(span)
+        if alpha not in self._emas:
+            self._emas[alpha] = ema(self.values, alpha, self.chunk_size)
+        return self._emas[alpha]
+
+    def bollinger_bands(self, window: Window, k: float = BOLLINGER_K) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # (lower, middle, upper)
+        middle = self.rolling_mean(window)
+        width = k * self.rolling_std(window, ddof=0)
+        return middle - width, middle, middle + width
+
+    def rsi(self, period: int) -> np.ndarray:
+        if period < 1:
+            raise ValueError(f'RSI period must be a positive integer. Got {period}')
+        deltas = np.diff(_forward_filled(self.values), prepend=np.nan)
+        gains = ema(np.clip(deltas, 0, None), 1.0 / period, self.chunk_size)
+        losses = ema(np.clip(-deltas, 0, None), 1.0 / period, self.chunk_size)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rsi = 100.0 * gains / (gains + losses)
+        rsi[:period] = np.nan
+        return rsi
+
+    def macd(self, fast: int = MACD_FAST, slow: int = MACD_SLOW,
+             signal: int = MACD_SIGNAL) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # (macd, signal, histogram)
+        if fast >= slow:
+            raise ValueError(f'MACD fast span must be shorter than the slow one. Got {fast} and {slow}')
+        line = self.ema(fast) - self.ema(slow)
+        signal_line = ema(line, span_alpha(signal), self.chunk_size)
+        return line, signal_line, line - signal_line
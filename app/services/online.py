@@ -0,0 +1,265 @@
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Hashable
+
+import numpy as np
+
+from app.domain.entities import MarketChartData
+from app.services.indicators import IndicatorEngine, Window, pct_change
+from app.services.stats import RunningPriceStats, calculate_price_stats, price_array, timestamp_array
+
+# Incremental analytics of the cached series: /stats figures and the rolling mean / volatility columns of /dataframe,
+# kept next to the series and carried from one cached version to the next instead of being recomputed over the whole
+# history at every refresh.
+#
+# A refresh of the cache (app/infrastructure/cache.py) gives a new version of the series: the window of `days` has
+# slid, the first `dropped` prices are gone, the last price (the live one) may have been revised, new prices follow.
+# The overlap is found with a binary search on the timestamps and checked at both ends (same rule as the resolution
+# pyramid, app/services/pyramid.py); anything else (history rewritten, no overlap) is rebuilt from scratch.
+#   - stats: RunningPriceStats (app/services/stats.py), O(dropped + new prices);
+#   - rolling columns: the rows whose window only holds prices of both versions are the same, shifted by `dropped`.
+#     Only the first rows (their window lost the dropped prices) and the rows of the revised and new prices are
+#     computed again, on the slice of prices their windows reach. The rest of the column is copied.
+# Columns are the ones of analytics.compute_indicators, up to rounding.
+
+ONLINE_MAX_SERIES = int(os.getenv('ONLINE_MAX_SERIES', 256))
+ONLINE_MAX_COLUMNS = int(os.getenv('ONLINE_MAX_COLUMNS', 16))
+
+ROLLING_MEAN, VOLATILITY = 'rolling_mean', 'volatility'
+
+
+def _same(a: float, b: float) -> bool:
+    return a == b or (a != a and b != b)  # NaN is a missing price: the same in both versions
+
+
+def _first_valid(prices: np.ndarray) -> int:
+    # Index of the first non NaN price, -1 if none (O(1) when the first price is there)
+    if len(prices) and prices[0] == prices[0]:
+        return 0
+    valid = np.flatnonzero(~np.isnan(prices))
+    return int(valid[0]) if len(valid) else -1
+
+
+def _last_valid(prices: np.ndarray, at: int) -> int:
+    # Index of the last non NaN price at or before `at`, -1 if none
+    if prices[at] == prices[at]:
+        return at
+    valid = np.flatnonzero(~np.isnan(prices[:at]))
+    return int(valid[-1]) if len(valid) else -1
+
+
+def _is_sorted(timestamps: np.ndarray) -> bool:
+    return len(timestamps) < 2 or not np.any(timestamps[1:] < timestamps[:-1])
+
+
+def _column_rows(timestamps: np.ndarray, prices: np.ndarray, kind: str, window: Window, lo: int, hi: int) -> np.ndarray:
+    # Column values of rows [lo, hi), computed on the prices their windows reach
+    if lo >= hi:
+        return np.empty(0)
+    if isinstance(window, np.timedelta64):
+        start = int(np.searchsorted(timestamps, timestamps[lo] - window, side='right')) - 1
+    else:
+        start = lo - window
+    start = max(start, 0)
+    if kind == VOLATILITY:
+        # pct_change pads over missing prices: start from a valid price
+        start = max(_last_valid(prices, start), 0)
+        engine = IndicatorEngine(pct_change(prices[start:hi]), timestamps[start:hi])
+        engine.rolling([window])
+        return engine.rolling_std(window)[lo - start:]
+    engine = IndicatorEngine(prices[start:hi], timestamps[start:hi])
+    engine.rolling([window])
+    return engine.rolling_mean(window)[lo - start:]
+
+
+def _check_window(kind: str, window: Window, size: int) -> None:
+    if kind == ROLLING_MEAN and not isinstance(window, np.timedelta64) and window > size:
+        raise ValueError('window_size cannot be larger than the number of data points in the DataFrame')
+
+
+class OnlineSeries:
+    '''
+    Analytics of one sorted series, updated in place by refresh(). Columns handed out are never written to again.
+    '''
+
+    def __init__(self, timestamps: np.ndarray, prices: np.ndarray, max_columns: int = ONLINE_MAX_COLUMNS):
+        self.timestamps = np.asarray(timestamps, dtype='datetime64[ns]')
+        self.prices = np.asarray(prices, dtype=np.float64)
+        self.max_columns = max_columns
+        self.running = RunningPriceStats(self.prices)
+        self._columns: OrderedDict[tuple[str, Window], np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_market_chart(cls, marketchartdata: MarketChartData) -> 'OnlineSeries':
+        return cls(timestamp_array(marketchartdata), price_array(marketchartdata))
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    def _rows(self, kind: str, window: Window, lo: int, hi: int) -> np.ndarray:
+        return _column_rows(self.timestamps, self.prices, kind, window, lo, hi)
+
+    def _head_rows(self, kind: str, window: Window) -> int:
+        # Rows whose window reached the dropped prices (or, for returns, the missing prices before the first valid)
+        anchor = _first_valid(self.prices) if kind == VOLATILITY else 0
+        if anchor < 0 or not len(self.prices):
+            return len(self.prices)
+        if isinstance(window, np.timedelta64):
+            return int(np.searchsorted(self.timestamps, self.timestamps[anchor] + window, side='right')) + 1
+        return anchor + window + 1
+
+    def _store(self, key: tuple[str, Window], column: np.ndarray) -> np.ndarray:
+        column.flags.writeable = False  # shared by the requests: read only
+        self._columns[key] = column
+        return column
+
+    def _column(self, kind: str, window: Window, prices: np.ndarray | None = None) -> np.ndarray | None:
+        # Column of the current version; None if `prices` is given and is not the current version any more
+        with self._lock:
+            if prices is not None and prices is not self.prices:
+                return None
+            column = self._columns.get((kind, window))
+            if column is None:
+                column = self._store((kind, window), self._rows(kind, window, 0, len(self.prices)))
+                while len(self._columns) > self.max_columns:
+                    self._columns.popitem(last=False)
+            self._columns.move_to_end((kind, window))
+            return column
+
+    def rolling_mean(self, window: Window) -> np.ndarray:
+        _check_window(ROLLING_MEAN, window, len(self.prices))
+        return self._column(ROLLING_MEAN, window)
+
+    def volatility(self, window: Window) -> np.ndarray:
+        return self._column(VOLATILITY, window)
+
+    def price_stats(self, prices: np.ndarray | None = None) -> dict | None:
+        # Stats of the current version; None if `prices` is given and is not the current version any more
+        with self._lock:
+            if prices is not None and prices is not self.prices:
+                return None
+            return self.running.stats()
+
+    def refresh(self, timestamps: np.ndarray, prices: np.ndarray) -> bool:
+        '''
+        Move to a new version of the series. Returns False if it is not a sorted series (nothing is changed then).
+        '''
+        timestamps = np.asarray(timestamps, dtype='datetime64[ns]')
+        prices = np.asarray(prices, dtype=np.float64)
+        if not _is_sorted(timestamps):
+            return False
+        with self._lock:
+            old_timestamps, old_prices = self.timestamps, self.prices
+            if timestamps is old_timestamps and prices is old_prices:
+                return True
+            dropped = int(np.searchsorted(old_timestamps, timestamps[0], side='left')) if len(timestamps) else 0
+            kept = len(old_prices) - 1 - dropped
+            incremental = (
+                0 < kept < len(prices)
+                and timestamps[0] == old_timestamps[dropped] and _same(prices[0], old_prices[dropped])
+                and timestamps[kept - 1] == old_timestamps[-2] and _same(prices[kept - 1], old_prices[-2])
+            )
+            self.timestamps, self.prices = timestamps, prices
+            if not incremental:
+                self.running = RunningPriceStats(prices)
+                for key in self._columns:
+                    self._store(key, self._rows(*key, 0, len(prices)))
+                return True
+
+            self.running.advance(dropped, prices)
+            for (kind, window), column in self._columns.items():
+                head = self._head_rows(kind, window)
+                if head >= kept:
+                    self._store((kind, window), self._rows(kind, window, 0, len(prices)))
+                else:
+                    self._store((kind, window), np.concatenate((
+                        self._rows(kind, window, 0, head),
+                        column[dropped + head:dropped + kept],
+                        self._rows(kind, window, kept, len(prices)),
+                    )))
+            return True
+
+
+class OnlineVersion:
+    '''
+    The analytics of one version of a series (the arrays of one cached MarketChartData), as handed to a request.
+    Read from the shared OnlineSeries while it still holds this version; once a refresh has moved it to a newer one,
+    computed in full on the version's own arrays, so a request never mixes two versions.
+    '''
+
+    def __init__(self, series: OnlineSeries | None, timestamps: np.ndarray, prices: np.ndarray):
+        self.series = series
+        self.timestamps = timestamps
+        self.prices = prices
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    def _column(self, kind: str, window: Window) -> np.ndarray:
+        _check_window(kind, window, len(self.prices))
+        column = self.series._column(kind, window, self.prices) if self.series is not None else None
+        if column is None:
+            column = _column_rows(self.timestamps, self.prices, kind, window, 0, len(self.prices))
+        return column
+
+    def rolling_mean(self, window: Window) -> np.ndarray:
+        return self._column(ROLLING_MEAN, window)
+
+    def volatility(self, window: Window) -> np.ndarray:
+        return self._column(VOLATILITY, window)
+
+    def price_stats(self) -> dict:
+        stats = self.series.price_stats(self.prices) if self.series is not None else None
+        return stats if stats is not None else calculate_price_stats(self.prices)
+
+
+class OnlineSeriesRegistry:
+    '''
+    Online analytics of every recently used series, by series key (provider, symbol, currency, days), like the
+    PyramidRegistry: the same cached MarketChartData object is a lookup, a new one for the same key refreshes the
+    entry. get() returns the OnlineVersion of the given object, None for series that are not sorted by timestamp
+    (callers compute those in full).
+    '''
+
+    def __init__(self, max_series: int = ONLINE_MAX_SERIES):
+        self.max_series = max_series
+        self._entries: OrderedDict[Hashable, tuple[weakref.ref, OnlineSeries, np.ndarray, np.ndarray]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, marketchartdata: MarketChartData) -> OnlineVersion | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is not None and entry[0]() is marketchartdata:
+            return OnlineVersion(entry[1], entry[2], entry[3])
+
+        timestamps = np.asarray(timestamp_array(marketchartdata), dtype='datetime64[ns]')
+        prices = np.asarray(price_array(marketchartdata), dtype=np.float64)
+        if not _is_sorted(timestamps):
+            with self._lock:
+                self._entries.pop(key, None)
+            return None
+        if entry is not None and len(timestamps) and len(entry[2]) and timestamps[-1] < entry[2][-1]:
+            # An older version than the entry's (a request still holding it): served apart, the entry is kept
+            return OnlineVersion(None, timestamps, prices)
+        if entry is not None and entry[1].refresh(timestamps, prices):
+            online = entry[1]
+        else:
+            online = OnlineSeries(timestamps, prices)
+        with self._lock:
+            self._entries[key] = (weakref.ref(marketchartdata), online, timestamps, prices)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_series:
+                self._entries.popitem(last=False)
+        return OnlineVersion(online, timestamps, prices)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+MARKET_CHART_ONLINE = OnlineSeriesRegistry()
@@ -0,0 +1,131 @@
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from dataclasses import fields
+from typing import Hashable
+
+import numpy as np
+
+from app.domain.entities import MarketChartData, ResampleFrequency
+from app.services.resampling import FREQUENCY_ORDER, HOUR_NS, OHLCBars, coarsen, resample_ohlc
+from app.services.stats import price_array, timestamp_array
+
+# Resolution pyramid: the OHLC bars of a stored series at every frequency of ResampleFrequency, materialized once so
+# that `frequency=` requests are lookups instead of a resampling of the raw points.
+#
+#   raw points --(one pass)--> hourly bars --> 4-hourly, daily, weekly, monthly, yearly bars
+#
+# Only the hourly level is computed from the raw points; the coarser ones are aggregated from the hourly bars (a few
+# thousand per year of data). When the cache refreshes a series, the new version mostly repeats the old one: hours
+# that were complete in the old version are kept, only the points of the open hour onward (and of the first hour,
+# the window of `days` slides) are aggregated again, then the coarser levels are rebuilt from the hourly bars.
+
+PYRAMID_MAX_SERIES = int(os.getenv('PYRAMID_MAX_SERIES', 256))
+
+
+def _slice(bars: OHLCBars, lo: int, hi: int) -> OHLCBars:
+    return OHLCBars(bars.frequency, *(getattr(bars, f.name)[lo:hi] for f in fields(bars)[1:]))
+
+
+def _concat(parts: list[OHLCBars]) -> OHLCBars:
+    return OHLCBars(parts[0].frequency, *(np.concatenate([getattr(p, f.name) for p in parts]) for f in fields(parts[0])[1:]))
+
+
+def _hourly_bars(timestamps_ns: np.ndarray, prices: np.ndarray) -> OHLCBars:
+    return resample_ohlc(timestamps_ns.view('datetime64[ns]'), prices, [ResampleFrequency.HOURLY])[ResampleFrequency.HOURLY]
+
+
+class ResolutionPyramid:
+    '''
+    Dense OHLC bars (see OHLCBars.dense) of one series at every resampling frequency. Immutable: refreshed() returns a
+    new pyramid, so readers holding the old one are never disturbed.
+    '''
+
+    def __init__(self, hourly: OHLCBars, last_timestamp: int | None):
+        self.hourly = hourly                  # sparse: the coarser levels are aggregated from it
+        self.last_timestamp = last_timestamp  # int64 ns of the last point of the series
+        self.levels = {frequency: coarsen(hourly, frequency).dense() for frequency in FREQUENCY_ORDER}
+
+    @classmethod
+    def from_arrays(cls, timestamps: np.ndarray, prices: np.ndarray) -> 'ResolutionPyramid':
+        timestamps_ns = np.asarray(timestamps, dtype='datetime64[ns]').astype(np.int64)
+        hourly = _hourly_bars(timestamps_ns, np.asarray(prices, dtype=np.float64))
+        return cls(hourly, int(timestamps_ns.max()) if len(timestamps_ns) else None)
+
+    @classmethod
+    def from_market_chart(cls, marketchartdata: MarketChartData) -> 'ResolutionPyramid':
+        return cls.from_arrays(timestamp_array(marketchartdata), price_array(marketchartdata))
+
+    def bars(self, frequency: ResampleFrequency) -> OHLCBars:
+        return self.levels[frequency]
+
+    def refreshed(self, timestamps: np.ndarray, prices: np.ndarray) -> 'ResolutionPyramid':
+        '''
+        Pyramid of a new version of the series. The hours before the last point of the current version are assumed
+        unchanged (providers only revise the open period); the new version is checked against the kept bars at both
+        ends of the overlap and rebuilt from scratch if it does not match, is unsorted or does not overlap.
+        '''
+        timestamps_ns = np.asarray(timestamps, dtype='datetime64[ns]').astype(np.int64)
+        prices = np.asarray(prices, dtype=np.float64)
+        if self.last_timestamp is None or len(timestamps_ns) < 2 or np.any(timestamps_ns[1:] < timestamps_ns[:-1]):
+            return ResolutionPyramid.from_arrays(timestamps_ns, prices)
+
+        hourly = self.hourly
+        open_hour = self.last_timestamp // HOUR_NS   # hours before it were complete in the current version
+        first_hour = timestamps_ns[0] // HOUR_NS     # may be cut by the sliding window: aggregated again
+        lo = int(np.searchsorted(hourly.period, first_hour, side='right'))
+        hi = int(np.searchsorted(hourly.period, open_hour, side='left'))
+        head_end = int(np.searchsorted(timestamps_ns, (first_hour + 1) * HOUR_NS, side='left'))
+        tail_start = int(np.searchsorted(timestamps_ns, open_hour * HOUR_NS, side='left'))
+        if lo >= hi or head_end >= tail_start:
+            return ResolutionPyramid.from_arrays(timestamps_ns, prices)
+        # First and last kept hours: the new version has the same open and close there
+        first_kept, last_kept = timestamps_ns[head_end], timestamps_ns[tail_start - 1]
+        if (first_kept // HOUR_NS != hourly.period[lo] or prices[head_end] != hourly.open[lo]
+                or last_kept // HOUR_NS != hourly.period[hi - 1] or prices[tail_start - 1] != hourly.close[hi - 1]):
+            return ResolutionPyramid.from_arrays(timestamps_ns, prices)
+
+        parts = [_hourly_bars(timestamps_ns[:head_end], prices[:head_end]), _slice(hourly, lo, hi),
+                 _hourly_bars(timestamps_ns[tail_start:], prices[tail_start:])]
+        return ResolutionPyramid(_concat(parts), int(timestamps_ns[-1]))
+
+
+class PyramidRegistry:
+    '''
+    Pyramid of every recently resampled series, by series key (provider, symbol, currency, days). An entry remembers
+    which MarketChartData object it was built from: the same cached object is a lookup, a refreshed one (new object
+    for the same key) updates the pyramid incrementally. Least recently used series are dropped past max_series.
+    '''
+
+    def __init__(self, max_series: int = PYRAMID_MAX_SERIES):
+        self.max_series = max_series
+        self._entries: OrderedDict[Hashable, tuple[weakref.ref, ResolutionPyramid]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, marketchartdata: MarketChartData) -> ResolutionPyramid:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is not None and entry[0]() is marketchartdata:
+            return entry[1]
+
+        # Built outside the lock: concurrent requests for a new version may both build it, the last one is kept
+        if entry is None:
+            pyramid = ResolutionPyramid.from_market_chart(marketchartdata)
+        else:
+            pyramid = entry[1].refreshed(timestamp_array(marketchartdata), price_array(marketchartdata))
+        with self._lock:
+            self._entries[key] = (weakref.ref(marketchartdata), pyramid)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_series:
+                self._entries.popitem(last=False)
+        return pyramid
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+MARKET_CHART_PYRAMIDS = PyramidRegistry()
@@ -0,0 +1,169 @@
+from dataclasses import dataclass
+from typing import Iterable
+
+import numpy as np
+
+from app.domain.entities import ResampleFrequency
+
+# Vectorized OHLC resampler.
+#
+# Every price gets the integer id of its period, computed from the int64 timestamps (hours / days since the epoch,
+# Monday based weeks, months / years of datetime64), and the bars are NumPy reductions over the runs of equal ids
+# (reduceat): open, high, low, close and count. No set_index / resample / reset_index, no DataFrame copy.
+#
+# Several frequencies are served from ONE pass over the prices: the prices are bucketed once at the finest requested
+# frequency, and the coarser frequencies are aggregated from those bars (a day is made of whole hours...). Weeks don't
+# nest in months or years, so weekly + monthly / yearly go through daily bars.
+#
+# Timestamps are the naive local times of the series: periods follow the wall clock, like pandas on naive data.
+# Bars are labelled like the pandas rules of PANDAS_RESAMPLING_RULES: period start for hours and days, the Sunday
+# for weeks ('W-SUN'), the last day for months and years ('ME', 'Y').
+
+HOUR_NS = 3_600 * 1_000_000_000
+DAY_NS = 24 * HOUR_NS
+
+# Shortest first
+FREQUENCY_ORDER = (
+    ResampleFrequency.HOURLY,
+    ResampleFrequency.FOUR_HOURLY,
+    ResampleFrequency.DAILY,
+    ResampleFrequency.WEEKLY,
+    ResampleFrequency.MONTHLY,
+    ResampleFrequency.YEARLY,
+)
+_FIXED_PERIOD_NS = {ResampleFrequency.HOURLY: HOUR_NS, ResampleFrequency.FOUR_HOURLY: 4 * HOUR_NS, ResampleFrequency.DAILY: DAY_NS}
+_EPOCH_WEEKDAY_OFFSET = 3  # 1970-01-01 is a Thursday: (day + 3) // 7 starts weeks on Mondays
+
+
+@dataclass
+class OHLCBars:
+    # One bar per non empty period, in time order (see dense() for the empty ones)
+    frequency: ResampleFrequency
+    period: np.ndarray      # int64 period ids, consecutive periods have consecutive ids
+    timestamp: np.ndarray   # datetime64[ns] labels
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    count: np.ndarray       # int64 number of prices in the period
+
+    def __len__(self) -> int:
+        return len(self.period)
+
+    def dense(self) -> 'OHLCBars':
+        # Every period between the first and the last one; empty periods are flat bars at the previous close, count 0
+        if not len(self.period):
+            return self
+        positions = self.period - self.period[0]
+        size = int(positions[-1]) + 1
+        if size == len(self.period):
+            return self
+        filled = np.zeros(size, dtype=bool)
+        filled[positions] = True
+        # index of the last non empty period at or before every period
+        source = np.maximum.accumulate(np.where(filled, np.cumsum(filled) - 1, 0))
+        period = np.arange(self.period[0], self.period[0] + size, dtype=np.int64)
+        close = self.close[source]
+
+        def flat(values: np.ndarray) -> np.ndarray:
+            return np.where(filled, values[source], close)
+
+        count = np.zeros(size, dtype=np.int64)
+        count[positions] = self.count
+        return OHLCBars(self.frequency, period, period_labels(period, self.frequency),
+                        flat(self.open), flat(self.high), flat(self.low), close, count)
+
+
+def period_ids(timestamps_ns: np.ndarray, frequency: ResampleFrequency) -> np.ndarray:
+    # int64 nanoseconds -> int64 period ids
+    if frequency in _FIXED_PERIOD_NS:
+        return timestamps_ns // _FIXED_PERIOD_NS[frequency]
+    if frequency is ResampleFrequency.WEEKLY:
+        return (timestamps_ns // DAY_NS + _EPOCH_WEEKDAY_OFFSET) // 7
+    if frequency is ResampleFrequency.MONTHLY:
+        return timestamps_ns.view('datetime64[ns]').astype('datetime64[M]').astype(np.int64)
+    if frequency is ResampleFrequency.YEARLY:
+        return timestamps_ns.view('datetime64[ns]').astype('datetime64[Y]').astype(np.int64)
+    raise ValueError(f'Unsupported resampling frequency: {frequency}')
+
+
+def period_starts(period: np.ndarray, frequency: ResampleFrequency) -> np.ndarray:
+    # int64 period ids -> int64 nanoseconds of the first instant of the period
+    if frequency in _FIXED_PERIOD_NS:
+        return period * _FIXED_PERIOD_NS[frequency]
+    if frequency is ResampleFrequency.WEEKLY:
+        return (period * 7 - _EPOCH_WEEKDAY_OFFSET) * DAY_NS
+    unit = 'M' if frequency is ResampleFrequency.MONTHLY else 'Y'
+    return period.astype(f'datetime64[{unit}]').astype('datetime64[ns]').astype(np.int64)
+
+
+def period_labels(period: np.ndarray, frequency: ResampleFrequency) -> np.ndarray:
+    if frequency is ResampleFrequency.WEEKLY:
+        labels = period_starts(period, frequency) + 6 * DAY_NS  # Sunday
+    elif frequency in (ResampleFrequency.MONTHLY, ResampleFrequency.YEARLY):
+        labels = period_starts(period + 1, frequency) - DAY_NS  # last day
+    else:
+        labels = period_starts(period, frequency)
+    return labels.view('datetime64[ns]')
+
+
+def _nests(fine: ResampleFrequency, coarse: ResampleFrequency) -> bool:
+    # Is every `coarse` period made of whole `fine` periods?
+    if fine is coarse or fine in _FIXED_PERIOD_NS:
+        return True
+    return fine is ResampleFrequency.MONTHLY and coarse is ResampleFrequency.YEARLY
+
+
+def _bars(frequency: ResampleFrequency, period: np.ndarray, open_: np.ndarray, high: np.ndarray, low: np.ndarray,
+          close: np.ndarray, count: np.ndarray) -> OHLCBars:
+    # Aggregate consecutive rows of equal period (rows are sorted): one reduceat per field
+    if not len(period):
+        empty = np.empty(0)
+        return OHLCBars(frequency, period.astype(np.int64), empty.astype('datetime64[ns]'), empty, empty, empty, empty,
+                        np.empty(0, dtype=np.int64))
+    starts = np.flatnonzero(np.concatenate(([True], period[1:] != period[:-1])))
+    ends = np.concatenate((starts[1:], [len(period)])) - 1
+    bar_period = period[starts]
+    return OHLCBars(
+        frequency, bar_period, period_labels(bar_period, frequency),
+        open_[starts], np.maximum.reduceat(high, starts), np.minimum.reduceat(low, starts), close[ends],
+        np.add.reduceat(count, starts),
+    )
+
+
+def coarsen(bars: OHLCBars, frequency: ResampleFrequency) -> OHLCBars:
+    # Bars of a coarser frequency from the (sparse) bars of a frequency nested in it
+    if not _nests(bars.frequency, frequency):
+        raise ValueError(f'{frequency} periods are not made of whole {bars.frequency} periods')
+    if frequency is bars.frequency:
+        return bars
+    period = period_ids(period_starts(bars.period, bars.frequency), frequency)
+    return _bars(frequency, period, bars.open, bars.high, bars.low, bars.close, bars.count)
+
+
+def resample_ohlc(timestamps: np.ndarray, prices: np.ndarray,
+                  frequencies: Iterable[ResampleFrequency]) -> dict[ResampleFrequency, OHLCBars]:
+    '''
+    OHLC + count bars of a price series at every requested frequency. NaN prices are ignored; the input does not have
+    to be sorted (it is then sorted once, stable, so equal timestamps keep their order).
+    '''
+    requested = sorted(set(frequencies), key=FREQUENCY_ORDER.index)
+    if not requested:
+        return {}
+    timestamps_ns = np.asarray(timestamps, dtype='datetime64[ns]').astype(np.int64)
+    prices = np.asarray(prices, dtype=np.float64)
+    valid = ~np.isnan(prices)
+    if not valid.all():
+        timestamps_ns, prices = timestamps_ns[valid], prices[valid]
+    if len(timestamps_ns) > 1 and np.any(timestamps_ns[1:] < timestamps_ns[:-1]):
+        order = np.argsort(timestamps_ns, kind='stable')
+        timestamps_ns, prices = timestamps_ns[order], prices[order]
+
+    # The single pass over the prices, at the finest frequency every requested one is made of
+    base = requested[0]
+    if not all(_nests(base, frequency) for frequency in requested):
+        base = ResampleFrequency.DAILY
+    base_bars = _bars(base, period_ids(timestamps_ns, base), prices, prices, prices, prices,
+                      np.ones(len(prices), dtype=np.int64))
+
+    return {frequency: coarsen(base_bars, frequency) for frequency in requested}
@@ -0,0 +1,471 @@
+import threading
+import weakref
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+from app.domain.entities import MarketChartData, PricePointSeries
+
+# NumPy stats engine for /stats: the same figures as analytics.calculate_stats, computed on the price array.
+#
+# No DataFrame (and no pandas import): the prices go from the domain entity to a float64 array, then
+#   - count / min / max / mean / variance come from ONE pass over memory: the array is walked in cache sized blocks and
+#     every reduction of a block runs while it is in cache; block results are merged with Chan's formula for the
+#     variance (numerically stable, unlike sum of squares);
+#   - the median is a selection (np.partition, introselect, O(n)) instead of a full sort.
+# NaN prices are skipped like pandas does.
+
+STATS_BLOCK_SIZE = 1 << 15  # float64 values per block: 256 KB, fits in L2
+
+
+def price_array(marketchartdata: MarketChartData) -> np.ndarray:
+    points = marketchartdata.points
+    if isinstance(points, PricePointSeries):
+        return points.prices  # array backed series: no copy
+    return np.fromiter((p.price for p in points), dtype=np.float64, count=len(points))
+
+
+def timestamp_array(marketchartdata: MarketChartData) -> np.ndarray:
+    points = marketchartdata.points
+    if isinstance(points, PricePointSeries):
+        return points.timestamps
+    return np.array([p.timestamp for p in points], dtype='datetime64[ns]')
+
+
+def _fused_moments(prices: np.ndarray, block_size: int) -> tuple[int, float, float, float, float]:
+    # (count, min, max, mean, M2) of the non NaN values, M2 = sum of squared deviations from the mean
+    count, mean, m2 = 0, 0.0, 0.0
+    low, high = np.inf, -np.inf
+    for start in range(0, len(prices), block_size):
+        block = prices[start:start + block_size]
+        block_sum = block.sum()
+        if np.isnan(block_sum):  # NaN in the block (or inf - inf): keep the non NaN values only
+            block = block[~np.isnan(block)]
+            if not len(block):
+                continue
+            block_sum = block.sum()
+        n = len(block)
+        block_mean = block_sum / n
+        deviations = block - block_mean
+        block_m2 = float(np.dot(deviations, deviations))
+        low = min(low, float(block.min()))
+        high = max(high, float(block.max()))
+        # Chan et al. merge of (count, mean, M2)
+        total = count + n
+        delta = block_mean - mean
+        mean += delta * n / total
+        m2 += block_m2 + delta * delta * count * n / total
+        count = total
+    return count, low, high, float(mean), m2
+
+
+def _median(prices: np.ndarray, count: int) -> float:
+    values = prices[~np.isnan(prices)] if count != len(prices) else prices
+    middle = count // 2
+    if count % 2:
+        return float(np.partition(values, middle)[middle])
+    low, high = np.partition(values, (middle - 1, middle))[middle - 1:middle + 1]
+    return float((low + high) / 2)
+
+
+def calculate_price_stats(prices: np.ndarray, block_size: int = STATS_BLOCK_SIZE) -> dict:
+    """
+    Basic statistics of a price array, same keys and semantics as analytics.calculate_stats.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    if prices.ndim != 1 or not len(prices):
+        raise ValueError('Cannot compute stats on an empty price series')
+    count, low, high, mean, m2 = _fused_moments(prices, block_size)
+    if not count:
+        raise ValueError('All prices are NaN, cannot compute statistics.')
+    return stats_from_moments(count, low, high, mean, m2, _median(prices, count), prices[0], prices[-1])
+
+
+def stats_from_moments(count: int, low: float, high: float, mean: float, m2: float, median: float,
+                       first: float, last: float) -> dict:
+    # The /stats figures from the moments of the non NaN prices (count > 0)
+    variance = m2 / (count - 1) if count > 1 else float('nan')  # sample variance (ddof=1), like pandas
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percent_change = (np.float64(last) - first) / first * 100
+
+    return {
+        "count": count,
+        "min_price": low,
+        "max_price": high,
+        "mean_price": mean,
+        "median_price": median,
+        "std_dev": float(np.sqrt(variance)),
+        "variance": float(variance),
+        "first_price": float(first),
+        "last_price": float(last),
+        "percent_change": float(percent_change),
+    }
+
+
+# -------- Range statistics index -------- #
+#
+# Dashboards ask /stats for many start/end windows of the same cached series. RangeStatsIndex is built once per series
+# (O(n)) and then answers count / mean / variance / min / max / first / last / percent change of any window without
+# rescanning it. The series is cut in RANGE_BLOCK_SIZE blocks:
+#   - count / mean / variance: a disjoint sparse table over the blocks holds running sums of the count, the price and
+#     the squared price, each run starting next to the middle of its segment. A window is the merge of two entries
+#     (Chan's formula) plus the two partial blocks at its edges.
+#     Plain prefix sums of price and price^2 over the whole series are not accurate enough: the variance of a window
+#     is then the difference of two huge sums (10M prices: relative errors up to 1e-2 on small windows). Runs that
+#     start next to the window only ever hold the window's own data.
+#   - min / max: sparse tables on the block minima / maxima (two overlapping entries) plus the partial blocks. A full
+#     sparse table over the prices would need n log n values, ~2 GB for 10M prices.
+#   - the window itself is found with a binary search on the timestamps.
+# Every query does a bounded amount of work, whatever the window length. The median has no such index: it is still a
+# selection over the window (O(window)).
+
+RANGE_BLOCK_SIZE = 256
+
+_EMPTY_MOMENTS = (0, 0.0, 0.0)
+
+
+def _merge_moments(a: tuple[int, float, float], b: tuple[int, float, float]) -> tuple[int, float, float]:
+    # (count, mean, M2) of the union of two disjoint samples (Chan et al.)
+    n_a, mean_a, m2_a = a
+    n_b, mean_b, m2_b = b
+    if not n_a:
+        return b
+    if not n_b:
+        return a
+    total = n_a + n_b
+    delta = mean_b - mean_a
+    return total, mean_a + delta * n_b / total, m2_a + m2_b + delta * delta * n_a * n_b / total
+
+
+def _direct_moments(values: np.ndarray) -> tuple[int, float, float]:
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return _EMPTY_MOMENTS
+    mean = values.mean()
+    deviations = values - mean
+    return len(values), float(mean), float(np.dot(deviations, deviations))
+
+
+def _block_moments(prices: np.ndarray, block_size: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # (count, mean, M2) of every whole block, two-pass within the block
+    blocks = prices[:len(prices) // block_size * block_size].reshape(-1, block_size)
+    valid = ~np.isnan(blocks)
+    counts = valid.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = np.where(counts > 0, np.where(valid, blocks, 0.0).sum(axis=1) / counts, 0.0)
+    deviations = np.where(valid, blocks - means[:, None], 0.0)
+    return counts, means, np.einsum('ij,ij->i', deviations, deviations)
+
+
+class _DisjointSparseMoments:
+    # levels[k] = (count, mean, M2) of the run from position i to the middle of its 2**(k+1) segment: leftwards in the
+    # left half, rightwards in the right half. Any range [l, r] with l < r is then the merge of two entries of the
+    # level where l and r fall in the two halves of the same segment.
+
+    def __init__(self, counts: np.ndarray, means: np.ndarray, m2: np.ndarray):
+        self.blocks = (counts, means, m2)
+        self.levels = []
+        size = len(counts)
+        half = 1
+        while half < size:
+            padded = -(-size // (2 * half)) * 2 * half
+            level = tuple(np.zeros(padded, dtype=dtype) for dtype in (np.int64, np.float64, np.float64))
+            source = [np.zeros(padded, dtype=dtype) for dtype in (np.int64, np.float64, np.float64)]
+            for target, values in zip(source, (counts, means, m2)):
+                target[:size] = values
+            n, mean, block_m2 = (values.reshape(-1, 2, half) for values in source)
+            for side, flip in ((0, True), (1, False)):
+                side_n, side_mean, side_m2 = n[:, side], mean[:, side], block_m2[:, side]
+                if flip:  # left half: runs grow leftwards from the middle
+                    side_n, side_mean, side_m2 = side_n[:, ::-1], side_mean[:, ::-1], side_m2[:, ::-1]
+                # Running sums around the run's first block mean (the block next to the middle)
+                anchor = side_mean[:, :1]
+                offsets = side_mean - anchor
+                run_n = np.cumsum(side_n, axis=1)
+                run_sum = np.cumsum(side_n * offsets, axis=1)
+                run_sq = np.cumsum(side_m2 + side_n * offsets * offsets, axis=1)
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    run_offset = np.where(run_n > 0, run_sum / run_n, 0.0)
+                run_mean = anchor + run_offset
+                run_m2 = np.maximum(run_sq - run_n * run_offset * run_offset, 0.0)
+                if flip:
+                    run_n, run_mean, run_m2 = run_n[:, ::-1], run_mean[:, ::-1], run_m2[:, ::-1]
+                for target, values in zip(level, (run_n, run_mean, run_m2)):
+                    target.reshape(-1, 2, half)[:, side] = values
+            self.levels.append(level)
+            half *= 2
+
+    def _entry(self, arrays, i: int) -> tuple[int, float, float]:
+        return int(arrays[0][i]), float(arrays[1][i]), float(arrays[2][i])
+
+    def query(self, l: int, r: int) -> tuple[int, float, float]:
+        # (count, mean, M2) of blocks l..r inclusive
+        if l == r:
+            return self._entry(self.blocks, l)
+        level = self.levels[(l ^ r).bit_length() - 1]
+        return _merge_moments(self._entry(level, l), self._entry(level, r))
+
+
+def _sparse_table(values: np.ndarray, reduce) -> list[np.ndarray]:
+    # table[k][i] = reduce(values[i:i + 2**k])
+    table = [values]
+    width = 1
+    while 2 * width <= len(values):
+        previous = table[-1]
+        table.append(reduce(previous[:-width], previous[width:]))
+        width *= 2
+    return table
+
+
+def _sparse_query(table: list[np.ndarray], lo: int, hi: int, reduce) -> float:
+    # reduce over values[lo:hi] (hi > lo) with two overlapping power of two ranges
+    level = (hi - lo).bit_length() - 1
+    return reduce(table[level][lo], table[level][hi - (1 << level)])
+
+
+def _local_datetime64(moment: datetime) -> np.datetime64:
+    # Series timestamps are naive local times (datetime.fromtimestamp): aware bounds are converted to that clock
+    if moment.tzinfo is not None:
+        moment = moment.astimezone().replace(tzinfo=None)
+    return np.datetime64(moment, 'ns')
+
+
+def window_bounds(timestamps: np.ndarray, start: datetime | None, end: datetime | None) -> tuple[int, int]:
+    # [lo, hi) of the sorted datetime64[ns] timestamps with start <= timestamp <= end (rule of analytics.trim_date_range)
+    lo = 0 if start is None else int(np.searchsorted(timestamps, _local_datetime64(start), side='left'))
+    hi = len(timestamps) if end is None else int(np.searchsorted(timestamps, _local_datetime64(end), side='right'))
+    return lo, max(lo, hi)
+
+
+def window_mask(timestamps: np.ndarray, start: datetime | None, end: datetime | None) -> np.ndarray:
+    # Same rule as window_bounds, for timestamps that are not sorted
+    keep = np.ones(len(timestamps), dtype=bool)
+    if start is not None:
+        keep &= timestamps >= _local_datetime64(start)
+    if end is not None:
+        keep &= timestamps <= _local_datetime64(end)
+    return keep
+
+
+class RangeStatsIndex:
+    def __init__(self, timestamps: np.ndarray, prices: np.ndarray, block_size: int = RANGE_BLOCK_SIZE):
+        timestamps = np.asarray(timestamps, dtype='datetime64[ns]')
+        prices = np.asarray(prices, dtype=np.float64)
+        if len(timestamps) != len(prices):
+            raise ValueError('timestamps and prices must have the same length')
+        if len(timestamps) > 1 and np.any(timestamps[1:] < timestamps[:-1]):
+            order = np.argsort(timestamps, kind='stable')
+            timestamps, prices = timestamps[order], prices[order]
+        self.timestamps = timestamps
+        self.prices = prices
+        self.block_size = block_size
+
+        counts, means, m2 = _block_moments(prices, block_size)
+        self._moments = _DisjointSparseMoments(counts, means, m2)
+        # NaN never wins a min / max
+        has_nan = bool(np.isnan(prices).any())
+        self._for_min = np.where(np.isnan(prices), np.inf, prices) if has_nan else prices
+        self._for_max = np.where(np.isnan(prices), -np.inf, prices) if has_nan else prices
+        whole = slice(0, len(counts) * block_size)
+        self._min_table = _sparse_table(self._for_min[whole].reshape(-1, block_size).min(axis=1), np.minimum)
+        self._max_table = _sparse_table(self._for_max[whole].reshape(-1, block_size).max(axis=1), np.maximum)
+
+    @classmethod
+    def from_market_chart(cls, marketchartdata: MarketChartData) -> 'RangeStatsIndex':
+        return cls(timestamp_array(marketchartdata), price_array(marketchartdata))
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    def bounds(self, start: datetime | None, end: datetime | None) -> tuple[int, int]:
+        # [lo, hi) of the points with start <= timestamp <= end (same rule as analytics.trim_date_range)
+        return window_bounds(self.timestamps, start, end)
+
+    def _whole_blocks(self, lo: int, hi: int) -> tuple[int, int]:
+        # first and last+1 whole blocks inside [lo, hi)
+        return -(-lo // self.block_size), hi // self.block_size
+
+    def _range_moments(self, lo: int, hi: int) -> tuple[int, float, float]:
+        first_block, last_block = self._whole_blocks(lo, hi)
+        if first_block >= last_block:
+            return _direct_moments(self.prices[lo:hi])
+        head = _direct_moments(self.prices[lo:first_block * self.block_size])
+        tail = _direct_moments(self.prices[last_block * self.block_size:hi])
+        return _merge_moments(_merge_moments(head, self._moments.query(first_block, last_block - 1)), tail)
+
+    def _range_extreme(self, lo: int, hi: int, values: np.ndarray, table: list[np.ndarray], reduce) -> float:
+        first_block, last_block = self._whole_blocks(lo, hi)
+        if first_block >= last_block:
+            return float(reduce.reduce(values[lo:hi]))
+        result = _sparse_query(table, first_block, last_block, reduce)
+        for edge in (values[lo:first_block * self.block_size], values[last_block * self.block_size:hi]):
+            if len(edge):
+                result = reduce(result, reduce.reduce(edge))
+        return float(result)
+
+    def stats(self, start: datetime | None = None, end: datetime | None = None) -> dict:
+        """
+        Statistics of the prices between start and end (inclusive), same keys as calculate_price_stats.
+        """
+        lo, hi = self.bounds(start, end)
+        if hi == lo:
+            raise ValueError('No prices in the requested window')
+        count, mean, m2 = self._range_moments(lo, hi)
+        if not count:
+            raise ValueError('All prices of the window are NaN, cannot compute statistics.')
+        variance = m2 / (count - 1) if count > 1 else float('nan')
+        first, last = self.prices[lo], self.prices[hi - 1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            percent_change = (last - first) / first * 100
+
+        return {
+            "count": count,
+            "min_price": self._range_extreme(lo, hi, self._for_min, self._min_table, np.minimum),
+            "max_price": self._range_extreme(lo, hi, self._for_max, self._max_table, np.maximum),
+            "mean_price": float(mean),
+            "median_price": _median(self.prices[lo:hi], count),
+            "std_dev": float(np.sqrt(variance)),
+            "variance": float(variance),
+            "first_price": float(first),
+            "last_price": float(last),
+            "percent_change": float(percent_change),
+        }
+
+
+_RANGE_INDEXES: 'weakref.WeakKeyDictionary[MarketChartData, RangeStatsIndex]' = weakref.WeakKeyDictionary()
+_range_indexes_lock = threading.Lock()
+
+
+def range_stats_index(marketchartdata: MarketChartData) -> RangeStatsIndex:
+    '''
+    Index of a market chart, built on first use. It lives as long as the MarketChartData object, i.e. as long as the
+    series stays in the market chart cache, and is shared by every request served from that cache entry.
+    '''
+    with _range_indexes_lock:
+        index = _RANGE_INDEXES.get(marketchartdata)
+    if index is None:
+        index = RangeStatsIndex.from_market_chart(marketchartdata)  # concurrent first requests may both build it
+        with _range_indexes_lock:
+            index = _RANGE_INDEXES.setdefault(marketchartdata, index)
+    return index
+
+
+# -------- Running statistics -------- #
+#
+# The market chart cache refreshes a series every minute or so: the new version is the old one minus a few of its
+# oldest prices (the window of `days` slides) plus a few new ones. RunningPriceStats keeps the /stats figures of such
+# a series up to date in O(k) for k dropped + added prices instead of a pass over the whole history:
+#   - count / mean / M2: Welford's running moments, a batch of prices at a time (Chan's merge), and the reverse merge
+#     for the dropped prices. Removals lose precision over time, so the moments are recomputed from the prices once
+#     as many prices have been removed as the series holds (amortized O(1) per price);
+#   - min / max: monotonic queues of (position, price), decreasing prices for the max, increasing for the min. A new
+#     price pops the back prices it dominates, dropped positions leave by the front, the front is the extremum.
+# The last price is kept out of both: it is the live price that providers revise until the next one arrives.
+# The median has no running version: it is still a selection over the prices, done once per version.
+
+
+def _unmerge_moments(total: tuple[int, float, float], part: tuple[int, float, float]) -> tuple[int, float, float]:
+    # (count, mean, M2) of `total` without the sample `part` it contains (inverse of _merge_moments)
+    n, mean, m2 = total
+    n_part, mean_part, m2_part = part
+    if not n_part:
+        return total
+    rest = n - n_part
+    if rest <= 0:
+        return _EMPTY_MOMENTS
+    rest_mean = (n * mean - n_part * mean_part) / rest
+    delta = mean_part - rest_mean
+    return rest, rest_mean, max(m2 - m2_part - delta * delta * n_part * rest / n, 0.0)
+
+
+def _monotonic_queue(prices: np.ndarray, offset: int, sign: float) -> deque:
+    # (position, price) of the prices that are strictly above (sign=1) / below (sign=-1) every later price
+    keys = np.where(np.isnan(prices), -np.inf, sign * prices)
+    later = np.empty(len(keys))
+    if len(keys):
+        later[:-1] = np.maximum.accumulate(keys[::-1])[::-1][1:]
+        later[-1] = -np.inf
+    positions = np.flatnonzero(keys > later)
+    return deque(zip((positions + offset).tolist(), prices[positions].tolist()))
+
+
+class RunningPriceStats:
+    """
+    /stats figures of a series that slides forward (see advance). Not thread safe: the owner serializes calls.
+    """
+
+    def __init__(self, prices: np.ndarray, block_size: int = STATS_BLOCK_SIZE):
+        self.block_size = block_size
+        self._rebuild(np.asarray(prices, dtype=np.float64), 0)
+
+    def _rebuild(self, prices: np.ndarray, offset: int) -> None:
+        settled = prices[:-1]
+        count, _, _, mean, m2 = _fused_moments(settled, self.block_size)
+        self.prices = prices
+        self._offset = offset    # absolute position of prices[0]
+        self._moments = (count, mean, m2)
+        self._removed = 0        # prices removed from the moments since they were last computed in full
+        self._maxima = _monotonic_queue(settled, offset, 1.0)
+        self._minima = _monotonic_queue(settled, offset, -1.0)
+        self._stats: dict | None = None
+
+    def _push(self, position: int, price: float) -> None:
+        if price != price:  # NaN
+            return
+        while self._maxima and self._maxima[-1][1] <= price:
+            self._maxima.pop()
+        self._maxima.append((position, price))
+        while self._minima and self._minima[-1][1] >= price:
+            self._minima.pop()
+        self._minima.append((position, price))
+
+    def advance(self, dropped: int, prices: np.ndarray) -> None:
+        """
+        Move to the next version of the series: its first prices are the current ones from position `dropped`,
+        except the last current price (it may have been revised). Callers check that (see app/services/online.py).
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        kept = len(self.prices) - 1 - dropped     # settled prices of the current version still in the new one
+        added = prices[kept:-1]                   # newly settled: the revised last price and the new ones but the last
+        if kept <= 0 or dropped + len(added) > len(prices):
+            self._rebuild(prices, self._offset + dropped)
+            return
+
+        self._moments = _unmerge_moments(self._moments, _direct_moments(self.prices[:dropped]))
+        self._removed += dropped
+        if self._removed > self._moments[0]:
+            count, _, _, mean, m2 = _fused_moments(prices[:kept], self.block_size)
+            self._moments, self._removed = (count, mean, m2), 0
+        self._moments = _merge_moments(self._moments, _direct_moments(added))
+
+        self._offset += dropped
+        for queue in (self._maxima, self._minima):
+            while queue and queue[0][0] < self._offset:
+                queue.popleft()
+        start = self._offset + kept
+        for i, price in enumerate(added.tolist()):
+            self._push(start + i, price)
+        self.prices = prices
+        self._stats = None
+
+    def stats(self) -> dict:
+        # Same dict as calculate_price_stats(self.prices), computed once per version
+        if self._stats is not None:
+            return self._stats
+        prices = self.prices
+        if not len(prices):
+            raise ValueError('Cannot compute stats on an empty price series')
+        moments = self._moments
+        low = self._minima[0][1] if self._minima else np.inf
+        high = self._maxima[0][1] if self._maxima else -np.inf
+        last = float(prices[-1])
+        if last == last:
+            moments = _merge_moments(moments, (1, last, 0.0))
+            low, high = min(low, last), max(high, last)
+        count, mean, m2 = moments
+        if not count:
+            raise ValueError('All prices are NaN, cannot compute statistics.')
+        self._stats = stats_from_moments(count, float(low), float(high), float(mean), m2, _median(prices, count),
+                                         prices[0], prices[-1])
+        return self._stats
@@ -0,0 +1,149 @@
+import os
+from datetime import datetime
+from typing import Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+
+from app.services.analytics import parse_window
+from app.services.indicators import IndicatorEngine, pct_change
+from app.services.stats import window_bounds, window_mask
+
+# Streaming (chunked) version of the enriched market chart: returns, rolling means, volatility and normalization,
+# computed chunk by chunk so that the enriched frame of a long series (millions of minute prices, five extra columns)
+# never exists as a whole. Memory is bounded by the chunk size: every chunk is computed, serialized, dropped.
+#
+# State carried from one chunk to the next:
+#   - the first price of the series (acum_pct_change, normalization);
+#   - the tail of the previous chunks that the next one still reaches: the last max(window) prices for count
+#     windows, the prices of the last `duration` for time windows, one more price for the returns, plus the last
+#     valid price before them (pct_change pads over missing prices).
+# Each chunk is computed on tail + chunk and the tail rows are dropped, so every value is the one of the batch pipeline
+# (app/domain/services.compute_enriched_market_chart without resampling), up to rounding.
+
+STREAM_CHUNK_SIZE = int(os.getenv('STREAM_CHUNK_SIZE', 100_000))
+
+
+def _is_sorted(timestamps: np.ndarray) -> bool:
+    return len(timestamps) < 2 or not np.any(timestamps[1:] < timestamps[:-1])
+
+
+def trim_arrays(timestamps: np.ndarray, prices: np.ndarray, start: datetime | None,
+                end: datetime | None) -> tuple[np.ndarray, np.ndarray]:
+    # Points with start <= timestamp <= end (analytics.trim_date_range on arrays): views if the series is sorted
+    if start is None and end is None:
+        return timestamps, prices
+    if _is_sorted(timestamps):
+        lo, hi = window_bounds(timestamps, start, end)
+        return timestamps[lo:hi], prices[lo:hi]
+    keep = window_mask(timestamps, start, end)
+    return timestamps[keep], prices[keep]
+
+
+class StreamingEnricher:
+    def __init__(
+        self,
+        window_sizes: Iterable[int | str] = (),
+        volatility_windows: Iterable[int | str] = (),
+        normalize_base: float | None = None,
+        price_key: str = 'price',
+    ):
+        self.rolling_windows = {str(w): parse_window(w) for w in window_sizes}
+        self.volatility_windows = {str(w): parse_window(w) for w in volatility_windows}
+        self.normalize_base = normalize_base
+        self.price_key = price_key
+        self._first_price: float | None = None
+        self._tail_timestamps = np.empty(0, dtype='datetime64[ns]')
+        self._tail_prices = np.empty(0, dtype=np.float64)
+        self._last_valid_price = np.nan  # last non missing price before the tail: pct_change pads missing prices
+
+    def check(self, timestamps: np.ndarray, prices: np.ndarray) -> None:
+        # The errors of the batch pipeline (compute_indicators, normalize_series) for the whole series, raised before
+        # the first chunk is computed
+        for window in self.rolling_windows.values():
+            if isinstance(window, int) and window > len(prices):
+                raise ValueError('window_size cannot be larger than the number of data points in the DataFrame')
+        windows = list(self.rolling_windows.values()) + list(self.volatility_windows.values())
+        if any(isinstance(w, np.timedelta64) for w in windows) and not _is_sorted(timestamps):
+            raise ValueError('Time windows need rows sorted by timestamp')
+        if self.normalize_base is not None and len(prices) and prices[0] == 0:
+            raise ValueError(f'Cannot normalize series of {self.price_key} if first element is Zero')
+
+    def _tail_start(self, timestamps: np.ndarray) -> int:
+        # First index of the rows that the windows of the next chunk can still reach
+        start = len(timestamps) - 1  # the previous price, for the returns
+        for window in list(self.rolling_windows.values()) + list(self.volatility_windows.values()):
+            if isinstance(window, np.timedelta64):
+                # one more than the window: the oldest return of the window needs the price before it
+                reach = int(np.searchsorted(timestamps, timestamps[-1] - window, side='right')) - 1
+            else:
+                reach = len(timestamps) - window
+            start = min(start, reach)
+        return max(start, 0)
+
+    def process(self, timestamps: np.ndarray, prices: np.ndarray) -> pd.DataFrame:
+        '''
+        Enriched rows of the next chunk of the series (chunks in time order). Same columns as the batch pipeline.
+        '''
+        timestamps = np.asarray(timestamps, dtype='datetime64[ns]')
+        prices = np.asarray(prices, dtype=np.float64)
+        if not len(prices):
+            return pd.DataFrame(columns=['timestamp', self.price_key])
+        if self._first_price is None:
+            self._first_price = float(prices[0])
+
+        carried = len(self._tail_prices)
+        all_timestamps = np.concatenate((self._tail_timestamps, timestamps))
+        all_prices = np.concatenate((self._tail_prices, prices))
+        first = self._first_price
+        returns = pct_change(np.concatenate(([self._last_valid_price], all_prices)))[1:]
+
+        columns = {
+            'timestamp': all_timestamps,
+            self.price_key: all_prices,
+            'pct_change': returns * 100,
+            'acum_pct_change': (all_prices - first) / first * 100,
+        }
+        if self.rolling_windows:
+            engine = IndicatorEngine(all_prices, all_timestamps)
+            engine.rolling(self.rolling_windows.values())
+            for label, window in self.rolling_windows.items():
+                columns[f'rolling_mean_{label}'] = engine.rolling_mean(window)
+        if self.volatility_windows:
+            engine = IndicatorEngine(returns, all_timestamps)
+            engine.rolling(self.volatility_windows.values())
+            for label, window in self.volatility_windows.items():
+                columns[f'volatility_{label}'] = engine.rolling_std(window)
+        if self.normalize_base is not None:
+            if first == 0:
+                raise ValueError(f'Cannot normalize series of {self.price_key} if first element is Zero')
+            base = self.normalize_base
+            columns[f'normalized_{self.price_key}_base_{round(float(base), 5)}'] = (all_prices / first) * base
+
+        tail_start = self._tail_start(all_timestamps)
+        dropped = all_prices[:tail_start]
+        valid = np.flatnonzero(~np.isnan(dropped))
+        if len(valid):
+            self._last_valid_price = dropped[valid[-1]]
+        self._tail_timestamps = all_timestamps[tail_start:].copy()
+        self._tail_prices = all_prices[tail_start:].copy()
+        return pd.DataFrame({name: values[carried:] for name, values in columns.items()})
+
+
+def iter_enriched_chunks(
+    timestamps: np.ndarray,
+    prices: np.ndarray,
+    enricher: StreamingEnricher,
+    chunk_size: int = STREAM_CHUNK_SIZE,
+) -> Iterator[pd.DataFrame]:
+    if chunk_size <= 0:
+        raise ValueError(f'Chunk size must be positive. Got {chunk_size}')
+    for start in range(0, len(prices), chunk_size):
+        yield enricher.process(timestamps[start:start + chunk_size], prices[start:start + chunk_size])
+
+
+def ndjson_lines(chunks: Iterable[pd.DataFrame]) -> Iterator[str]:
+    # One JSON object per row and per line (NaN -> null, ISO timestamps), one string per chunk
+    for chunk in chunks:
+        if len(chunk):
+            yield chunk.to_json(orient='records', lines=True, date_format='iso')
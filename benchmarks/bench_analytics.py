@@ -0,0 +1,194 @@
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from app.domain import services
+from app.domain.entities import Symbol, Currency, Provider, ResampleFrequency, PricePoint, MarketChartData
+from app.services.analytics import (
+    calculate_stats, compute_returns, compute_rolling_window, resample_price_series,
+    trim_date_range, normalize_series, compute_volatility,
+)
+
+# Micro-benchmarks of the analytics layer on synthetic price series (1e3 .. 1e7 points).
+#
+#   python -m benchmarks.bench_analytics                                   # run, print, write benchmarks/results.json
+#   python -m benchmarks.bench_analytics --compare benchmarks/baseline.json  # ... and flag regressions (exit code 1)
+#   python -m benchmarks.bench_analytics --output benchmarks/baseline.json   # refresh the baseline (same machine!)
+#
+# Every case is timed `repeats` times on a fresh copy of the input (the analytics functions add columns in place);
+# the copy is not timed. The median is compared to the baseline, the min is kept as the noise-free reference.
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+# The pipeline builds one PricePoint per point (like a provider answer): 1e7 of them need several GB
+DEFAULT_PIPELINE_MAX_SIZE = 1_000_000
+DEFAULT_TOLERANCE = 0.25      # +25% median time = regression
+NOISE_FLOOR_SECONDS = 0.001   # below this, differences are timer noise
+WINDOW = 20
+LARGE_WINDOW_FRACTION = 10  # large window case: a tenth of the series (1e6 points -> 100k points window)
+
+
+def synthetic_price_frame(size: int, seed: int = 42) -> pd.DataFrame:
+    # Geometric random walk sampled every 5 minutes: the shape of a CoinGecko 1-day answer, just longer
+    rng = np.random.default_rng(seed)
+    log_returns = rng.normal(0.0, 0.002, size)
+    prices = 30_000.0 * np.exp(np.cumsum(log_returns))
+    timestamps = pd.date_range('2000-01-01', periods=size, freq='5min')
+    return pd.DataFrame({'timestamp': timestamps, 'price': prices})
+
+
+def synthetic_market_chart(size: int) -> MarketChartData:
+    df = synthetic_price_frame(size)
+    timestamps = pd.DatetimeIndex(df['timestamp']).to_pydatetime()
+    points = [PricePoint(ts, price) for ts, price in zip(timestamps, df['price'].tolist())]
+    return MarketChartData(Symbol.BTC, Currency.USD, points)
+
+
+def _trim(df: pd.DataFrame) -> None:
+    first, last = df['timestamp'].iloc[0], df['timestamp'].iloc[-1]
+    trim_date_range(df, first + (last - first) / 4, last - (last - first) / 4)
+
+
+# name -> function run on a fresh copy of the synthetic frame
+ANALYTICS_CASES: dict[str, Callable[[pd.DataFrame], object]] = {
+    'calculate_stats':        lambda df: calculate_stats(df, 'price'),
+    'compute_returns':        lambda df: compute_returns(df, 'price'),
+    'compute_rolling_window': lambda df: compute_rolling_window(df, WINDOW, 'price'),
+    'compute_rolling_window_large': lambda df: compute_rolling_window(df, max(1, len(df) // LARGE_WINDOW_FRACTION), 'price'),
+    'resample_price_series':  lambda df: resample_price_series(df, 'price', ResampleFrequency.DAILY),
+    'trim_date_range':        _trim,
+    'normalize_series':       lambda df: normalize_series(df, 'price', 100.0),
+    'compute_volatility':     lambda df: compute_volatility(df, 'price', WINDOW),
+}
+
+
+def _repeats_for(size: int) -> int:
+    return max(3, min(50, 1_000_000 // size))
+
+
+def time_case(setup: Callable[[], object], run: Callable[[object], object], repeats: int) -> dict:
+    timings = []
+    for _ in range(repeats):
+        arg = setup()
+        start = time.perf_counter()
+        run(arg)
+        timings.append(time.perf_counter() - start)
+    return {'min_s': min(timings), 'median_s': statistics.median(timings), 'repeats': repeats}
+
+
+def bench_analytics(sizes: tuple[int, ...]) -> dict[str, dict[str, dict]]:
+    results: dict[str, dict[str, dict]] = {name: {} for name in ANALYTICS_CASES}
+    for size in sizes:
+        frame = synthetic_price_frame(size)
+        for name, run in ANALYTICS_CASES.items():
+            results[name][str(size)] = time_case(frame.copy, run, _repeats_for(size))
+    return results
+
+
+def bench_pipeline(sizes: tuple[int, ...]) -> dict[str, dict]:
+    # compute_enriched_market_chart with every option but resampling, provider call replaced by the synthetic series
+    results: dict[str, dict] = {}
+    original_fetch = services.fetch_market_chart
+    try:
+        for size in sizes:
+            chart = synthetic_market_chart(size)
+            services.fetch_market_chart = lambda *args, **kwargs: chart
+            run = lambda _: services.compute_enriched_market_chart(
+                Symbol.BTC, Currency.USD, 1, Provider.COINGECKO,
+                window_size=WINDOW, volatility_window=WINDOW, normalize_base=100.0)
+            results[str(size)] = time_case(lambda: None, run, _repeats_for(size))
+    finally:
+        services.fetch_market_chart = original_fetch
+    return results
+
+
+def run_benchmarks(sizes: tuple[int, ...], pipeline_max_size: int = DEFAULT_PIPELINE_MAX_SIZE) -> dict:
+    results = bench_analytics(sizes)
+    results['compute_enriched_market_chart'] = bench_pipeline(tuple(s for s in sizes if s <= pipeline_max_size))
+    return {
+        'meta': {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'machine': f'{platform.system()} {platform.machine()} {platform.processor()}'.strip(),
+        },
+        'results': results,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float = DEFAULT_TOLERANCE) -> list[dict]:
+    # One row per (case, size) present in both runs; `regression` is True when the median got slower than allowed
+    rows = []
+    for name, by_size in current['results'].items():
+        for size, result in by_size.items():
+            reference = baseline.get('results', {}).get(name, {}).get(size)
+            if reference is None:
+                continue
+            ratio = result['median_s'] / reference['median_s'] if reference['median_s'] > 0 else float('inf')
+            slower_by = result['median_s'] - reference['median_s']
+            rows.append({
+                'case': name, 'size': int(size), 'baseline_s': reference['median_s'], 'current_s': result['median_s'],
+                'ratio': ratio, 'regression': ratio > 1 + tolerance and slower_by > NOISE_FLOOR_SECONDS,
+            })
+    return rows
+
+
+def _format_results(report: dict) -> str:
+    lines = [f"{'case':32} {'size':>10} {'median ms':>12} {'min ms':>10}"]
+    for name, by_size in report['results'].items():
+        for size, result in by_size.items():
+            lines.append(f"{name:32} {int(size):>10} {result['median_s'] * 1000:>12.3f} {result['min_s'] * 1000:>10.3f}")
+    return '\n'.join(lines)
+
+
+def _format_comparison(rows: list[dict]) -> str:
+    lines = [f"{'case':32} {'size':>10} {'baseline ms':>12} {'current ms':>12} {'ratio':>7}"]
+    for row in rows:
+        flag = '  REGRESSION' if row['regression'] else ''
+        lines.append(f"{row['case']:32} {row['size']:>10} {row['baseline_s'] * 1000:>12.3f} "
+                     f"{row['current_s'] * 1000:>12.3f} {row['ratio']:>7.2f}{flag}")
+    return '\n'.join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark the analytics layer on synthetic price series.')
+    parser.add_argument('--sizes', default=','.join(str(s) for s in DEFAULT_SIZES),
+                        help='Comma separated series lengths (1e5 notation accepted).')
+    parser.add_argument('--pipeline-max-size', type=float, default=DEFAULT_PIPELINE_MAX_SIZE,
+                        help='Largest size used for the full compute_enriched_market_chart pipeline.')
+    parser.add_argument('--output', default='benchmarks/results.json', help='Where to write the results (JSON).')
+    parser.add_argument('--compare', metavar='BASELINE', help='Baseline JSON to compare against.')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Allowed slowdown of the median before flagging a regression (0.25 = +25%%).')
+    args = parser.parse_args(argv)
+
+    sizes = tuple(int(float(s)) for s in args.sizes.split(',') if s.strip())
+    report = run_benchmarks(sizes, int(args.pipeline_max_size))
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(_format_results(report))
+    print(f'\nresults written to {args.output}')
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        rows = compare(report, baseline, args.tolerance)
+        print(f"\ncompared to {args.compare} ({baseline.get('meta', {}).get('created', '?')}):")
+        print(_format_comparison(rows))
+        regressions = [row for row in rows if row['regression']]
+        if regressions:
+            print(f'\n{len(regressions)} regression(s) over +{args.tolerance:.0%}')
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,120 @@
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+# Local stand-in for the CoinGecko endpoints used by the app, for load tests without network:
+#   /coins/{id}/market_chart?vs_currency=&days=        same granularity as CoinGecko (5 min / hourly / daily)
+#   /coins/{id}/market_chart/range?vs_currency=&from=&to=  hourly
+#   /simple/price?ids=&vs_currencies=
+# Every answer waits `latency_seconds` (+ uniform jitter) like a remote API would.
+#
+#   python -m benchmarks.coingecko_stand_in --port 8900 --latency 0.15
+#   COINGECKO_BASE_URL=http://127.0.0.1:8900 uvicorn app.api.main:app
+
+
+def _granularity_seconds(days: float) -> int:
+    if days <= 1:
+        return 300
+    if days <= 90:
+        return 3600
+    return 86_400
+
+
+def market_chart_payload(from_s: float, to_s: float, step_s: int, points: int | None = None, seed: int = 0) -> dict:
+    # Random walk with the three series of a real answer ([ms, value] pairs). `points` overrides the granularity
+    if points is None:
+        points = max(1, int((to_s - from_s) // step_s))
+    rng = np.random.default_rng(seed)
+    ms = np.linspace(from_s * 1000, to_s * 1000, points).round()
+    prices = 30_000.0 * np.exp(np.cumsum(rng.normal(0.0, 0.002, points)))
+    caps = prices * 19_500_000
+    volumes = np.abs(rng.normal(2.5e10, 5e9, points))
+    return {key: np.column_stack((ms, series)).tolist()
+            for key, series in (('prices', prices), ('market_caps', caps), ('total_volumes', volumes))}
+
+
+class CoinGeckoStandIn:
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency_seconds: float = 0.0,
+                 jitter_seconds: float = 0.0, points: int | None = None):
+        self.latency_seconds = latency_seconds
+        self.jitter_seconds = jitter_seconds
+        self.points = points
+        self.requests = 0
+        self._lock = threading.Lock()
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                status, body = stand_in.answer(url.path, query)
+                payload = json.dumps(body, separators=(',', ':')).encode()
+                time.sleep(stand_in.latency_seconds + random.uniform(0.0, stand_in.jitter_seconds))
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.url = f'http://{host}:{self.server.server_address[1]}'
+        self._thread = threading.Thread(target=self.server.serve_forever, name='coingecko-stand-in', daemon=True)
+
+    def answer(self, path: str, query: dict) -> tuple[int, object]:
+        with self._lock:
+            self.requests += 1
+        parts = path.strip('/').split('/')
+        now_s = time.time()
+        try:
+            if len(parts) == 3 and parts[0] == 'coins' and parts[2] == 'market_chart':
+                days = float(query['days'])
+                return 200, market_chart_payload(now_s - days * 86_400, now_s, _granularity_seconds(days), self.points)
+            if len(parts) == 4 and parts[0] == 'coins' and parts[2:] == ['market_chart', 'range']:
+                return 200, market_chart_payload(float(query['from']), float(query['to']), 3600, self.points)
+            if parts == ['simple', 'price']:
+                currencies = query['vs_currencies'].split(',')
+                return 200, {coin: {**{c: 30_000.0 for c in currencies}, 'last_updated_at': int(now_s)}
+                             for coin in query['ids'].split(',')}
+        except (KeyError, ValueError) as e:
+            return 400, {'error': f'bad query: {e}'}
+        return 404, {'error': 'coin not found'}
+
+    def __enter__(self) -> 'CoinGeckoStandIn':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description='Serve CoinGecko-like market_chart payloads locally.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency', type=float, default=0.1, help='Seconds waited before every answer.')
+    parser.add_argument('--jitter', type=float, default=0.05, help='Extra uniform random latency, in seconds.')
+    parser.add_argument('--points', type=int, default=None, help='Fixed number of points per answer.')
+    args = parser.parse_args(argv)
+    with CoinGeckoStandIn(args.host, args.port, args.latency, args.jitter, args.points) as stand_in:
+        print(f'CoinGecko stand-in on {stand_in.url} (Ctrl+C to stop)')
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+# Cold start figures of the API process: wall time of `import app.api.main` in fresh interpreters, the heaviest
+# modules (python -X importtime, cumulative) and whether pandas / matplotlib were loaded at import time.
+#
+#   python -m benchmarks.import_time --runs 5 --top 15
+
+HEAVY_MODULES = ('numpy', 'pandas', 'matplotlib', 'fastapi', 'httpx')
+
+_PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+'''
+
+
+def parse_importtime(stderr: str) -> dict[str, float]:
+    # `-X importtime` lines: "import time: self [us] | cumulative | <indent>module" -> {module: cumulative seconds}
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        cumulative[name.strip()] = int(cumulative_us) / 1e6
+    return cumulative
+
+
+def measure(module: str = 'app.api.main') -> dict:
+    probe = _PROBE.format(module=module, heavy=HEAVY_MODULES)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', probe], capture_output=True, text=True, check=True)
+    measured = json.loads(result.stdout.strip().splitlines()[-1])
+    measured['modules'] = parse_importtime(result.stderr)
+    return measured
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Measure the import time (cold start) of the API process.')
+    parser.add_argument('--module', default='app.api.main')
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters to measure (the median is reported).')
+    parser.add_argument('--top', type=int, default=10, help='Heaviest modules to list.')
+    parser.add_argument('--output', help='Write the report as JSON.')
+    args = parser.parse_args(argv)
+
+    runs = [measure(args.module) for _ in range(args.runs)]
+    last = runs[-1]
+    report = {
+        'module': args.module,
+        'median_seconds': statistics.median(r['seconds'] for r in runs),
+        'min_seconds': min(r['seconds'] for r in runs),
+        'heavy_modules_loaded': last['loaded'],
+        'top_modules': sorted(last['modules'].items(), key=lambda item: item[1], reverse=True)[:args.top],
+    }
+    print(f"import {args.module}: median {report['median_seconds'] * 1000:.0f} ms, "
+          f"min {report['min_seconds'] * 1000:.0f} ms over {args.runs} runs")
+    print(f"heavy modules loaded: {', '.join(report['heavy_modules_loaded']) or 'none'}")
+    for name, seconds in report['top_modules']:
+        print(f'  {seconds * 1000:8.1f} ms  {name}')
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
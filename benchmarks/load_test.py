@@ -0,0 +1,193 @@
+import argparse
+import itertools
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import numpy as np
+
+from benchmarks.coingecko_stand_in import CoinGeckoStandIn
+
+# End-to-end load test of the four market_chart endpoints, no real network:
+#   1. a CoinGecko stand-in (benchmarks/coingecko_stand_in.py) runs in this process
+#   2. the app runs in a uvicorn subprocess with COINGECKO_BASE_URL pointing at the stand-in
+#   3. `concurrency` client threads call the endpoints for `duration` seconds
+# Report: throughput, p50/p90/p99 latency and error rate per endpoint, CPU seconds of the app process per request.
+#
+#   python -m benchmarks.load_test --concurrency 16 --duration 30 --latency 0.15 --days 1,30,365
+#
+# The app cache is disabled by default (every request reaches the stand-in): use --cache-ttl to measure warm runs.
+
+ENDPOINTS = {
+    'market_chart': '/api/v1/market_chart/',
+    'stats':        '/api/v1/market_chart/stats',
+    'dataframe':    '/api/v1/market_chart/dataframe',
+    'plot':         '/api/v1/market_chart/{symbol}/{currency}/plot-enriched',
+}
+SYMBOLS = ('bitcoin', 'ethereum', 'ripple')
+CURRENCIES = ('usd', 'eur')
+
+
+def _request_for(endpoint: str, symbol: str, currency: str, days: int) -> tuple[str, dict]:
+    params = {'days': days, 'provider': 'coingecko'}
+    if endpoint == 'plot':
+        return ENDPOINTS[endpoint].format(symbol=symbol, currency=currency), {**params, 'window_size': 10, 'volatility_window': 5}
+    params.update(symbol=symbol, currency=currency)
+    if endpoint == 'dataframe':
+        params.update(window_size=10, volatility_window=5, normalize_base=100)
+    return ENDPOINTS[endpoint], params
+
+
+def process_cpu_seconds(pid: int) -> float | None:
+    # utime + stime of a process (Linux /proc), None elsewhere
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def summarize(samples: list[tuple[str, float, int]], elapsed_seconds: float) -> dict[str, dict]:
+    # samples: (endpoint, latency seconds, status code; 0 = transport error)
+    report = {}
+    for endpoint in sorted({s[0] for s in samples}):
+        latencies = np.array([s[1] for s in samples if s[0] == endpoint])
+        statuses = [s[2] for s in samples if s[0] == endpoint]
+        errors = sum(1 for status in statuses if status == 0 or status >= 400)
+        p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+        report[endpoint] = {
+            'requests': len(statuses),
+            'throughput_rps': len(statuses) / elapsed_seconds,
+            'p50_ms': p50 * 1000, 'p90_ms': p90 * 1000, 'p99_ms': p99 * 1000, 'max_ms': latencies.max() * 1000,
+            'error_rate': errors / len(statuses),
+            'statuses': {str(code): statuses.count(code) for code in sorted(set(statuses))},
+        }
+    return report
+
+
+def _wait_ready(base_url: str, process: subprocess.Popen, timeout_seconds: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout_seconds
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'the app exited with code {process.returncode}')
+        try:
+            if httpx.get(f'{base_url}/metrics', timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f'the app did not answer on {base_url} within {timeout_seconds}s')
+
+
+def start_app(port: int, stand_in_url: str, cache_ttl: float, workers: int) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        'COINGECKO_BASE_URL': stand_in_url,
+        'PREFETCH_ENABLED': 'false',
+        # The stand-in has no rate limit: don't let the scheduler be the bottleneck being measured
+        'COINGECKO_RATE_LIMIT_PER_MINUTE': '1000000',
+        'COINGECKO_RATE_BURST': '1000',
+        'MARKET_CHART_CACHE_TTL_SECONDS': str(cache_ttl),
+        'MARKET_CHART_CACHE_GRACE_SECONDS': '0',
+    }
+    command = [sys.executable, '-m', 'uvicorn', 'app.api.main:app', '--host', '127.0.0.1', '--port', str(port),
+               '--log-level', 'warning', '--workers', str(workers)]
+    return subprocess.Popen(command, env=env)
+
+
+def run_load(base_url: str, endpoints: list[str], days: list[int], concurrency: int, duration_seconds: float) -> tuple[list, float]:
+    # The endpoint changes fastest so that every endpoint gets load from the start
+    combos = itertools.cycle(itertools.product(SYMBOLS, CURRENCIES, days, endpoints))
+    combos_lock = threading.Lock()
+    samples: list[tuple[str, float, int]] = []
+    samples_lock = threading.Lock()
+    stop_at = time.monotonic() + duration_seconds
+
+    def worker() -> None:
+        with httpx.Client(base_url=base_url, timeout=60.0) as client:
+            while time.monotonic() < stop_at:
+                with combos_lock:
+                    symbol, currency, n_days, endpoint = next(combos)
+                path, params = _request_for(endpoint, symbol, currency, n_days)
+                start = time.perf_counter()
+                try:
+                    status = client.get(path, params=params).status_code
+                except httpx.HTTPError:
+                    status = 0
+                with samples_lock:
+                    samples.append((endpoint, time.perf_counter() - start, status))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    return samples, time.perf_counter() - start
+
+
+def _format_report(report: dict) -> str:
+    lines = [f"{'endpoint':14} {'requests':>9} {'rps':>8} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'errors':>7}"]
+    for endpoint, r in report['endpoints'].items():
+        lines.append(f"{endpoint:14} {r['requests']:>9} {r['throughput_rps']:>8.1f} {r['p50_ms']:>9.1f} "
+                     f"{r['p90_ms']:>9.1f} {r['p99_ms']:>9.1f} {r['error_rate']:>7.1%}")
+    cpu = report['app_cpu_ms_per_request']
+    lines.append(f"\napp CPU per request: {'n/a' if cpu is None else f'{cpu:.2f} ms'}, "
+                 f"stand-in requests: {report['stand_in_requests']}")
+    return '\n'.join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Load test the market_chart endpoints against a local CoinGecko stand-in.')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent client threads.')
+    parser.add_argument('--duration', type=float, default=20.0, help='Seconds of load.')
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS), help=f"Comma separated subset of {', '.join(ENDPOINTS)}.")
+    parser.add_argument('--days', default='1,30,365', help='Comma separated `days` values to rotate through.')
+    parser.add_argument('--latency', type=float, default=0.1, help='Stand-in latency per answer, in seconds.')
+    parser.add_argument('--jitter', type=float, default=0.05, help='Extra uniform random stand-in latency, in seconds.')
+    parser.add_argument('--points', type=int, default=None, help='Fixed number of points per stand-in answer.')
+    parser.add_argument('--cache-ttl', type=float, default=0.0, help='MARKET_CHART_CACHE_TTL_SECONDS of the app (0 = cold).')
+    parser.add_argument('--port', type=int, default=8765, help='Port of the app under test.')
+    parser.add_argument('--workers', type=int, default=1, help='uvicorn worker processes (CPU is measured for 1 worker only).')
+    parser.add_argument('--output', help='Write the report as JSON.')
+    args = parser.parse_args(argv)
+
+    endpoints = [e.strip() for e in args.endpoints.split(',') if e.strip()]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f'unknown endpoints: {sorted(unknown)}')
+    days = [int(d) for d in args.days.split(',') if d.strip()]
+    base_url = f'http://127.0.0.1:{args.port}'
+
+    with CoinGeckoStandIn(latency_seconds=args.latency, jitter_seconds=args.jitter, points=args.points) as stand_in:
+        app = start_app(args.port, stand_in.url, args.cache_ttl, args.workers)
+        try:
+            _wait_ready(base_url, app)
+            cpu_before = process_cpu_seconds(app.pid) if args.workers == 1 else None
+            samples, elapsed = run_load(base_url, endpoints, days, args.concurrency, args.duration)
+            cpu_after = process_cpu_seconds(app.pid) if cpu_before is not None else None
+        finally:
+            app.terminate()
+            app.wait(timeout=10)
+
+    report = {
+        'config': {**vars(args), 'endpoints': endpoints, 'days': days},
+        'elapsed_seconds': elapsed,
+        'endpoints': summarize(samples, elapsed),
+        'app_cpu_ms_per_request': (cpu_after - cpu_before) * 1000 / len(samples)
+                                  if cpu_after is not None and samples else None,
+        'stand_in_requests': stand_in.requests,
+    }
+    print(_format_report(report))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -19,6 +19,7 @@ Functions to test:
     compute_volatility
 
 '''
+import numpy as np
 import pytest
 from datetime import datetime
 import pandas as pd
@@ -267,6 +268,21 @@ def test_trim_date_range():
     assert len(trimmed_empty_df) == 0
     #side: original df should remain unchanged
     assert len(df) == 8
+
+#test trim_date_range: always a new frame, writes don't leak into the original
+def test_trim_date_range_is_a_new_frame():
+    df = convert_market_chart_data_to_dataframe(build_sample_marketchartdata_2())
+    for start, end in ((datetime(2025, 11, 19), datetime(2025, 11, 22)), (None, None)):
+        trimmed_df = trim_date_range(df, start, end)
+        assert trimmed_df is not df
+        assert not np.shares_memory(trimmed_df['price'].to_numpy(), df['price'].to_numpy())
+        compute_returns(trimmed_df, 'price')
+        trimmed_df.loc[trimmed_df.index[0], 'price'] = -1.0
+        assert list(df.columns) == ['timestamp', 'price']
+        assert df['price'].iloc[2] == 3.0 and df['price'].iloc[0] != -1.0
+    #edge: unsorted timestamps fall back to a mask, same rows
+    shuffled = df.iloc[::-1]
+    assert sorted(trim_date_range(shuffled, datetime(2025, 11, 19), datetime(2025, 11, 22))['price']) == [3.0, 4.0, 5.0, 6.0]
     
 #test normalize_series
 def test_normalize_series():
@@ -1,6 +1,7 @@
 # tests/test_api_market_chart.py
 
 from datetime import datetime, timedelta
+import json
 import pandas as pd
 import pytest
 from fastapi import FastAPI
@@ -115,7 +116,7 @@ def test_get_market_chart_stats_success(monkeypatch):
         def from_dict(cls, dict_stats: dict) -> 'StatsResponse':
             return cls(**dict_stats) #cleaner and professional way to do it
     '''
-    def _fake_compute_market_chart_stats(symbol, currency, days, provider) -> dict:
+    def _fake_compute_market_chart_stats(symbol, currency, days, provider, start=None, end=None) -> dict:
         return {
             "count": days,
             "min_price": 100.0,
@@ -152,7 +153,7 @@ def test_get_market_chart_stats_success(monkeypatch):
 # Test error handling for BusinessComputationError
 def test_get_market_chart_stats_computation_error(monkeypatch):
     # Patch compute_market_chart_stats to raise BusinessComputationError
-    def _raise_computation_error(symbol, currency, days, provider):
+    def _raise_computation_error(symbol, currency, days, provider, start=None, end=None):
         raise domain_errors.BusinessComputationError("Error computing statistics from market chart data.")
     
     monkeypatch.setattr(api_market_chart,"compute_market_chart_stats",_raise_computation_error)
@@ -222,6 +223,27 @@ def test_get_market_chart_dataframe_success(monkeypatch):
     assert data["rows"][0][1] == 100.0
     assert data["rows"][-1][1] == 120.0
 
+# Indicator parameters are repeatable query parameters (several windows in one request)
+def test_get_market_chart_dataframe_indicator_lists(monkeypatch):
+    received = {}
+
+    def fake_enriched(**kwargs):
+        received.update(kwargs)
+        return pd.DataFrame({"timestamp": [datetime(2023, 1, 1)], "price": [100.0]})
+
+    monkeypatch.setattr(api_market_chart, "compute_enriched_market_chart", fake_enriched)
+
+    response = client.get(
+        "/market_chart/dataframe",
+        params=[("symbol", "bitcoin"), ("currency", "usd"), ("days", 3), ("provider", "coingecko"),
+                ("window_size", 5), ("window_size", "7D"), ("ema_span", 12), ("rsi_period", 14), ("macd", "true"),
+                ("donchian_window", "30D")],
+    )
+    assert response.status_code == 200
+    assert received["window_size"] == ["5", "7D"] and received["donchian_window"] == ["30D"]
+    assert received["ema_span"] == [12] and received["rsi_period"] == [14] and received["macd"] is True
+    assert received["volatility_window"] is None and received["bollinger_window"] is None
+
 def test_get_market_chart_dataframe_computation_error(monkeypatch):
     """
     If compute_enriched_market_chart raises BusinessComputationError,
@@ -247,4 +269,65 @@ def test_get_market_chart_dataframe_computation_error(monkeypatch):
     )
 
     assert response.status_code == 500
-    assert response.json()["detail"] == "Computation failed"
\ No newline at end of file
+    assert response.json()["detail"] == "Computation failed"
+
+# The streamed dataframe: one JSON record per line, same values as the domain computes, errors before the stream
+def test_stream_market_chart_dataframe(monkeypatch):
+    from app.domain import services as domain_services
+    monkeypatch.setattr(domain_services, "fetch_market_chart", lambda symbol, currency, days, provider: _build_fake_marketchartdata(5))
+
+    params = {"symbol": "bitcoin", "currency": "usd", "days": 5, "provider": "coingecko", "window_size": 2}
+    response = client.get("/market_chart/dataframe/stream", params=params)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["price"] for row in rows] == [100.0, 110.0, 120.0, 130.0, 140.0]
+    assert rows[0]["pct_change"] is None and rows[0]["rolling_mean_2"] is None
+    assert rows[1]["rolling_mean_2"] == 105.0 and rows[-1]["acum_pct_change"] == 40.0
+    assert rows[0]["timestamp"].startswith("2023-01-01T00:00:00")
+
+    response = client.get("/market_chart/dataframe/stream", params={**params, "window_size": 10})
+    assert response.status_code == 500
+
+# Test error handling for BusinessProviderRateLimitedError -> 429 + Retry-After
+def test_get_market_chart_rate_limited(monkeypatch):
+    def _raise_rate_limited(symbol, currency, days, provider):
+        raise domain_errors.BusinessProviderRateLimitedError("Rate limit reached", retry_after=2.5)
+
+    monkeypatch.setattr(api_market_chart, "fetch_market_chart", _raise_rate_limited)
+
+    response = client.get(
+        "/market_chart/",
+        params={"symbol": "bitcoin", "currency": "usd", "days": 5, "provider": "coingecko"},
+    )
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "3"
+
+# Test the request deadline: X-Request-Timeout sets the budget, BusinessDeadlineExceededError -> 504
+def test_get_market_chart_deadline_header_and_504(monkeypatch):
+    from app.domain.deadline import current_deadline
+    budgets = []
+
+    def _fake_fetch(symbol, currency, days, provider):
+        budgets.append(current_deadline().remaining())
+        raise domain_errors.BusinessDeadlineExceededError("Request deadline exceeded")
+
+    monkeypatch.setattr(api_market_chart, "fetch_market_chart", _fake_fetch)
+
+    response = client.get(
+        "/market_chart/",
+        params={"symbol": "bitcoin", "currency": "usd", "days": 5, "provider": "coingecko"},
+        headers={"X-Request-Timeout": "2"},
+    )
+    assert response.status_code == 504
+    assert 0 < budgets[0] <= 2
+
+    # Non-finite budgets are rejected before the route runs
+    for value in ("nan", "inf", "-inf"):
+        response = client.get(
+            "/market_chart/",
+            params={"symbol": "bitcoin", "currency": "usd", "days": 5, "provider": "coingecko"},
+            headers={"X-Request-Timeout": value},
+        )
+        assert response.status_code == 422
+    assert len(budgets) == 1
@@ -0,0 +1,40 @@
+from datetime import datetime
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.routes.quotes import router as quotes_router
+from app.api.routes import quotes as api_quotes
+from app.domain.entities import Symbol, Currency, LatestQuote
+from app.domain import errors as domain_errors
+
+app = FastAPI()
+app.include_router(quotes_router)
+client = TestClient(app)
+
+
+def test_get_latest_quotes_success(monkeypatch):
+    def _fake_fetch_latest_quotes(symbols, currencies, provider):
+        return [LatestQuote(s, c, 10.0, datetime(2024, 1, 1)) for s in symbols for c in currencies]
+
+    monkeypatch.setattr(api_quotes, "fetch_latest_quotes", _fake_fetch_latest_quotes)
+
+    response = client.get(
+        "/quotes/latest",
+        params=[("symbol", "bitcoin"), ("symbol", "ethereum"), ("currency", "usd"), ("currency", "eur"), ("provider", "coingecko")],
+    )
+    assert response.status_code == 200
+    quotes = response.json()["quotes"]
+    assert len(quotes) == 4
+    assert {(q["symbol"], q["currency"]) for q in quotes} == {
+        ("bitcoin", "usd"), ("bitcoin", "eur"), ("ethereum", "usd"), ("ethereum", "eur"),
+    }
+
+def test_get_latest_quotes_no_data(monkeypatch):
+    def _raise_no_data_error(symbols, currencies, provider):
+        raise domain_errors.BusinessNoDataError("No quotes")
+
+    monkeypatch.setattr(api_quotes, "fetch_latest_quotes", _raise_no_data_error)
+
+    response = client.get("/quotes/latest", params={"symbol": "bitcoin", "currency": "usd", "provider": "coingecko"})
+    assert response.status_code == 404
+    assert response.json()["detail"] == "No quotes"
@@ -0,0 +1,25 @@
+from benchmarks.bench_analytics import ANALYTICS_CASES, compare, run_benchmarks
+
+'''
+Tests:
+1. A tiny benchmark run covers every analytics case and the pipeline
+2. compare() flags slowdowns above the tolerance, ignores timer noise and cases missing from the baseline
+'''
+
+def test_run_benchmarks_covers_every_case():
+    report = run_benchmarks((500,), pipeline_max_size=500)
+    assert set(report['results']) == set(ANALYTICS_CASES) | {'compute_enriched_market_chart'}
+    for by_size in report['results'].values():
+        assert by_size['500']['median_s'] >= by_size['500']['min_s'] > 0
+    assert report['meta']['pandas']
+
+def test_compare_flags_regressions():
+    baseline = {'results': {'a': {'1000': {'median_s': 0.010}}, 'b': {'1000': {'median_s': 0.0001}}}}
+    current = {'results': {
+        'a': {'1000': {'median_s': 0.020}, '10': {'median_s': 1.0}},  # 2x slower / not in the baseline
+        'b': {'1000': {'median_s': 0.0004}},                          # 4x slower but below the noise floor
+    }}
+    rows = {(row['case'], row['size']): row for row in compare(current, baseline, tolerance=0.25)}
+    assert set(rows) == {('a', 1000), ('b', 1000)}
+    assert rows[('a', 1000)]['regression'] and rows[('a', 1000)]['ratio'] == 2.0
+    assert not rows[('b', 1000)]['regression']
@@ -0,0 +1,44 @@
+import httpx
+
+from app.domain.entities import Symbol, Currency
+from app.infrastructure import coingecko
+from benchmarks.coingecko_stand_in import CoinGeckoStandIn
+from benchmarks.load_test import summarize
+
+'''
+Tests:
+1. The stand-in answers market_chart (CoinGecko granularity), range and simple price like CoinGecko
+2. The infra layer can be pointed at the stand-in through COINGECKO_BASE_URL
+3. summarize() computes percentiles, throughput and error rates per endpoint
+'''
+
+def test_stand_in_answers_like_coingecko():
+    with CoinGeckoStandIn(points=None) as stand_in:
+        chart = httpx.get(f'{stand_in.url}/coins/bitcoin/market_chart', params={'vs_currency': 'usd', 'days': 1}).json()
+        ranged = httpx.get(f'{stand_in.url}/coins/bitcoin/market_chart/range',
+                           params={'vs_currency': 'usd', 'from': 0, 'to': 10 * 3600}).json()
+        quotes = httpx.get(f'{stand_in.url}/simple/price', params={'ids': 'bitcoin,ethereum', 'vs_currencies': 'usd'}).json()
+        missing = httpx.get(f'{stand_in.url}/unknown')
+
+    assert set(chart) == {'prices', 'market_caps', 'total_volumes'}
+    assert len(chart['prices']) == 288  # 5 minute points for 1 day
+    assert len(ranged['prices']) == 10
+    assert set(quotes) == {'bitcoin', 'ethereum'} and quotes['bitcoin']['usd'] > 0
+    assert missing.status_code == 404
+    assert stand_in.requests == 4
+
+def test_infra_layer_uses_the_stand_in(monkeypatch):
+    with CoinGeckoStandIn(points=50) as stand_in:
+        monkeypatch.setattr(coingecko, 'COINGECKO_BASE_URL', stand_in.url)
+        raw = coingecko.infra_get_raw_market_chart_coingecko(Symbol.BTC, Currency.EUR, 7)
+    assert len(coingecko.infra_clean_raw_market_chart_coingecko(raw)) == 50
+
+def test_summarize_percentiles_and_errors():
+    samples = [('stats', i / 100, 200) for i in range(1, 100)] + [('stats', 2.0, 503), ('plot', 0.5, 0)]
+    report = summarize(samples, elapsed_seconds=10.0)
+    assert report['stats']['requests'] == 100
+    assert report['stats']['throughput_rps'] == 10.0
+    assert abs(report['stats']['p50_ms'] - 505.0) < 1e-6
+    assert report['stats']['error_rate'] == 0.01
+    assert report['stats']['statuses'] == {'200': 99, '503': 1}
+    assert report['plot']['error_rate'] == 1.0
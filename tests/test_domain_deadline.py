@@ -0,0 +1,54 @@
+import time
+import pytest
+
+from app.domain.deadline import Deadline, deadline_scope, current_deadline, remaining_seconds, check_deadline
+from app.domain import errors as errors_domain
+from app.domain import services
+from app.domain.entities import Symbol, Currency, Provider
+from app.infrastructure import errors as errors_infra
+
+'''
+Tests:
+1. remaining_seconds() returns the default without a deadline and caps it with one
+2. deadline_scope() restores the previous deadline on exit
+3. check_deadline() raises BusinessDeadlineExceededError once the budget is spent
+4. fetch_market_chart abandons an expired request before calling the provider
+5. InfrastructureDeadlineExceeded is mapped to BusinessDeadlineExceededError
+'''
+
+def test_remaining_seconds_with_and_without_deadline():
+    assert remaining_seconds(5.0) == 5.0
+    assert remaining_seconds() is None
+    with deadline_scope(Deadline.after(1.0)):
+        assert 0 < remaining_seconds(5.0) <= 1.0
+    with deadline_scope(Deadline.after(10.0)):
+        assert remaining_seconds(5.0) == 5.0
+
+def test_deadline_scope_restores_previous_deadline():
+    outer = Deadline.after(10.0)
+    with deadline_scope(outer):
+        with deadline_scope(Deadline.after(1.0)):
+            assert current_deadline() is not outer
+        assert current_deadline() is outer
+    assert current_deadline() is None
+
+def test_check_deadline_raises_when_expired():
+    check_deadline('no deadline')  # nothing active: never raises
+    with deadline_scope(Deadline(expires_at=time.monotonic() - 0.01)):
+        with pytest.raises(errors_domain.BusinessDeadlineExceededError):
+            check_deadline('fetch')
+
+def test_fetch_market_chart_skips_provider_when_expired(monkeypatch):
+    calls = []
+    monkeypatch.setattr(services, 'infra_get_parsed_market_chart_coingecko', lambda *args: calls.append(args))
+    with deadline_scope(Deadline.after(-1)):
+        with pytest.raises(errors_domain.BusinessDeadlineExceededError):
+            services.fetch_market_chart(Symbol.BTC, Currency.USD, 5, Provider.COINGECKO)
+    assert calls == []
+
+def test_fetch_market_chart_maps_infra_deadline(monkeypatch):
+    def fake_infra(sym, curr, days):
+        raise errors_infra.InfrastructureDeadlineExceeded('no time left')
+    monkeypatch.setattr(services, 'infra_get_parsed_market_chart_coingecko', fake_infra)
+    with pytest.raises(errors_domain.BusinessDeadlineExceededError):
+        services.fetch_market_chart(Symbol.BTC, Currency.USD, 5, Provider.COINGECKO)
@@ -2,7 +2,7 @@ import pytest
 from datetime import datetime
 
 from app.domain.entities import Symbol, Currency, Provider, MarketChartData, PricePoint
-from app.domain.services import fetch_market_chart
+from app.domain.services import fetch_market_chart, fetch_latest_quotes
 from app.domain import errors as errors_domain
 from app.infrastructure import errors as errors_infra
 
@@ -68,6 +68,22 @@ def test_fetch_market_chart_infrastructure_errors(monkeypatch):
         with pytest.raises(errors_domain.BusinessProviderGeneralError):
             fetch_market_chart(Symbol.BTC, Currency.USD, 10, Provider.COINGECKO)
 
+def test_fetch_market_chart_circuit_open_and_not_found(monkeypatch):
+    def mock_circuit_open(sym, curr, days):
+        raise errors_infra.InfrastructureCircuitOpenError('open', retry_after=12.0)
+
+    monkeypatch.setattr('app.domain.services.infra_get_parsed_market_chart_coingecko', mock_circuit_open)
+    with pytest.raises(errors_domain.BusinessProviderUnavailableError) as exc_info:
+        fetch_market_chart(Symbol.BTC, Currency.USD, 10, Provider.COINGECKO)
+    assert exc_info.value.retry_after == 12.0
+
+    def mock_not_found(sym, curr, days):
+        raise errors_infra.InfrastructureExternalApiNotFound('404')
+
+    monkeypatch.setattr('app.domain.services.infra_get_parsed_market_chart_coingecko', mock_not_found)
+    with pytest.raises(errors_domain.BusinessProviderNotCompatible):
+        fetch_market_chart(Symbol.BTC, Currency.USD, 10, Provider.COINGECKO)
+
 def test_fetch_market_chart_success(monkeypatch):   
     def mock_infra_get_parsed_market_chart_coingecko(sym, curr, days):
         points = [
@@ -91,4 +107,27 @@ def test_fetch_market_chart_success(monkeypatch):
     assert data.points[0].price == 30000.0
     assert data.points[1].timestamp == datetime(2023, 1, 2, 0, 0)
     assert data.points[2].price == 32000.0
-           
\ No newline at end of file
+           
+def test_fetch_latest_quotes_validation_and_no_data(monkeypatch):
+    with pytest.raises(errors_domain.BusinessValidationError):
+        fetch_latest_quotes([], [Currency.USD], Provider.COINGECKO)
+    with pytest.raises(errors_domain.BusinessProviderNotCompatible):
+        fetch_latest_quotes([Symbol.BTC], [Currency.USD], Provider.__UNSUPPORTED__)
+
+    monkeypatch.setattr(
+        'app.domain.services.infra_get_parsed_latest_quotes_coingecko',
+        lambda symbols, currencies: []
+    )
+    with pytest.raises(errors_domain.BusinessNoDataError):
+        fetch_latest_quotes([Symbol.BTC], [Currency.USD], Provider.COINGECKO)
+
+def test_fetch_market_chart_other_providers_use_the_adapter_registry(monkeypatch):
+    calls = []
+    def fake_infra(sym, curr, days, provider):
+        calls.append(provider)
+        return MarketChartData(sym, curr, [PricePoint(timestamp=datetime(2024, 1, 1), price=1.0)])
+    monkeypatch.setattr('app.domain.services.infra_get_parsed_market_chart', fake_infra)
+
+    data = fetch_market_chart(Symbol.BTC, Currency.EUR, 5, Provider.KRAKEN, hedged=False)
+    assert calls == [Provider.KRAKEN]
+    assert data.points[0].price == 1.0
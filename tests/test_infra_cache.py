@@ -0,0 +1,106 @@
+import pytest
+
+from app.infrastructure.cache import StaleWhileRevalidateCache, NegativeCache
+from app.infrastructure.errors import (
+    InfrastructureExternalApiTimeout,
+    InfrastructureExternalApiMalformedResponse,
+    InfrastructureExternalApiNotFound,
+    InfrastructureProviderNotCompatibleError,
+)
+from app.infrastructure.scheduler import RequestPriority
+
+'''
+Tests:
+1. Fresh entries are served from cache without calling the provider
+2. Within the grace window the stale value is served and refreshed in the background (with PREFETCH priority)
+3. After the grace window the caller waits for a synchronous refresh
+4. If the provider fails, stale data is served up to max_stale, then the error is raised
+5. Non-transient errors (malformed data, 404) are never hidden behind stale data
+'''
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeProvider:
+    def __init__(self):
+        self.calls = []
+        self.error = None
+
+    def __call__(self, priority):
+        self.calls.append(priority)
+        if self.error is not None:
+            raise self.error
+        return f'value-{len(self.calls)}'
+
+
+def _build_cache(clock):
+    return StaleWhileRevalidateCache('test', ttl_seconds=10, grace_seconds=20, max_stale_seconds=100, clock=clock)
+
+def test_fresh_hit_does_not_call_provider():
+    clock, provider = FakeClock(), FakeProvider()
+    cache = _build_cache(clock)
+    assert cache.get_or_fetch('k', provider) == 'value-1'
+    clock.now += 5
+    assert cache.get_or_fetch('k', provider) == 'value-1'
+    assert len(provider.calls) == 1
+    assert cache.stats.hits == 1
+    assert cache.stats.misses == 1
+
+def test_stale_within_grace_is_served_and_refreshed_in_background():
+    clock, provider = FakeClock(), FakeProvider()
+    cache = _build_cache(clock)
+    cache.get_or_fetch('k', provider)
+    clock.now += 15  # expired, but inside the grace window
+    assert cache.get_or_fetch('k', provider) == 'value-1'
+    cache.wait_for_refreshes(timeout=5)
+    assert provider.calls == [RequestPriority.INTERACTIVE, RequestPriority.PREFETCH]
+    assert cache.get_or_fetch('k', provider) == 'value-2'
+    assert cache.stats.stale_hits == 1
+
+def test_expired_after_grace_refreshes_synchronously():
+    clock, provider = FakeClock(), FakeProvider()
+    cache = _build_cache(clock)
+    cache.get_or_fetch('k', provider)
+    clock.now += 40
+    assert cache.get_or_fetch('k', provider) == 'value-2'
+    assert cache.stats.misses == 2
+
+def test_provider_failure_serves_stale_up_to_hard_limit():
+    clock, provider = FakeClock(), FakeProvider()
+    cache = _build_cache(clock)
+    cache.get_or_fetch('k', provider)
+    provider.error = InfrastructureExternalApiTimeout('down')
+    clock.now += 50
+    assert cache.get_or_fetch('k', provider) == 'value-1'
+    assert cache.stats.stale_on_error == 1
+    clock.now += 60  # 110s old: beyond max_stale
+    with pytest.raises(InfrastructureExternalApiTimeout):
+        cache.get_or_fetch('k', provider)
+
+@pytest.mark.parametrize('error', [InfrastructureExternalApiMalformedResponse('bad json'),
+                                   InfrastructureExternalApiNotFound('404 unknown id')])
+def test_non_transient_errors_are_raised(error):
+    clock, provider = FakeClock(), FakeProvider()
+    cache = _build_cache(clock)
+    cache.get_or_fetch('k', provider)
+    provider.error = error
+    clock.now += 50
+    with pytest.raises(type(error)):
+        cache.get_or_fetch('k', provider)
+    assert cache.stats.stale_on_error == 0
+
+def test_negative_cache_remembers_deterministic_errors():
+    clock = FakeClock()
+    negative = NegativeCache(ttl_seconds=60, clock=clock)
+    negative.check('k')  # nothing remembered: no error
+    negative.remember('k', InfrastructureProviderNotCompatibleError('unknown id'))
+    with pytest.raises(InfrastructureProviderNotCompatibleError, match='unknown id'):
+        negative.check('k')
+    assert negative.hits == 1
+    clock.now += 61
+    negative.check('k')  # expired
@@ -0,0 +1,74 @@
+import pytest
+
+from app.infrastructure.circuit_breaker import CircuitBreaker, CircuitState
+from app.infrastructure.errors import (
+    InfrastructureCircuitOpenError,
+    InfrastructureExternalApiTimeout,
+    InfrastructureExternalApiNotFound,
+)
+
+'''
+Tests:
+1. The breaker opens after `failure_threshold` consecutive failures and then fails fast
+2. After the recovery timeout a half-open trial is allowed: success closes, failure re-opens
+3. Deterministic errors (404...) don't trip the breaker
+'''
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _fail():
+    raise InfrastructureExternalApiTimeout('timeout')
+
+def _build(clock):
+    return CircuitBreaker('test', failure_threshold=3, recovery_timeout_seconds=30, clock=clock)
+
+def test_breaker_opens_and_fails_fast():
+    clock = FakeClock()
+    breaker = _build(clock)
+    for _ in range(3):
+        with pytest.raises(InfrastructureExternalApiTimeout):
+            breaker.call(_fail)
+    assert breaker.state is CircuitState.OPEN
+
+    calls = []
+    with pytest.raises(InfrastructureCircuitOpenError) as exc_info:
+        breaker.call(lambda: calls.append(1))
+    assert calls == []  # the provider was not called at all
+    assert exc_info.value.retry_after == 30
+    assert breaker.short_circuited == 1
+
+def test_breaker_half_open_trial():
+    clock = FakeClock()
+    breaker = _build(clock)
+    for _ in range(3):
+        with pytest.raises(InfrastructureExternalApiTimeout):
+            breaker.call(_fail)
+
+    # Failed trial: open again for another recovery period
+    clock.now += 30
+    assert breaker.state is CircuitState.HALF_OPEN
+    with pytest.raises(InfrastructureExternalApiTimeout):
+        breaker.call(_fail)
+    assert breaker.state is CircuitState.OPEN
+
+    # Successful trial: closed
+    clock.now += 30
+    assert breaker.call(lambda: 'ok') == 'ok'
+    assert breaker.state is CircuitState.CLOSED
+
+def test_breaker_ignores_deterministic_errors():
+    breaker = _build(FakeClock())
+
+    def _not_found():
+        raise InfrastructureExternalApiNotFound('404')
+
+    for _ in range(5):
+        with pytest.raises(InfrastructureExternalApiNotFound):
+            breaker.call(_not_found)
+    assert breaker.state is CircuitState.CLOSED
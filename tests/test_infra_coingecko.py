@@ -1,10 +1,15 @@
-from app.infrastructure.coingecko import infra_clean_raw_market_chart_coingecko, infra_get_raw_market_chart_coingecko
-from app.domain.entities import PricePoint
+from app.infrastructure.coingecko import infra_clean_raw_market_chart_coingecko, infra_get_raw_market_chart_coingecko, infra_get_raw_simple_price_coingecko
+from app.infrastructure import coingecko
+from app.infrastructure.batcher import MicroBatcher
+from app.domain.entities import PricePoint, LatestQuote
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from app.infrastructure.errors import InfrastructureExternalApiMalformedResponse, InfrastructureExternalApiError
+from app.infrastructure.errors import InfrastructureDeadlineExceeded, InfrastructureExternalApiMalformedResponse, InfrastructureExternalApiError, InfrastructureExternalApiNotFound, InfrastructureRateLimitedError
 import pytest
 import httpx
 from app.domain.entities import Symbol, Currency
+import time
+from app.infrastructure.scheduler import RequestPriority
 
 
 # 1 ) Test cleaner -> infra_clean_raw_market_chart_coingecko
@@ -101,7 +106,7 @@ def test_infra_get_raw_market_chart_coingecko_404(monkeypatch):
     def fake_get_404(url, params=None, timeout=None):
         return FakeResponse_404()  
     monkeypatch.setattr(httpx, "get", fake_get_404)
-    with pytest.raises(InfrastructureExternalApiError): 
+    with pytest.raises(InfrastructureExternalApiNotFound): 
         infra_get_raw_market_chart_coingecko(Symbol.BTC, Currency.USD, 1)   
 
 def test_infra_get_raw_market_chart_coingecko_200_malformed(monkeypatch):
@@ -124,4 +129,172 @@ def test_infra_get_raw_market_chart_coingecko_200_malformed(monkeypatch):
     with pytest.raises(InfrastructureExternalApiMalformedResponse):
         infra_get_raw_market_chart_coingecko(Symbol.BTC, Currency.USD, 1)
         
-        
\ No newline at end of file
+        
+
+# 3 ) Test latest quotes -> infra_get_raw_simple_price_coingecko + MicroBatcher
+
+def test_infra_get_raw_simple_price_coingecko_200(monkeypatch):
+    calls = []
+
+    class FakeResponse_200:
+        status_code = 200
+
+        def json(self):
+            return {"bitcoin": {"usd": 50000.0, "eur": 46000.0, "last_updated_at": 1732032000}}
+
+    def fake_get_200(url, params=None, timeout=None):
+        calls.append((url, params))
+        return FakeResponse_200()
+
+    monkeypatch.setattr(httpx, "get", fake_get_200)
+    raw_data = infra_get_raw_simple_price_coingecko(["bitcoin"], ["usd", "eur"])
+    assert raw_data["bitcoin"]["usd"] == 50000.0
+    assert calls[0][0].endswith("/simple/price")
+    assert calls[0][1]["ids"] == "bitcoin"
+    assert calls[0][1]["vs_currencies"] == "usd,eur"
+
+def test_micro_batcher_merges_concurrent_requests():
+    upstream = []
+
+    def fake_fetch(ids, vs_currencies):
+        upstream.append((ids, vs_currencies))
+        return {i: {v: 1.0 for v in vs_currencies} for i in ids}
+
+    batcher = MicroBatcher(fake_fetch, window_seconds=0.2)
+    requests = [(["bitcoin"], ["usd"]), (["ethereum"], ["eur"]), (["ripple", "bitcoin"], ["usd", "jpy"])]
+    with ThreadPoolExecutor(max_workers=len(requests)) as pool:
+        results = list(pool.map(lambda r: batcher.submit(*r), requests))
+
+    # One single upstream call with the union of ids and currencies
+    assert len(upstream) == 1
+    assert upstream[0] == (["bitcoin", "ethereum", "ripple"], ["eur", "jpy", "usd"])
+    # Each caller only receives what it asked for
+    assert results[0] == {"bitcoin": {"usd": 1.0}}
+    assert results[1] == {"ethereum": {"eur": 1.0}}
+    assert results[2] == {"ripple": {"usd": 1.0, "jpy": 1.0}, "bitcoin": {"usd": 1.0, "jpy": 1.0}}
+
+def test_micro_batcher_propagates_errors_to_all_callers():
+    def failing_fetch(ids, vs_currencies):
+        raise InfrastructureExternalApiError("boom")
+
+    batcher = MicroBatcher(failing_fetch, window_seconds=0.0)
+    with pytest.raises(InfrastructureExternalApiError):
+        batcher.submit(["bitcoin"], ["usd"])
+
+def test_micro_batcher_raises_one_exception_per_caller():
+    shared = InfrastructureRateLimitedError("slow down", retry_after=7.0)
+
+    def failing_fetch(ids, vs_currencies):
+        raise shared
+
+    def submit(ids):
+        try:
+            batcher.submit(ids, ["usd"])
+        except InfrastructureRateLimitedError as e:
+            return e
+
+    batcher = MicroBatcher(failing_fetch, window_seconds=0.2)
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        raised = list(pool.map(submit, [["bitcoin"], ["ethereum"], ["ripple"]]))
+
+    assert batcher.upstream_calls == 1
+    assert len({id(e) for e in raised}) == 3 and shared not in raised
+    assert all(e.__cause__ is shared and e.retry_after == 7.0 and str(e) == "slow down" for e in raised)
+
+def test_infra_get_parsed_latest_quotes_coingecko(monkeypatch):
+    def fake_raw(ids, vs_currencies):
+        return {"bitcoin": {"usd": 50000.0, "last_updated_at": 1732032000}, "ripple": {"usd": 2.5}}
+
+    monkeypatch.setattr(coingecko, "infra_get_raw_simple_price_coingecko", fake_raw)
+    quotes = coingecko.infra_get_parsed_latest_quotes_coingecko([Symbol.BTC, Symbol.XRP], [Currency.USD])
+    assert quotes == [
+        LatestQuote(Symbol.BTC, Currency.USD, 50000.0, datetime.fromtimestamp(1732032000)),
+        LatestQuote(Symbol.XRP, Currency.USD, 2.5, None),
+    ]
+
+def test_infra_get_raw_market_chart_coingecko_429_retry_after(monkeypatch):
+    class FakeResponse_429:
+        status_code = 429
+        text = "Too Many Requests"
+        headers = {"Retry-After": "12"}
+
+    monkeypatch.setattr(httpx, "get", lambda url, params=None, timeout=None: FakeResponse_429())
+    with pytest.raises(InfrastructureRateLimitedError) as exc_info:
+        infra_get_raw_market_chart_coingecko(Symbol.BTC, Currency.USD, 1)
+    assert exc_info.value.retry_after == 12.0
+
+def test_infra_get_raw_market_chart_coingecko_uses_remaining_deadline(monkeypatch):
+    from app.domain.deadline import Deadline, deadline_scope
+    timeouts = []
+
+    class FakeResponse_200:
+        status_code = 200
+        def json(self):
+            return {"prices": [[1732032000000, 50000.0]]}
+
+    def fake_get(url, params=None, timeout=None):
+        timeouts.append(timeout)
+        return FakeResponse_200()
+
+    monkeypatch.setattr(httpx, "get", fake_get)
+    with deadline_scope(Deadline.after(1.5)):
+        infra_get_raw_market_chart_coingecko(Symbol.BTC, Currency.USD, 1)
+    assert 0 < timeouts[0] <= 1.5
+
+    # A request that is already out of time never reaches the provider
+    with deadline_scope(Deadline.after(-1)):
+        with pytest.raises(InfrastructureDeadlineExceeded):
+            infra_get_raw_market_chart_coingecko(Symbol.BTC, Currency.USD, 1)
+    assert len(timeouts) == 1
+
+# 4 ) Chunked fetching of long histories -> /market_chart/range + vectorized merge
+
+def test_market_chart_chunk_windows_cover_the_range():
+    now = 1_700_000_000
+    windows = coingecko.market_chart_chunk_windows(now, 91, 90)
+    assert len(windows) == 2
+    assert windows[0][0] == now - 91 * 86_400 and windows[-1][1] == now
+    assert windows[0][1] == windows[1][0]
+    assert all(end - start <= 90 * 86_400 for start, end in windows)
+
+def test_merge_market_chart_chunks_sorted_and_deduplicated():
+    chunks = [
+        {"prices": [[3000, 3.0], [4000, 4.0]]},
+        {"prices": [[1000, 1.0], [2000, 2.0], [3000, 3.0]]},
+        {"prices": []},
+    ]
+    points = coingecko.infra_merge_market_chart_chunks_coingecko(chunks)
+    assert [p.price for p in points] == [1.0, 2.0, 3.0, 4.0]
+    assert points[0].timestamp == datetime.fromtimestamp(1.0)
+    with pytest.raises(InfrastructureExternalApiMalformedResponse):
+        coingecko.infra_merge_market_chart_chunks_coingecko([{"prices": [[1, 2, 3], [4]]}])
+
+def test_long_history_is_fetched_in_concurrent_chunks(monkeypatch):
+    calls = []
+
+    def fake_range(sym, curr, from_s, to_s):
+        calls.append((from_s, to_s))
+        time.sleep(0.05)
+        return {"prices": [[from_s * 1000, float(from_s)], [to_s * 1000, float(to_s)]]}
+
+    monkeypatch.setattr(coingecko, "MARKET_CHART_CHUNKED_FETCH", True)
+    monkeypatch.setattr(coingecko, "infra_get_raw_market_chart_range_coingecko", fake_range)
+    monkeypatch.setattr(coingecko, "_call_coingecko", lambda fn, priority=None: fn())
+    start = time.monotonic()
+    data = coingecko._fetch_parsed_market_chart_coingecko(Symbol.BTC, Currency.USD, 360, RequestPriority.INTERACTIVE)
+    assert len(calls) == 4
+    assert time.monotonic() - start < 0.15  # chunks ran concurrently
+    assert len(data.points) == 5  # 4 windows share 3 boundaries
+    assert [p.price for p in data.points] == sorted(p.price for p in data.points)
+
+# Chunking is opt-in, and histories needing more chunks than the cap keep the single days=N call
+@pytest.mark.parametrize("enabled, days", [(False, 360), (True, 3650)])
+def test_long_history_single_call(monkeypatch, enabled, days):
+    single = []
+    monkeypatch.setattr(coingecko, "MARKET_CHART_CHUNKED_FETCH", enabled)
+    monkeypatch.setattr(coingecko, "infra_get_raw_market_chart_range_coingecko", lambda *args: pytest.fail("chunked"))
+    monkeypatch.setattr(coingecko, "infra_get_raw_market_chart_coingecko",
+                        lambda sym, curr, d: single.append(d) or {"prices": [[1_000, 1.0], [2_000, 2.0]]})
+    monkeypatch.setattr(coingecko, "_call_coingecko", lambda fn, priority=None: fn())
+    data = coingecko._fetch_parsed_market_chart_coingecko(Symbol.BTC, Currency.USD, days, RequestPriority.INTERACTIVE)
+    assert single == [days] and len(data.points) == 2
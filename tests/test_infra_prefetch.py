@@ -0,0 +1,103 @@
+from app.domain.entities import Provider, Symbol, Currency
+from app.infrastructure.cache import AccessTracker, StaleWhileRevalidateCache
+from app.infrastructure import prefetch
+from app.infrastructure.prefetch import Prefetcher
+from app.infrastructure.scheduler import ProviderScheduler, RequestPriority, get_provider_scheduler
+
+'''
+Tests:
+1. AccessTracker ranks keys by decayed frequency (recent traffic weighs more)
+2. Prefetcher refreshes hot keys close to expiry, skips fresh and cold keys
+3. Prefetcher stays within its share of the provider rate budget, counting every upstream call of a refresh (pages)
+'''
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _key(symbol, days=30):
+    return (Provider.COINGECKO, symbol, Currency.USD, days)
+
+def test_access_tracker_decay():
+    clock = FakeClock()
+    tracker = AccessTracker(half_life_seconds=60, clock=clock)
+    for _ in range(4):
+        tracker.record('old')
+    clock.now += 120  # two half-lives: 'old' now weighs 1.0
+    for _ in range(2):
+        tracker.record('new')
+    ranking = tracker.hottest(2)
+    assert [k for k, _ in ranking] == ['new', 'old']
+    assert round(ranking[1][1], 5) == 1.0
+
+def _build(clock, budget_share=1.0):
+    tracker = AccessTracker(half_life_seconds=600, clock=clock)
+    cache = StaleWhileRevalidateCache('test', ttl_seconds=60, grace_seconds=60, max_stale_seconds=600,
+                                      access_tracker=tracker, clock=clock)
+    refreshed = []
+
+    def refresher(key):
+        refreshed.append(key)
+        return cache.refresh(key, lambda priority: (key, priority))
+
+    prefetcher = Prefetcher(cache, tracker, {Provider.COINGECKO: refresher}, interval_seconds=15,
+                            refresh_margin_seconds=20, budget_share=budget_share)
+    return cache, prefetcher, refreshed
+
+def test_prefetcher_refreshes_hot_keys_before_expiry():
+    clock = FakeClock()
+    cache, prefetcher, refreshed = _build(clock)
+    hot, cold = _key(Symbol.BTC), _key(Symbol.XRP)
+    for _ in range(5):
+        cache.get_or_fetch(hot, lambda priority: 'hot')
+    cache.get_or_fetch(cold, lambda priority: 'cold')
+
+    # Everything is still fresh: nothing to do
+    assert prefetcher.run_once() == 0
+    clock.now += 45  # 15s before expiry
+    assert prefetcher.run_once() == 1
+    assert refreshed == [hot]  # the cold key (a single request) is left alone
+    assert cache.peek(hot) == (hot, RequestPriority.PREFETCH)
+
+def test_prefetcher_respects_rate_budget_share():
+    clock = FakeClock()
+    cache, prefetcher, refreshed = _build(clock, budget_share=0.25)
+    keys = [_key(Symbol.BTC, d) for d in (1, 7, 30)]
+    for key in keys:
+        for _ in range(3):
+            cache.get_or_fetch(key, lambda priority: 'v')
+    clock.now += 50
+
+    per_cycle = 0.25 * get_provider_scheduler(Provider.COINGECKO).rate_per_second * 15
+    assert prefetcher.run_once() == int(max(1.0, per_cycle))
+    assert len(refreshed) < len(keys)
+
+
+def test_prefetcher_charges_every_page_of_a_refresh(monkeypatch):
+    clock = FakeClock()
+    scheduler = ProviderScheduler('test', rate_per_second=1.0, capacity=100)
+    monkeypatch.setattr(prefetch, 'get_provider_scheduler', lambda provider: scheduler)
+    tracker = AccessTracker(half_life_seconds=600, clock=clock)
+    cache = StaleWhileRevalidateCache('test', ttl_seconds=60, grace_seconds=60, max_stale_seconds=600,
+                                      access_tracker=tracker, clock=clock)
+
+    def paged_refresher(key):
+        # Like Binance's klines paging: three scheduled upstream calls for one key
+        for _ in range(3):
+            scheduler.acquire(RequestPriority.PREFETCH)
+        return cache.refresh(key, lambda priority: key)
+
+    prefetcher = Prefetcher(cache, tracker, {Provider.COINGECKO: paged_refresher}, interval_seconds=15,
+                            refresh_margin_seconds=20, budget_share=0.4)  # 6 calls per cycle
+    keys = [_key(Symbol.BTC, d) for d in (1, 7, 30, 90, 365)]
+    for key in keys:
+        for _ in range(3):
+            cache.get_or_fetch(key, lambda priority: 'v')
+    clock.now += 50
+
+    assert prefetcher.run_once() == 2
+    assert scheduler.acquired(RequestPriority.PREFETCH) == 6
@@ -0,0 +1,195 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import httpx
+import pytest
+
+from app.domain.entities import Symbol, Currency, Provider, MarketChartData, PricePoint
+from app.infrastructure import binance, kraken
+from app.infrastructure.adapters import ProviderAdapter, points_from_arrays
+from app.infrastructure.binance import BinanceAdapter, infra_get_raw_klines_binance
+from app.infrastructure.kraken import KrakenAdapter, infra_get_raw_ohlc_kraken, kraken_interval
+from app.infrastructure.providers import HedgedMarketChartFetcher, get_provider_adapter
+from app.infrastructure.scheduler import RequestPriority
+from app.infrastructure.errors import (
+    InfrastructureExternalApiError,
+    InfrastructureExternalApiNotFound,
+    InfrastructureExternalApiMalformedResponse,
+    InfrastructureExternalApiTimeout,
+    InfrastructureProviderNotCompatibleError,
+)
+
+'''
+Tests:
+1. Vectorized cleanup sorts, removes duplicated timestamps and non finite prices
+2. Binance klines are parsed from a local HTTP stand-in, long ranges are fetched page by page
+3. Binance "Invalid symbol" (400 -1121, not other 400s) and Kraken "Unknown asset pair" are deterministic not-found errors
+4. Kraken OHLC is parsed whatever the pair key, interval covers the requested days
+5. Registry: unknown providers are not compatible, unsupported pairs are detected before any call
+6. Hedged fetch: fast primary -> no hedge; slow primary -> the hedge answers; both fail -> primary error
+'''
+
+# --- Local HTTP stand-in ---------------------------------------------------------------------------------------------
+
+class _StandIn:
+    # Tiny HTTP server answering GETs with handler(path, query) -> (status, json body)
+    def __init__(self, handler):
+        outer = self
+        self.requests = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                outer.requests.append((url.path, query))
+                status, body = handler(url.path, query)
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _kline(open_ms, close, interval_ms=3_600_000):
+    return [open_ms, '1.0', '2.0', '0.5', str(close), '10.0', open_ms + interval_ms - 1, '0', 1, '0', '0', '0']
+
+
+# --- Tests -----------------------------------------------------------------------------------------------------------
+
+def test_points_from_arrays_sorts_and_dedupes():
+    points = points_from_arrays([30.0, 10.0, 20.0, 10.0, 40.0], [3.0, 1.0, 2.0, 1.5, float('nan')])
+    assert [p.price for p in points] == [1.5, 2.0, 3.0]  # last price wins for the duplicated timestamp
+    assert [p.timestamp.timestamp() for p in points] == [10.0, 20.0, 30.0]
+
+def test_binance_klines_from_local_stand_in(monkeypatch):
+    def handler(path, query):
+        start = int(query['startTime'])
+        if path != '/api/v3/klines' or query['symbol'] != 'BTCEUR':
+            return 400, {'code': -1121, 'msg': 'Invalid symbol.'}
+        if start < 0:
+            return 400, {'code': -1100, 'msg': "Illegal characters found in parameter 'startTime'."}
+        return 200, [_kline(start + i * 3_600_000, 100 + i) for i in range(3)]
+
+    with _StandIn(handler) as stand_in:
+        monkeypatch.setattr(binance, 'BINANCE_BASE_URL', stand_in.url)
+        data = BinanceAdapter().fetch_market_chart(Symbol.BTC, Currency.EUR, 2, RequestPriority.INTERACTIVE)
+        with pytest.raises(InfrastructureExternalApiNotFound):
+            infra_get_raw_klines_binance('NOPEEUR', '1h', 0, 1)
+        with pytest.raises(InfrastructureExternalApiError) as error:  # a bad request, not an unknown pair
+            infra_get_raw_klines_binance('BTCEUR', '1h', -1, 1)
+        assert not isinstance(error.value, InfrastructureExternalApiNotFound)
+
+    assert isinstance(data, MarketChartData)
+    assert [p.price for p in data.points] == [100.0, 101.0, 102.0]
+    assert stand_in.requests[0][1]['interval'] == '1h'
+
+def test_binance_klines_are_paginated(monkeypatch):
+    calls = []
+
+    def fake_raw(pair, interval, start_ms, end_ms, limit=binance.BINANCE_KLINES_LIMIT):
+        calls.append(start_ms)
+        rows = binance.BINANCE_KLINES_LIMIT if len(calls) == 1 else 10
+        return [_kline(start_ms + i * 86_400_000, i, 86_400_000) for i in range(rows)]
+
+    monkeypatch.setattr(binance, 'infra_get_raw_klines_binance', fake_raw)
+    data = BinanceAdapter().fetch_market_chart(Symbol.ETH, Currency.USD, 1500, RequestPriority.INTERACTIVE)
+    assert len(calls) == 2
+    assert calls[1] == calls[0] + 1000 * 86_400_000
+    assert len(data.points) == 1010
+
+def test_kraken_ohlc_parsing_and_errors(monkeypatch):
+    now = time.time()
+    answer = {'error': [], 'result': {
+        'XXBTZUSD': [[int(now) - 7200, '1', '2', '0.5', '50000.5', '1', '1', 3],
+                     [int(now) - 3600, '1', '2', '0.5', '50100.0', '1', '1', 3]],
+        'last': int(now)}}
+
+    class FakeResponse:
+        status_code = 200
+        def __init__(self, body):
+            self.body = body
+        def json(self):
+            return self.body
+
+    monkeypatch.setattr(httpx, 'get', lambda url, params=None, timeout=None: FakeResponse(answer))
+    data = KrakenAdapter().fetch_market_chart(Symbol.BTC, Currency.USD, 1, RequestPriority.INTERACTIVE)
+    assert [p.price for p in data.points] == [50000.5, 50100.0]
+
+    unknown = {'error': ['EQuery:Unknown asset pair'], 'result': {}}
+    monkeypatch.setattr(httpx, 'get', lambda url, params=None, timeout=None: FakeResponse(unknown))
+    with pytest.raises(InfrastructureExternalApiNotFound):
+        infra_get_raw_ohlc_kraken('XBTNOPE', 60, 0)
+
+    assert (kraken_interval(1), kraken_interval(30), kraken_interval(365), kraken_interval(1000)) == (5, 60, 1440, 10080)
+
+def test_kraken_malformed_rows(monkeypatch):
+    bad = {'error': [], 'result': {'XXBTZUSD': [[1, 2], [3]], 'last': 1}}
+    monkeypatch.setattr(kraken, 'infra_get_raw_ohlc_kraken', lambda pair, interval, since: bad)
+    with pytest.raises(InfrastructureExternalApiMalformedResponse):
+        KrakenAdapter().fetch_market_chart(Symbol.BTC, Currency.USD, 1, RequestPriority.INTERACTIVE)
+
+def test_registry_and_supported_pairs():
+    with pytest.raises(InfrastructureProviderNotCompatibleError):
+        get_provider_adapter(Provider.__UNSUPPORTED__)
+    assert get_provider_adapter(Provider.BINANCE).supports(Symbol.BTC, Currency.USD)
+    assert not get_provider_adapter(Provider.BINANCE).supports(Symbol.BTC, Currency.CHF)
+    assert get_provider_adapter(Provider.KRAKEN).supports(Symbol.XRP, Currency.CHF)
+
+
+class _FakeAdapter(ProviderAdapter):
+    def __init__(self, provider, delay=0.0, error=None, price=1.0):
+        super().__init__()
+        self.provider = provider
+        self.delay, self.error, self.price = delay, error, price
+        self.calls = 0
+
+    def _get_cached_market_chart(self, sym, curr, days, priority):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return MarketChartData(sym, curr, [PricePoint(timestamp=None, price=self.price)])
+
+
+def _hedged(primary, secondary):
+    return HedgedMarketChartFetcher({Provider.COINGECKO: primary, Provider.KRAKEN: secondary},
+                                    hedge_order=(Provider.COINGECKO, Provider.KRAKEN), default_delay_seconds=0.05)
+
+def test_hedged_fast_primary_is_not_hedged():
+    primary, secondary = _FakeAdapter(Provider.COINGECKO, price=1.0), _FakeAdapter(Provider.KRAKEN, price=2.0)
+    fetcher = _hedged(primary, secondary)
+    assert fetcher.fetch(Symbol.BTC, Currency.USD, 1, Provider.COINGECKO).points[0].price == 1.0
+    assert secondary.calls == 0 and fetcher.hedges_sent == 0
+
+def test_hedged_slow_primary_uses_the_hedge():
+    primary, secondary = _FakeAdapter(Provider.COINGECKO, delay=0.5, price=1.0), _FakeAdapter(Provider.KRAKEN, price=2.0)
+    fetcher = _hedged(primary, secondary)
+    start = time.monotonic()
+    assert fetcher.fetch(Symbol.BTC, Currency.USD, 1, Provider.COINGECKO).points[0].price == 2.0
+    assert time.monotonic() - start < 0.4
+    assert fetcher.hedges_sent == 1 and fetcher.hedges_won == 1
+
+def test_hedged_both_fail_raises_primary_error():
+    primary = _FakeAdapter(Provider.COINGECKO, delay=0.1, error=InfrastructureExternalApiTimeout('primary'))
+    secondary = _FakeAdapter(Provider.KRAKEN, error=InfrastructureExternalApiNotFound('hedge'))
+    with pytest.raises(InfrastructureExternalApiTimeout, match='primary'):
+        _hedged(primary, secondary).fetch(Symbol.BTC, Currency.USD, 1, Provider.COINGECKO)
@@ -0,0 +1,72 @@
+import httpx
+import pytest
+
+from app.domain.entities import Symbol, Currency
+from app.infrastructure import coingecko, recording
+from app.infrastructure.errors import InfrastructureExternalApiError, InfrastructureExternalApiTimeout
+from app.infrastructure.recording import recording_key
+from benchmarks.coingecko_stand_in import CoinGeckoStandIn
+
+'''
+Tests:
+1. Answers recorded in record mode are replayed identically with no server running
+2. Time parameters are keyed relative to now; other parameters exactly
+3. A request without recording fails like a network error in replay mode
+4. Replayed latency is simulated and bounded by the request timeout
+'''
+
+@pytest.fixture
+def recordings(monkeypatch, tmp_path):
+    monkeypatch.setattr(recording, 'PROVIDER_RECORDING_DIR', str(tmp_path))
+    return tmp_path
+
+
+def test_record_then_replay_offline(monkeypatch, recordings):
+    monkeypatch.setattr(recording, 'PROVIDER_RECORDING_MODE', 'record')
+    with CoinGeckoStandIn(points=30) as stand_in:
+        monkeypatch.setattr(coingecko, 'COINGECKO_BASE_URL', stand_in.url)
+        recorded = coingecko.infra_get_raw_market_chart_coingecko(Symbol.BTC, Currency.EUR, 7)
+    assert len(list(recordings.iterdir())) == 1
+
+    def no_network(*args, **kwargs):
+        raise AssertionError('replay mode must not use the network')
+
+    monkeypatch.setattr(httpx, 'get', no_network)
+    monkeypatch.setattr(recording, 'PROVIDER_RECORDING_MODE', 'replay')
+    replayed = coingecko.infra_get_raw_market_chart_coingecko(Symbol.BTC, Currency.EUR, 7)
+    assert replayed == recorded
+    assert len(coingecko.infra_clean_raw_market_chart_coingecko(replayed)) == 30
+
+
+def test_recording_key_is_relative_for_time_params():
+    now = 1_700_000_000
+    key = recording_key('http://x/range', {'vs_currency': 'usd', 'from': now - 86_400, 'to': now}, now_s=now)
+    one_day_later = recording_key('http://x/range', {'vs_currency': 'usd', 'from': now, 'to': now + 86_400}, now_s=now + 86_400)
+    other_window = recording_key('http://x/range', {'vs_currency': 'usd', 'from': now - 2 * 86_400, 'to': now}, now_s=now)
+    other_currency = recording_key('http://x/range', {'vs_currency': 'eur', 'from': now - 86_400, 'to': now}, now_s=now)
+    assert key == one_day_later
+    assert len({key, other_window, other_currency}) == 3
+    # Binance style milliseconds
+    assert recording_key('u', {'startTime': now * 1000}, now_s=now) == recording_key('u', {'startTime': (now + 60) * 1000}, now_s=now + 60)
+
+
+def test_replay_miss_is_a_provider_error(monkeypatch, recordings):
+    monkeypatch.setattr(recording, 'PROVIDER_RECORDING_MODE', 'replay')
+    with pytest.raises(InfrastructureExternalApiError):
+        coingecko.infra_get_raw_market_chart_coingecko(Symbol.ETH, Currency.USD, 1)
+
+
+def test_replay_latency_and_timeout(monkeypatch, recordings):
+    monkeypatch.setattr(recording, 'PROVIDER_RECORDING_MODE', 'replay')
+    monkeypatch.setattr(recording, 'PROVIDER_REPLAY_LATENCY_SECONDS', 0.05)
+    sleeps = []
+    monkeypatch.setattr(recording.time, 'sleep', sleeps.append)
+    with pytest.raises(recording.ReplayMissError):
+        recording.http_get('http://x/missing', {}, timeout=1.0)
+    assert sleeps == [0.05]
+
+    monkeypatch.setattr(recording, 'PROVIDER_REPLAY_LATENCY_SECONDS', 10.0)
+    monkeypatch.setattr(coingecko, 'COINGECKO_TIMEOUT_SECONDS', 0.2)
+    with pytest.raises(InfrastructureExternalApiTimeout):
+        coingecko.infra_get_raw_market_chart_coingecko(Symbol.ETH, Currency.USD, 1)
+    assert sleeps[-1] == 0.2
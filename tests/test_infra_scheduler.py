@@ -0,0 +1,94 @@
+import threading
+import time
+import pytest
+
+from app.infrastructure.scheduler import ProviderScheduler, RequestPriority, TokenBucket
+from app.infrastructure.errors import InfrastructureRateLimitedError, InfrastructureDeadlineExceeded
+from app.domain.deadline import Deadline, deadline_scope
+
+'''
+Tests:
+1. Token bucket allows bursts up to capacity, then one token every 1/rate seconds
+2. Waiting callers are served by priority (interactive before prefetch)
+3. Callers that cannot get a slot in time are rejected with InfrastructureRateLimitedError
+4. A 429 with Retry-After pauses the scheduler and the call is retried once
+5. Wait times are surfaced in snapshot()
+6. A caller whose request deadline expires while queued gets InfrastructureDeadlineExceeded
+'''
+
+def test_token_bucket_burst_then_rate():
+    bucket = TokenBucket(rate=10.0, capacity=2)
+    now = time.monotonic()
+    for _ in range(2):
+        assert bucket.time_until_available(now) == 0.0
+        bucket.consume()
+    assert bucket.time_until_available(now) == pytest.approx(0.1, abs=1e-3)
+    assert bucket.time_until_available(now + 0.1) == pytest.approx(0.0, abs=1e-6)
+
+def test_scheduler_serves_interactive_before_prefetch():
+    scheduler = ProviderScheduler('test', rate_per_second=20.0, capacity=1)
+    scheduler.acquire()  # empty the bucket: next slot in 50 ms
+    order = []
+
+    def worker(priority, delay):
+        time.sleep(delay)
+        scheduler.acquire(priority)
+        order.append(priority)
+
+    threads = [
+        threading.Thread(target=worker, args=(RequestPriority.PREFETCH, 0.0)),
+        threading.Thread(target=worker, args=(RequestPriority.PREFETCH, 0.005)),
+        threading.Thread(target=worker, args=(RequestPriority.INTERACTIVE, 0.01)),
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # The prefetch callers arrived first but the interactive one jumps the queue
+    assert order[0] == RequestPriority.INTERACTIVE
+    assert order[1:] == [RequestPriority.PREFETCH, RequestPriority.PREFETCH]
+
+def test_scheduler_rejects_when_slot_is_too_far():
+    scheduler = ProviderScheduler('test', rate_per_second=0.1, capacity=1, max_queue_wait_seconds=0.5)
+    scheduler.acquire()
+    with pytest.raises(InfrastructureRateLimitedError) as exc_info:
+        scheduler.acquire()
+    assert exc_info.value.retry_after == pytest.approx(10.0, abs=0.1)
+    assert scheduler.queue_depth() == 0
+
+def test_scheduler_honors_retry_after_and_retries():
+    scheduler = ProviderScheduler('test', rate_per_second=100.0, capacity=5)
+    calls = []
+
+    def upstream():
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            raise InfrastructureRateLimitedError('429', retry_after=0.2)
+        return 'ok'
+
+    assert scheduler.call(upstream) == 'ok'
+    assert len(calls) == 2
+    assert calls[1] - calls[0] >= 0.2
+    snapshot = scheduler.snapshot()
+    assert snapshot['rate_limited_responses'] == 1
+    assert snapshot['priorities']['interactive']['acquired'] == 2
+    assert snapshot['priorities']['interactive']['wait_seconds_max'] >= 0.15
+
+def test_scheduler_gives_up_after_max_retries():
+    scheduler = ProviderScheduler('test', rate_per_second=100.0, capacity=5, max_rate_limit_retries=0)
+
+    def upstream():
+        raise InfrastructureRateLimitedError('429', retry_after=0.0)
+
+    with pytest.raises(InfrastructureRateLimitedError):
+        scheduler.call(upstream)
+
+def test_scheduler_acquire_bounded_by_request_deadline():
+    scheduler = ProviderScheduler('test', rate_per_second=1.0, capacity=1, max_queue_wait_seconds=10.0)
+    scheduler.acquire()  # next slot in 1 s, more than the request has left
+    start = time.monotonic()
+    with deadline_scope(Deadline.after(0.05)):
+        with pytest.raises(InfrastructureDeadlineExceeded):
+            scheduler.acquire()
+    assert time.monotonic() - start < 0.5
+    assert scheduler.queue_depth() == 0
@@ -0,0 +1,100 @@
+import time
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from app.domain.entities import Symbol, Currency, Provider, PricePoint, PricePointSeries
+from app.domain.services import fetch_market_chart
+from app.infrastructure.cache import MARKET_CHART_CACHE
+from app.infrastructure.errors import InfrastructureProviderNotCompatibleError
+from app.infrastructure.providers import HedgedMarketChartFetcher, PROVIDER_ADAPTERS
+from app.infrastructure.scheduler import RequestPriority
+from app.infrastructure.synthetic import SyntheticAdapter, synthetic_timestamps
+from app.services.analytics import convert_market_chart_data_to_dataframe
+
+'''
+Tests:
+1. Same seed and pair -> same prices; another seed or pair -> another path
+2. Length and granularity follow days / interval, the series ends at the last interval before now; timestamps across
+   DST changes are the local times of datetime.fromtimestamp
+3. 10M points are generated in well under a second (loose bound for slow CI machines)
+4. PricePointSeries behaves like a list of PricePoint and converts to a DataFrame without PricePoint objects
+5. Too many points is a not-compatible error
+6. fetch_market_chart(provider=synthetic) goes through the usual path; synthetic is never a hedge
+'''
+
+def _fetch(adapter, days, sym=Symbol.BTC, curr=Currency.USD):
+    return adapter.fetch_market_chart(sym, curr, days, RequestPriority.INTERACTIVE)
+
+
+def test_paths_are_deterministic():
+    prices = _fetch(SyntheticAdapter(seed=1), 30).points.prices
+    assert np.array_equal(prices, _fetch(SyntheticAdapter(seed=1), 30).points.prices)
+    assert not np.array_equal(prices, _fetch(SyntheticAdapter(seed=2), 30).points.prices)
+    assert not np.array_equal(prices, _fetch(SyntheticAdapter(seed=1), 30, Symbol.ETH).points.prices)
+    assert prices[0] == pytest.approx(30_000.0)
+    assert np.all(prices > 0)
+
+
+def test_length_and_granularity():
+    before = time.time()
+    points = _fetch(SyntheticAdapter(interval_seconds=3600), 2).points
+    assert len(points) == 49
+    steps = np.diff(points.timestamps).astype('timedelta64[s]').astype(int)
+    assert np.all(steps == 3600)
+    last = points[-1].timestamp.timestamp()
+    assert before - 3600 <= last <= time.time()
+
+
+@pytest.mark.skipif(not hasattr(time, 'tzset'), reason='needs time.tzset')
+def test_timestamps_across_dst(monkeypatch):
+    monkeypatch.setenv('TZ', 'Europe/Madrid')
+    time.tzset()
+    try:
+        for now in (datetime(2024, 3, 31, 12).timestamp(), datetime(2024, 10, 27, 12).timestamp()):
+            end_s = int(now) // 300 * 300
+            expected = [np.datetime64(datetime.fromtimestamp(end_s - i * 300), 'ns') for i in range(499, -1, -1)]
+            assert synthetic_timestamps(500, 300, now).tolist() == np.array(expected).tolist()
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+
+
+def test_ten_million_points_under_a_second():
+    adapter = SyntheticAdapter(interval_seconds=60)
+    start = time.perf_counter()
+    data = _fetch(adapter, 6945)
+    assert time.perf_counter() - start < 1.5
+    assert len(data.points) > 10_000_000
+
+
+def test_price_point_series_sequence_and_dataframe():
+    series = _fetch(SyntheticAdapter(interval_seconds=3600), 1).points
+    as_list = list(series)
+    assert len(as_list) == len(series) == 25
+    assert isinstance(series[3], PricePoint) and series[3] == as_list[3]
+    assert isinstance(series[5:10], PricePointSeries) and list(series[5:10]) == as_list[5:10]
+
+    df = convert_market_chart_data_to_dataframe(_fetch(SyntheticAdapter(interval_seconds=3600), 1))
+    assert len(df) == 25
+    assert df['timestamp'].iloc[3] == as_list[3].timestamp
+    assert df['price'].iloc[3] == as_list[3].price
+
+    with pytest.raises(ValueError):
+        PricePointSeries(np.zeros(3, dtype='datetime64[ns]'), np.zeros(2))
+
+
+def test_too_many_points_is_not_compatible():
+    with pytest.raises(InfrastructureProviderNotCompatibleError):
+        _fetch(SyntheticAdapter(interval_seconds=60, max_points=1000), 1)
+
+
+def test_fetch_market_chart_synthetic_end_to_end():
+    MARKET_CHART_CACHE.clear()
+    data = fetch_market_chart(Symbol.XRP, Currency.EUR, 7, Provider.SYNTHETIC)
+    assert data.symbol is Symbol.XRP and data.currency is Currency.EUR
+    assert len(data.points) == 7 * 288 + 1
+    # served from the cache the second time
+    assert fetch_market_chart(Symbol.XRP, Currency.EUR, 7, Provider.SYNTHETIC) is data
+    assert HedgedMarketChartFetcher(PROVIDER_ADAPTERS).hedge_provider(Provider.SYNTHETIC, Symbol.XRP, Currency.EUR) is None
@@ -0,0 +1,71 @@
+import logging
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from app.observability import metrics
+from app.observability.memory import MemoryTracker, days_class, rss_bytes
+from app.observability.metrics import RequestMetrics, STAGE_MEMORY_PEAK_BYTES, request_metrics_scope, stage
+
+'''
+Tests:
+1. Without tracemalloc running, the tracker records nothing
+2. Peak and retained bytes of nested stages: a temporary allocation counts in the peak, not in the retained bytes
+3. Stage memory is flushed with the route and days class; requests over the threshold are logged
+4. Days classes and RSS reading
+'''
+
+MiB = 2 ** 20
+
+
+@pytest.fixture
+def tracing():
+    tracemalloc.start(1)
+    yield
+    tracemalloc.stop()
+
+
+def test_tracker_is_inactive_without_tracemalloc():
+    assert not tracemalloc.is_tracing()
+    assert MemoryTracker().enter() is None
+
+
+def test_peak_and_retained_of_nested_stages(tracing):
+    tracker = MemoryTracker()
+    outer = tracker.enter()
+    kept = np.ones(2 * MiB // 8)                 # 2 MiB, still allocated at the end
+    inner = tracker.enter()
+    temporary = np.ones(8 * MiB // 8)            # 8 MiB, freed inside the inner stage
+    del temporary
+    tracker.exit(inner)
+    tracker.exit(outer)
+
+    assert inner.peak_bytes >= 8 * MiB
+    assert inner.retained < MiB
+    assert outer.peak_bytes >= 10 * MiB          # the inner peak is credited to the outer stage too
+    assert 2 * MiB <= outer.retained < 3 * MiB
+    del kept
+
+
+def test_stage_memory_is_flushed_and_heavy_requests_logged(tracing, monkeypatch, caplog):
+    monkeypatch.setattr(metrics, 'MEMORY_LOG_THRESHOLD_BYTES', 4 * MiB)
+    request_metrics = RequestMetrics(provider='coingecko', days_class=days_class(365), query='days=365')
+    with request_metrics_scope(request_metrics):
+        with stage('analytics'):
+            temporary = np.ones(8 * MiB // 8)
+            del temporary
+
+    before = STAGE_MEMORY_PEAK_BYTES.count('/unit-test', 'coingecko', 'analytics', '<=365d')
+    with caplog.at_level(logging.WARNING, logger=metrics.__name__):
+        request_metrics.flush('/unit-test')
+    assert STAGE_MEMORY_PEAK_BYTES.count('/unit-test', 'coingecko', 'analytics', '<=365d') == before + 1
+    assert 'memory heavy request /unit-test?days=365' in caplog.text
+
+
+def test_days_class_and_rss():
+    assert days_class('1') == '<=1d'
+    assert days_class(30) == '<=30d'
+    assert days_class(2000) == '>365d'
+    assert days_class(None) == '' and days_class('x') == ''
+    assert rss_bytes() > 0
@@ -0,0 +1,62 @@
+from datetime import datetime
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.metrics import MetricsMiddleware, router as metrics_router
+from app.api.routes import market_chart as api_market_chart
+from app.domain.entities import Symbol, Currency, PricePoint, MarketChartData
+from app.observability.metrics import Counter, Histogram, RequestMetrics, STAGE_SECONDS, request_metrics_scope, stage
+
+'''
+Tests:
+1. Histograms render cumulative buckets, sum and count in Prometheus text format
+2. Stage samples inside a request are buffered and flushed with the route label
+3. /metrics exposes stage histograms, HTTP histograms, cache ratios and threadpool gauges
+'''
+
+def test_histogram_and_counter_render():
+    histogram = Histogram('h_seconds', 'help', ('stage',), buckets=(0.1, 1.0))
+    histogram.observe(0.05, 'clean')
+    histogram.observe(0.5, 'clean')
+    histogram.observe(5.0, 'clean')
+    lines = histogram.render()
+    assert 'h_seconds_bucket{stage="clean",le="0.1"} 1' in lines
+    assert 'h_seconds_bucket{stage="clean",le="1.0"} 2' in lines
+    assert 'h_seconds_bucket{stage="clean",le="+Inf"} 3' in lines
+    assert 'h_seconds_count{stage="clean"} 3' in lines
+
+    counter = Counter('c_total', 'help', ('status',))
+    counter.inc('200')
+    counter.inc('200')
+    assert 'c_total{status="200"} 2.0' in counter.render()
+
+def test_stage_samples_are_flushed_with_the_route():
+    request_metrics = RequestMetrics(provider='kraken')
+    with request_metrics_scope(request_metrics):
+        with stage('analytics'):
+            pass
+    before = STAGE_SECONDS.count('/unit-test', 'kraken', 'analytics')
+    request_metrics.flush('/unit-test')
+    assert STAGE_SECONDS.count('/unit-test', 'kraken', 'analytics') == before + 1
+
+def test_metrics_endpoint(monkeypatch):
+    def fake_fetch(symbol, currency, days, provider):
+        return MarketChartData(Symbol.BTC, Currency.USD, [PricePoint(datetime(2024, 1, 1), 1.0)])
+    monkeypatch.setattr(api_market_chart, 'fetch_market_chart', fake_fetch)
+
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(api_market_chart.router)
+    app.include_router(metrics_router)
+    client = TestClient(app)
+
+    response = client.get('/market_chart/', params={'symbol': 'bitcoin', 'currency': 'usd', 'days': 1, 'provider': 'coingecko'})
+    assert response.status_code == 200
+
+    body = client.get('/metrics').text
+    assert 'crypto_stage_duration_seconds_count{route="/market_chart/",provider="coingecko",stage="serialize"}' in body
+    assert 'crypto_http_request_duration_seconds_count{route="/market_chart/",method="GET",status="200"}' in body
+    assert 'crypto_cache_hit_ratio{cache="market_chart"}' in body
+    assert 'crypto_threadpool_queue_depth' in body
+    assert 'crypto_provider_queue_depth{provider="coingecko"}' in body
@@ -0,0 +1,114 @@
+import time
+from datetime import datetime
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import profiling as api_profiling
+from app.api.routes import market_chart as api_market_chart
+from app.domain.entities import Symbol, Currency, PricePoint, MarketChartData
+from app.observability import profiling
+from app.observability.profiling import RequestProfiler, profile_report_path
+
+'''
+Tests:
+1. RequestProfiler writes top functions, call tree, collapsed stacks and the pstats dump, and prunes old reports
+2. Report lookups can't escape the profile directory
+3. profile=1 needs the token: disabled without PROFILE_TOKEN, 403 with a wrong token
+4. A profiled request answers normally, points to its report, and the report is served by /api/v1/profiles
+5. Without profile=1 no profiler is created
+'''
+
+def _busy_work(seconds: float) -> int:
+    total, end = 0, time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        total += sum(range(100))
+    return total
+
+
+def test_request_profiler_writes_reports(tmp_path):
+    for _ in range(3):
+        with RequestProfiler('unit', profile_dir=str(tmp_path), keep=2) as profiler:
+            _busy_work(0.05)
+
+    assert len(list(tmp_path.iterdir())) == 2  # the oldest report was pruned
+    summary = open(profile_report_path(profiler.profile_id, 'summary', str(tmp_path))).read()
+    assert '_busy_work' in summary and 'wall time' in summary
+    collapsed = open(profile_report_path(profiler.profile_id, 'collapsed', str(tmp_path))).read()
+    # flamegraph format: "frame;frame;frame count", the innermost frame last
+    stack, count = collapsed.splitlines()[0].rsplit(' ', 1)
+    assert int(count) > 0
+    assert any('test_observability_profiling:_busy_work' in line for line in collapsed.splitlines())
+    tree = open(profile_report_path(profiler.profile_id, 'tree', str(tmp_path))).read()
+    assert 'samples' in tree.splitlines()[0] and '_busy_work' in tree
+    assert profile_report_path(profiler.profile_id, 'pstats', str(tmp_path)) is not None
+
+
+def test_profile_report_path_rejects_unknown_and_escaping_ids(tmp_path):
+    with RequestProfiler(profile_dir=str(tmp_path)) as profiler:
+        pass
+    assert profile_report_path(profiler.profile_id, 'summary', str(tmp_path)) is not None
+    assert profile_report_path(profiler.profile_id, 'unknown', str(tmp_path)) is None
+    assert profile_report_path('../' + profiler.profile_id, 'summary', str(tmp_path)) is None
+    assert profile_report_path('..', 'summary', str(tmp_path)) is None
+    assert profile_report_path('missing', 'summary', str(tmp_path)) is None
+
+
+# -------- API -------- #
+
+app = FastAPI()
+app.include_router(api_market_chart.router, prefix='/api/v1')
+app.include_router(api_profiling.router, prefix='/api/v1')
+client = TestClient(app)
+
+PARAMS = {'symbol': 'bitcoin', 'currency': 'usd', 'days': 1, 'provider': 'coingecko'}
+
+
+def _fake_fetch(symbol, currency, days, provider):
+    _busy_work(0.02)
+    return MarketChartData(Symbol.BTC, Currency.USD, [PricePoint(datetime(2024, 1, 1), 100.0)])
+
+
+def test_profile_requires_a_valid_token(monkeypatch):
+    monkeypatch.setattr(api_market_chart, 'fetch_market_chart', _fake_fetch)
+
+    monkeypatch.setattr(api_profiling, 'PROFILE_TOKEN', '')
+    response = client.get('/api/v1/market_chart/', params={**PARAMS, 'profile': 1}, headers={'X-Profile-Token': 'x'})
+    assert response.status_code == 403
+
+    monkeypatch.setattr(api_profiling, 'PROFILE_TOKEN', 'secret')
+    response = client.get('/api/v1/market_chart/', params={**PARAMS, 'profile': 1}, headers={'X-Profile-Token': 'wrong'})
+    assert response.status_code == 403
+    assert client.get('/api/v1/profiles/any/summary').status_code == 403
+
+
+def test_profiled_request_points_to_its_report(monkeypatch, tmp_path):
+    monkeypatch.setattr(api_market_chart, 'fetch_market_chart', _fake_fetch)
+    monkeypatch.setattr(api_profiling, 'PROFILE_TOKEN', 'secret')
+    monkeypatch.setattr(profiling, 'PROFILE_DIR', str(tmp_path))
+    headers = {'X-Profile-Token': 'secret'}
+
+    response = client.get('/api/v1/market_chart/', params={**PARAMS, 'profile': 1}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()['symbol'] == 'bitcoin'
+    profile_id = response.headers['X-Profile-Id']
+    assert response.headers['X-Profile-Report'] == f'/api/v1/profiles/{profile_id}/summary'
+
+    report = client.get(f'/api/v1/profiles/{profile_id}/summary', headers=headers)
+    assert report.status_code == 200
+    assert 'get_market_chart' in report.text and '_fake_fetch' in report.text
+    collapsed = client.get(f'/api/v1/profiles/{profile_id}/collapsed', headers=headers)
+    assert collapsed.status_code == 200 and '_busy_work' in collapsed.text
+    assert client.get(f'/api/v1/profiles/{profile_id}/nope', headers=headers).status_code == 404
+
+
+def test_no_profiler_without_the_flag(monkeypatch):
+    monkeypatch.setattr(api_market_chart, 'fetch_market_chart', _fake_fetch)
+
+    def fail(*args, **kwargs):
+        raise AssertionError('profiler created without profile=1')
+
+    monkeypatch.setattr(api_profiling, 'RequestProfiler', fail)
+    response = client.get('/api/v1/market_chart/', params=PARAMS)
+    assert response.status_code == 200
+    assert 'X-Profile-Id' not in response.headers
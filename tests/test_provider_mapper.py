@@ -10,7 +10,9 @@ import pytest
 TEST_SYMBOL_ID_OK = [
     (Symbol.BTC, Provider.COINGECKO, 'bitcoin'),
     (Symbol.ETH, Provider.COINGECKO, 'ethereum'),
-    (Symbol.XRP, Provider.COINGECKO, 'ripple')
+    (Symbol.XRP, Provider.COINGECKO, 'ripple'),
+    (Symbol.BTC, Provider.BINANCE, 'BTC'),
+    (Symbol.BTC, Provider.KRAKEN, 'XBT'),
 ]
 
 TEST_SYMBOL_SUPPORTED  = [
@@ -29,7 +31,9 @@ TEST_CURRENCY_ID_OK  = [
     (Currency.GBP, Provider.COINGECKO, 'gbp'),
     (Currency.AUD, Provider.COINGECKO, 'aud'),
     (Currency.CHF, Provider.COINGECKO, 'chf'),
-    (Currency.JPY, Provider.COINGECKO, 'jpy')
+    (Currency.JPY, Provider.COINGECKO, 'jpy'),
+    (Currency.USD, Provider.BINANCE, 'USDT'),
+    (Currency.CHF, Provider.KRAKEN, 'CHF'),
 ]
 
 TEST_CURRENCY_SUPPORTED  = [
@@ -45,6 +49,10 @@ TEST_UNMAPPEDCURRENCY_ERROR = [
     (Provider.COINGECKO, InfrastructureProviderNotCompatibleError)
 ]
 
+def test_binance_has_no_chf_pairs():
+    with pytest.raises(InfrastructureProviderNotCompatibleError):
+        map_provider_currency_id(Currency.CHF, Provider.BINANCE)
+
 def test_symbol_id_ok():
     for sym, prov, expected_id in TEST_SYMBOL_ID_OK:
         assert map_provider_symbol_id(sym, prov) == expected_id
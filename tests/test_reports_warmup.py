@@ -0,0 +1,31 @@
+import sys
+
+from app.reports.warmup import warm_up_plotting
+from benchmarks.import_time import measure, parse_importtime
+
+'''
+Tests:
+1. Importing the API app loads neither pandas nor matplotlib (fresh interpreter)
+2. The warm-up imports the plotting stack and draws once, reporting every step
+3. -X importtime output is parsed into cumulative seconds per module
+'''
+
+def test_api_import_is_lazy():
+    measured = measure('app.api.main')
+    assert 'pandas' not in measured['loaded']
+    assert 'matplotlib' not in measured['loaded']
+    assert measured['modules']['app.api.main'] > 0
+
+
+def test_warm_up_plotting():
+    timings = warm_up_plotting()
+    assert set(timings) == {'import_pandas', 'import_matplotlib', 'font_cache', 'first_draw'}
+    assert all(seconds >= 0 for seconds in timings.values())
+    assert 'app.reports.plots' in sys.modules
+
+
+def test_parse_importtime():
+    stderr = ('import time: self [us] | cumulative | imported package\n'
+              'import time:       150 |        150 |   app.domain\n'
+              'import time:      3000 |     102000 | app.domain.entities\n')
+    assert parse_importtime(stderr) == {'app.domain': 0.00015, 'app.domain.entities': 0.102}
@@ -0,0 +1,212 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+from numpy.lib.stride_tricks import sliding_window_view
+
+from app.domain.entities import Symbol, Currency, Provider, PricePoint, MarketChartData
+from app.domain import services as domain_services
+from app.domain.errors import BusinessComputationError, BusinessValidationError
+from app.services.analytics import (
+    compute_indicators,
+    compute_rolling_extrema,
+    compute_rolling_window,
+    compute_volatility,
+    parse_window,
+)
+from app.services.indicators import IndicatorEngine, ema
+
+'''
+Tests:
+1. Rolling means / stds of many windows match a rescan of every window, across chunk boundaries and around NaN
+2. Small windows far into a long, drifting series stay accurate (chunked cumulative sums), unlike pandas' online sums
+3. EMA matches ewm(adjust=False) and carries NaN forward
+4. Bollinger bands, RSI and MACD match their pandas definitions
+5. compute_rolling_window / compute_volatility accept lists of windows; compute_indicators names the columns
+6. compute_enriched_market_chart takes lists and maps invalid windows to BusinessComputationError
+7. Rolling max / min match pandas for count and time windows, irregular spacing and NaN included
+8. Time windows ("7D") for means / stds match pandas' rolling on a DatetimeIndex
+9. Drawdowns and Donchian channels come from the shared extrema; invalid durations are BusinessValidationError
+10. Short count windows over a constant run have a std of exactly 0 (Bollinger bands collapse on the price)
+'''
+
+def _prices(n: int, seed: int = 0) -> np.ndarray:
+    return 30_000 * np.exp(np.cumsum(np.random.default_rng(seed).normal(0, 0.01, n)))
+
+
+def _close(actual: np.ndarray, expected: pd.Series, rel: float = 1e-9):
+    expected = expected.to_numpy()
+    assert np.array_equal(np.isnan(actual), np.isnan(expected))
+    finite = ~np.isnan(expected)
+    assert actual[finite] == pytest.approx(expected[finite], rel=rel, abs=1e-9)
+
+
+def _rescan_std(prices: np.ndarray, window: int) -> pd.Series:
+    stds = np.std(sliding_window_view(prices, window), axis=1, ddof=1) if window > 1 else np.full(len(prices), np.nan)
+    return pd.Series(np.concatenate((np.full(window - 1, np.nan), stds))[:len(prices)])
+
+
+def test_rolling_moments_match_a_rescan():
+    prices = _prices(1_000)
+    prices[[10, 400, 401]] = np.nan
+    engine = IndicatorEngine(prices, chunk_size=64)
+    windows = [1, 2, 5, 20, 50, 200]
+    engine.rolling(windows)
+    series = pd.Series(prices)
+    for w in windows:
+        _close(engine.rolling_mean(w), series.rolling(w).mean())
+        _close(engine.rolling_std(w), _rescan_std(prices, w), rel=1e-6)
+
+
+def test_small_windows_on_a_long_series():
+    prices = np.linspace(1.0, 1e6, 500_000) + np.sin(np.arange(500_000))
+    expected = _rescan_std(prices, 5)
+    _close(IndicatorEngine(prices).rolling_std(5), expected, rel=1e-5)
+    assert not np.allclose(pd.Series(prices).rolling(5).std()[4:], expected[4:], rtol=1e-5)
+
+
+def test_ema_matches_pandas():
+    prices = _prices(5_000)
+    for span in (2, 12, 200):
+        alpha = 2 / (span + 1)
+        _close(ema(prices, alpha, chunk_size=100), pd.Series(prices).ewm(span=span, adjust=False).mean())
+    assert ema(np.array([np.nan, 1.0, np.nan, 3.0]), 0.5).tolist()[1:] == [1.0, 1.0, 2.0]
+    assert np.isnan(ema(np.array([np.nan, 1.0]), 0.5)[0])
+
+
+def test_bollinger_rsi_macd():
+    prices = _prices(2_000, seed=3)
+    series = pd.Series(prices)
+    engine = IndicatorEngine(prices, chunk_size=128)
+
+    lower, middle, upper = engine.bollinger_bands(20)
+    width = 2 * series.rolling(20).std(ddof=0)
+    _close(middle, series.rolling(20).mean())
+    _close(upper, series.rolling(20).mean() + width, rel=1e-7)
+    _close(lower, series.rolling(20).mean() - width, rel=1e-7)
+
+    delta = series.diff()
+    gains = delta.clip(lower=0).ewm(alpha=1 / 14, adjust=False).mean()
+    losses = (-delta).clip(lower=0).ewm(alpha=1 / 14, adjust=False).mean()
+    expected_rsi = 100 - 100 / (1 + gains / losses)
+    expected_rsi[:14] = np.nan
+    _close(engine.rsi(14), expected_rsi)
+
+    line, signal, hist = engine.macd()
+    expected_line = series.ewm(span=12, adjust=False).mean() - series.ewm(span=26, adjust=False).mean()
+    expected_signal = expected_line.ewm(span=9, adjust=False).mean()
+    _close(line, expected_line, rel=1e-7)
+    _close(signal, expected_signal, rel=1e-7)
+    _close(hist, expected_line - expected_signal, rel=1e-6)
+    assert engine.ema(12) is engine.ema(12)  # shared with MACD
+
+
+def test_analytics_accept_lists():
+    df = pd.DataFrame({'timestamp': pd.date_range('2024-01-01', periods=300, freq='h'), 'price': _prices(300)})
+    compute_rolling_window(df, [5, 20, 5], 'price')
+    compute_volatility(df, 'price', [10, 30])
+    assert {'rolling_mean_5', 'rolling_mean_20', 'volatility_10', 'volatility_30'} <= set(df.columns)
+    _close(df['volatility_30'].to_numpy(), df['price'].pct_change().rolling(30).std(), rel=1e-7)
+
+    compute_indicators(df, 'price', ema_spans=[10], bollinger_windows=[20], rsi_periods=[14], macd=True)
+    assert {'ema_10', 'bollinger_lower_20', 'bollinger_middle_20', 'bollinger_upper_20', 'rsi_14',
+            'macd', 'macd_signal', 'macd_hist'} <= set(df.columns)
+
+    with pytest.raises(ValueError):
+        compute_rolling_window(df, [5, 301], 'price')
+    with pytest.raises(ValueError):
+        compute_rolling_window(df, [], 'price')
+
+
+def test_enriched_market_chart_with_lists(monkeypatch):
+    points = [PricePoint(datetime(2024, 1, 1) + timedelta(hours=i), float(100 + i % 7)) for i in range(100)]
+    monkeypatch.setattr(domain_services, 'fetch_market_chart',
+                        lambda symbol, currency, days, provider: MarketChartData(symbol, currency, points))
+    df = domain_services.compute_enriched_market_chart(Symbol.BTC, Currency.USD, 5, Provider.COINGECKO,
+                                                       window_size=[5, 10], volatility_window=[5], ema_span=[3],
+                                                       bollinger_window=10, rsi_period=[14], macd=True)
+    assert {'rolling_mean_5', 'rolling_mean_10', 'volatility_5', 'ema_3', 'bollinger_upper_10', 'rsi_14',
+            'macd_hist'} <= set(df.columns)
+
+    with pytest.raises(BusinessComputationError):
+        domain_services.compute_enriched_market_chart(Symbol.BTC, Currency.USD, 5, Provider.COINGECKO,
+                                                      volatility_window=[5, 1])
+    with pytest.raises(BusinessComputationError):
+        domain_services.compute_enriched_market_chart(Symbol.BTC, Currency.USD, 5, Provider.COINGECKO, rsi_period=0)
+
+
+def _irregular_series(n: int, seed: int = 0):
+    # CoinGecko like: gaps from one minute to two hours, a few NaN
+    rng = np.random.default_rng(seed)
+    timestamps = np.datetime64('2024-01-01', 'ns') + np.cumsum(rng.integers(1, 120, n)) * np.timedelta64(1, 'm')
+    prices = _prices(n, seed)
+    prices[[5, 100, 101]] = np.nan
+    return timestamps, prices
+
+
+@pytest.mark.parametrize('window', [1, 3, 50, 700])
+def test_rolling_extrema_count_windows(window):
+    _, prices = _irregular_series(3_000)
+    engine = IndicatorEngine(prices)
+    _close(engine.rolling_max(window), pd.Series(prices).rolling(window).max())
+    _close(engine.rolling_min(window), pd.Series(prices).rolling(window).min())
+
+
+@pytest.mark.parametrize('span', ['1h', '7h', '1D', '7D'])
+def test_time_windows(span):
+    timestamps, prices = _irregular_series(3_000)
+    engine = IndicatorEngine(prices, timestamps, chunk_size=128)
+    window = parse_window(span)
+    series = pd.Series(prices, index=pd.DatetimeIndex(timestamps))
+    _close(engine.rolling_max(window), series.rolling(span).max())
+    _close(engine.rolling_min(window), series.rolling(span).min())
+    _close(engine.rolling_mean(window), series.rolling(span).mean())
+    _close(engine.rolling_std(window), series.rolling(span).std(), rel=1e-5)  # pandas' online sums drift a little
+
+
+def test_drawdown_and_donchian():
+    timestamps, prices = _irregular_series(500)
+    engine = IndicatorEngine(prices, timestamps)
+    lower, middle, upper = engine.donchian_channel(20)
+    assert upper is engine.rolling_max(20) and lower is engine.rolling_min(20)
+    _close(middle, (pd.Series(prices).rolling(20).max() + pd.Series(prices).rolling(20).min()) / 2)
+    drawdown = engine.drawdown(parse_window('1D'))
+    assert np.nanmax(drawdown) == 0.0 and np.nanmin(drawdown) < 0
+
+    assert parse_window('20') == 20 and parse_window('7D') == np.timedelta64(7 * 86_400 * 10**9, 'ns')
+    for invalid in ('soon', '-1D'):
+        with pytest.raises(ValueError):
+            parse_window(invalid)
+
+    df = pd.DataFrame({'timestamp': timestamps, 'price': prices})
+    compute_rolling_extrema(df, ['7D', 10], 'price')
+    compute_indicators(df, 'price', rolling_windows=['1D'], drawdown_windows=['1D'], donchian_windows=[20])
+    assert {'rolling_max_7D', 'rolling_min_10', 'rolling_mean_1D', 'drawdown_1D', 'donchian_upper_20'} <= set(df.columns)
+
+
+def test_enriched_market_chart_time_windows(monkeypatch):
+    points = [PricePoint(datetime(2024, 1, 1) + timedelta(hours=i), float(100 + i % 7)) for i in range(100)]
+    monkeypatch.setattr(domain_services, 'fetch_market_chart',
+                        lambda symbol, currency, days, provider: MarketChartData(symbol, currency, points))
+    df = domain_services.compute_enriched_market_chart(Symbol.BTC, Currency.USD, 5, Provider.COINGECKO,
+                                                       window_size=['1D', '5'], extrema_window='12h',
+                                                       drawdown_window=['1D'], donchian_window=['2D'])
+    assert {'rolling_mean_1D', 'rolling_mean_5', 'rolling_max_12h', 'drawdown_1D', 'donchian_lower_2D'} <= set(df.columns)
+    assert df['rolling_max_12h'].iloc[-1] == max(p.price for p in points[-12:])
+
+    with pytest.raises(BusinessValidationError):
+        domain_services.compute_enriched_market_chart(Symbol.BTC, Currency.USD, 5, Provider.COINGECKO,
+                                                      window_size=['7 days and a bit'])
+
+
+def test_flat_run_has_zero_std():
+    prices = _prices(3_000)
+    prices[1_000:1_100] = 61234.56  # a stablecoin / exchange flat stretch inside a moving chunk
+    engine = IndicatorEngine(prices)
+    lower, middle, upper = engine.bollinger_bands(20)
+    assert np.all(upper[1_019:1_100] == 61234.56) and np.all(lower[1_019:1_100] == 61234.56)
+    for w in (2, 5, 20, 32):
+        assert np.all(engine.rolling_std(w)[1_000 + w - 1:1_100] == 0.0)
+        assert np.all(engine.rolling_mean(w)[1_000 + w - 1:1_100] == 61234.56)
+    _close(engine.rolling_std(20), pd.Series(prices).rolling(20).std(), rel=1e-7)
@@ -0,0 +1,147 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.domain.entities import Symbol, Currency, Provider, PricePointSeries, MarketChartData
+from app.domain import services as domain_services
+from app.services.analytics import compute_indicators
+from app.services.online import MARKET_CHART_ONLINE, OnlineSeries, OnlineSeriesRegistry
+from app.services.stats import calculate_price_stats
+
+'''
+Tests:
+1. Refreshed rolling means / volatilities (count and duration windows, missing prices) match compute_indicators
+2. A refresh only computes the rows next to the dropped and new prices
+3. Versions that don't overlap or rewrite the history are rebuilt; unsorted series are not kept
+4. The registry refreshes the entry of a key when the cached series changes and drops the least recently used
+5. Requests holding different versions of a series each get the analytics of their own version
+6. compute_market_chart_stats and compute_enriched_market_chart read the online analytics of the whole series
+'''
+
+WINDOWS = {'3': 3, '50': 50, '6h': np.timedelta64(6, 'h'), '1D': np.timedelta64(1, 'D')}
+
+
+def _series(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    timestamps = np.datetime64('2024-01-01T00:00', 'ns') + np.cumsum(rng.integers(1, 20, n)) * np.timedelta64(1, 'm')
+    prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    return timestamps, prices
+
+
+def _assert_batch_columns(online: OnlineSeries):
+    df = pd.DataFrame({'timestamp': online.timestamps, 'price': online.prices})
+    compute_indicators(df, 'price', rolling_windows=list(WINDOWS), volatility_windows=list(WINDOWS))
+    for label, window in WINDOWS.items():
+        np.testing.assert_allclose(online.rolling_mean(window), df[f'rolling_mean_{label}'], rtol=1e-9, atol=1e-8)
+        np.testing.assert_allclose(online.volatility(window), df[f'volatility_{label}'], rtol=1e-9, atol=1e-8)
+
+
+@pytest.mark.filterwarnings('ignore:The default fill_method:FutureWarning')  # batch pct_change over missing prices
+def test_refreshed_columns_match_the_batch():
+    timestamps, prices = _series(12_000)
+    prices[::53] = np.nan
+    prices[3_000:3_010] = np.nan
+    lo, hi = 0, 3_000
+    online = OnlineSeries(timestamps[lo:hi], prices[lo:hi])
+    _assert_batch_columns(online)
+    rng = np.random.default_rng(1)
+    for _ in range(60):
+        dropped, added = int(rng.integers(0, 40)), int(rng.integers(0, 60))
+        prices[hi + added - 1] *= 1.001  # live price, revised by the next version
+        assert online.refresh(timestamps[lo + dropped:hi + added], prices[lo + dropped:hi + added])
+        lo, hi = lo + dropped, hi + added
+        _assert_batch_columns(online)
+    assert online.price_stats() == pytest.approx(calculate_price_stats(prices[lo:hi]), rel=1e-9, nan_ok=True)
+
+
+def test_refresh_is_incremental(monkeypatch):
+    timestamps, prices = _series(100_000)
+    online = OnlineSeries(timestamps[:90_000], prices[:90_000])
+    before = online.rolling_mean(20)
+    computed = []
+    rows = OnlineSeries._rows
+
+    def counted_rows(self, kind, window, lo, hi):
+        computed.append(hi - lo)
+        return rows(self, kind, window, lo, hi)
+
+    monkeypatch.setattr(OnlineSeries, '_rows', counted_rows)
+
+    online.refresh(timestamps[10:90_010], prices[10:90_010])
+    assert sum(computed) < 100
+    assert np.array_equal(online.rolling_mean(20)[1_000:89_000], before[1_010:89_010])
+    assert not before.flags.writeable
+
+
+def test_refresh_falls_back_to_a_rebuild():
+    timestamps, prices = _series(5_000)
+    online = OnlineSeries(timestamps[:3_000], prices[:3_000])
+    online.rolling_mean(10)
+
+    changed = prices.copy()
+    changed[1_000:] *= 2  # history rewritten
+    assert online.refresh(timestamps[:3_500], changed[:3_500])
+    np.testing.assert_allclose(online.rolling_mean(10)[9:], pd.Series(changed[:3_500]).rolling(10).mean()[9:])
+    assert online.price_stats() == pytest.approx(calculate_price_stats(changed[:3_500]), rel=1e-9)
+
+    assert online.refresh(timestamps[4_000:], prices[4_000:])  # no overlap
+    assert online.price_stats() == pytest.approx(calculate_price_stats(prices[4_000:]), rel=1e-9)
+
+    assert not online.refresh(timestamps[::-1], prices[::-1])
+    assert len(online) == 1_000
+
+
+def test_registry():
+    timestamps, prices = _series(1_000)
+    first = MarketChartData(Symbol.BTC, Currency.USD, PricePointSeries(timestamps[:800], prices[:800]))
+    second = MarketChartData(Symbol.BTC, Currency.USD, PricePointSeries(timestamps[100:], prices[100:]))
+    unsorted = MarketChartData(Symbol.BTC, Currency.USD, PricePointSeries(timestamps[::-1], prices[::-1]))
+    registry = OnlineSeriesRegistry(max_series=1)
+
+    online = registry.get('btc', first).series
+    assert registry.get('btc', first).series is online
+    assert registry.get('btc', second).series is online  # refreshed in place
+    assert len(online) == 900 and online.price_stats()['first_price'] == prices[100]
+
+    registry.get('eth', first)
+    assert registry.get('btc', second).series is not online  # evicted: built again
+    assert registry.get('btc', unsorted) is None
+
+
+def test_versions_are_not_mixed():
+    # Request A holds a version of the series, request B the refreshed one: each reads its own version
+    timestamps, prices = _series(1_010)
+    first = MarketChartData(Symbol.BTC, Currency.USD, PricePointSeries(timestamps[:1_000], prices[:1_000]))
+    second = MarketChartData(Symbol.BTC, Currency.USD, PricePointSeries(timestamps[10:], prices[10:]))
+    registry = OnlineSeriesRegistry()
+
+    a = registry.get('btc', first)
+    a.rolling_mean(5)
+    b = registry.get('btc', second)
+    assert b.series is a.series
+    for version, lo, hi in ((a, 0, 1_000), (b, 10, 1_010), (registry.get('btc', first), 0, 1_000)):
+        np.testing.assert_allclose(version.rolling_mean(5), pd.Series(prices[lo:hi]).rolling(5).mean(), rtol=1e-9)
+        np.testing.assert_allclose(version.volatility(5), pd.Series(prices[lo:hi]).pct_change().rolling(5).std(),
+                                   rtol=1e-9)
+        assert version.price_stats() == pytest.approx(calculate_price_stats(prices[lo:hi]), rel=1e-9)
+    assert a.series.prices[0] == prices[10]  # the older version did not move the entry back
+
+
+def test_use_cases_read_the_online_analytics(monkeypatch):
+    MARKET_CHART_ONLINE.clear()
+    timestamps, prices = _series(2_000)
+    data = MarketChartData(Symbol.BTC, Currency.USD, PricePointSeries(timestamps, prices))
+    monkeypatch.setattr(domain_services, 'fetch_market_chart', lambda symbol, currency, days, provider: data)
+
+    stats = domain_services.compute_market_chart_stats(Symbol.BTC, Currency.USD, 30, Provider.COINGECKO)
+    online = MARKET_CHART_ONLINE.get((Provider.COINGECKO, Symbol.BTC, Currency.USD, 30), data)
+    assert stats == online.price_stats()
+    assert stats == pytest.approx(calculate_price_stats(prices), rel=1e-9)
+
+    df = domain_services.compute_enriched_market_chart(Symbol.BTC, Currency.USD, 30, Provider.COINGECKO,
+                                                       window_size=[5, '6h'], volatility_window=[10], rsi_period=14)
+    assert list(df.columns) == ['timestamp', 'price', 'pct_change', 'acum_pct_change', 'rolling_mean_5',
+                                'rolling_mean_6h', 'rsi_14', 'volatility_10']
+    np.testing.assert_array_equal(df['rolling_mean_5'], online.rolling_mean(5))
+    np.testing.assert_allclose(df['volatility_10'], pd.Series(prices).pct_change().rolling(10).std(), rtol=1e-9)
+    MARKET_CHART_ONLINE.clear()
@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app.domain.entities import Symbol, Currency, Provider, PricePoint, PricePointSeries, MarketChartData, ResampleFrequency
+from app.domain import services as domain_services
+from app.services.pyramid import MARKET_CHART_PYRAMIDS, PyramidRegistry, ResolutionPyramid
+from app.services.resampling import FREQUENCY_ORDER, resample_ohlc
+
+'''
+Tests:
+1. Every level of the pyramid matches the resampler run on the raw points
+2. A refresh (window slid forward, open hour revised) gives the same bars as a rebuild
+3. Refreshes that don't overlap, contradict the kept hours or are unsorted are rebuilt from scratch
+4. The registry serves the same cached series from memory and drops the least recently used series
+5. compute_enriched_market_chart answers whole series from the pyramid, windows by resampling
+6. Empty and single point series
+'''
+
+def _series(start: str, n: int, step_minutes: int = 7, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    timestamps = np.datetime64(start, 'ns') + np.arange(n) * np.timedelta64(step_minutes, 'm')
+    prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    return timestamps, prices
+
+
+def _assert_same_bars(pyramid: ResolutionPyramid, timestamps: np.ndarray, prices: np.ndarray):
+    expected = resample_ohlc(timestamps, prices, FREQUENCY_ORDER)
+    for frequency in FREQUENCY_ORDER:
+        bars, dense = pyramid.bars(frequency), expected[frequency].dense()
+        assert np.array_equal(bars.timestamp, dense.timestamp), frequency
+        for field in ('open', 'high', 'low', 'close', 'count'):
+            assert np.array_equal(getattr(bars, field), getattr(dense, field)), (frequency, field)
+
+
+def test_levels_match_the_resampler():
+    timestamps, prices = _series('2023-12-20T05:03', 20_000)
+    prices[::97] = np.nan
+    _assert_same_bars(ResolutionPyramid.from_arrays(timestamps, prices), timestamps, prices)
+
+
+def test_refresh_matches_a_rebuild(monkeypatch):
+    timestamps, prices = _series('2024-01-01T00:03', 30_000)
+    old = ResolutionPyramid.from_arrays(timestamps[:20_000], prices[:20_000])
+    monkeypatch.setattr(ResolutionPyramid, 'from_arrays', None)  # the refresh must not rebuild
+
+    # Refreshed version: 500 points later, last point of the old version revised (it was the live price)
+    new_timestamps, new_prices = timestamps[500:20_500], prices[500:20_500].copy()
+    new_prices[20_000 - 500 - 1] *= 1.01
+    refreshed = old.refreshed(new_timestamps, new_prices)
+    assert refreshed.hourly.period[0] == new_timestamps[0].astype(np.int64) // 3_600_000_000_000
+    _assert_same_bars(refreshed, new_timestamps, new_prices)
+
+
+def test_refresh_falls_back_to_a_rebuild():
+    timestamps, prices = _series('2024-01-01T00:03', 10_000)
+    old = ResolutionPyramid.from_arrays(timestamps[:5_000], prices[:5_000])
+
+    changed = prices[:6_000].copy()
+    changed[2_000:] *= 2  # history rewritten: the kept hours don't match
+    _assert_same_bars(old.refreshed(timestamps[:6_000], changed), timestamps[:6_000], changed)
+
+    later = old.refreshed(timestamps[8_000:], prices[8_000:])  # no overlap
+    _assert_same_bars(later, timestamps[8_000:], prices[8_000:])
+
+
+def test_registry():
+    timestamps, prices = _series('2024-01-01T00:03', 1_000)
+    first = MarketChartData(Symbol.BTC, Currency.USD, PricePointSeries(timestamps[:800], prices[:800]))
+    second = MarketChartData(Symbol.BTC, Currency.USD, PricePointSeries(timestamps[100:], prices[100:]))
+    registry = PyramidRegistry(max_series=1)
+
+    pyramid = registry.get('btc', first)
+    assert registry.get('btc', first) is pyramid
+    refreshed = registry.get('btc', second)
+    assert refreshed is not pyramid
+    _assert_same_bars(refreshed, timestamps[100:], prices[100:])
+
+    registry.get('eth', first)
+    assert registry.get('btc', second) is not refreshed  # evicted: built again
+
+
+def test_enriched_market_chart_reads_the_pyramid(monkeypatch):
+    MARKET_CHART_PYRAMIDS.clear()
+    points = [PricePoint(datetime(2024, 1, 1) + timedelta(hours=6 * i), float(100 + i)) for i in range(40)]
+    data = MarketChartData(Symbol.BTC, Currency.USD, points)
+    monkeypatch.setattr(domain_services, 'fetch_market_chart', lambda symbol, currency, days, provider: data)
+
+    df = domain_services.compute_enriched_market_chart(Symbol.BTC, Currency.USD, 10, Provider.COINGECKO,
+                                                       frequency=ResampleFrequency.DAILY)
+    assert df['price'].tolist() == [103.0 + 4 * i for i in range(10)]
+    assert df['count'].tolist() == [4] * 10
+    pyramid = MARKET_CHART_PYRAMIDS.get((Provider.COINGECKO, Symbol.BTC, Currency.USD, 10), data)
+    assert list(df['timestamp']) == list(pyramid.bars(ResampleFrequency.DAILY).timestamp)
+
+    window = domain_services.compute_enriched_market_chart(Symbol.BTC, Currency.USD, 10, Provider.COINGECKO,
+                                                           frequency=ResampleFrequency.DAILY,
+                                                           start=datetime(2024, 1, 2, 12))
+    assert window['count'].tolist() == [2] + [4] * 8
+    MARKET_CHART_PYRAMIDS.clear()
+
+
+def test_unsorted_refresh_is_rebuilt():
+    timestamps, prices = _series('2024-01-01T00:03', 2_000)
+    old = ResolutionPyramid.from_arrays(timestamps[:1_500], prices[:1_500])
+    order = np.random.default_rng(1).permutation(2_000)
+    _assert_same_bars(old.refreshed(timestamps[order], prices[order]), timestamps, prices)
+
+
+@pytest.mark.parametrize('n', [0, 1])
+def test_tiny_series(n):
+    timestamps, prices = _series('2024-01-01T00:03', n)
+    pyramid = ResolutionPyramid.from_arrays(timestamps, prices)
+    assert all(len(pyramid.bars(frequency)) == n for frequency in FREQUENCY_ORDER)
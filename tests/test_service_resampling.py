@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.domain.entities import ResampleFrequency, PANDAS_RESAMPLING_RULES
+from app.services.analytics import resample_price_series
+from app.services.resampling import resample_ohlc
+
+'''
+Tests:
+1. Same bars as pandas resample(...).ohlc() / count() for every frequency (gaps, NaN prices, unsorted input)
+2. Several frequencies from one call give the same bars as one call per frequency
+3. dense() adds flat, zero count bars for the empty periods
+4. resample_price_series returns close (carried forward) + open / high / low / count
+'''
+
+def _series(n: int = 3000, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    offsets = (rng.random(n) * 400 * 86_400e9).astype(np.int64).astype('timedelta64[ns]')
+    timestamps = np.datetime64('2023-11-20', 'ns') + offsets
+    timestamps = timestamps[(timestamps < np.datetime64('2024-02-01')) | (timestamps > np.datetime64('2024-03-15'))]
+    prices = rng.random(len(timestamps)) * 100
+    prices[rng.integers(0, len(prices), 20)] = np.nan
+    return timestamps, prices
+
+
+@pytest.mark.parametrize('frequency', list(ResampleFrequency))
+def test_matches_pandas(frequency):
+    timestamps, prices = _series()
+    bars = resample_ohlc(timestamps, prices, [frequency])[frequency].dense()
+
+    resampled = pd.Series(prices, index=pd.DatetimeIndex(timestamps)).sort_index().resample(PANDAS_RESAMPLING_RULES[frequency])
+    expected, counts = resampled.ohlc(), resampled.count()
+    assert np.array_equal(bars.timestamp, expected.index.values)
+    assert np.array_equal(bars.count, counts.values)
+    non_empty = counts.values > 0
+    for column in ('open', 'high', 'low', 'close'):
+        assert np.allclose(getattr(bars, column)[non_empty], expected[column].values[non_empty])
+
+
+def test_all_frequencies_in_one_call():
+    timestamps, prices = _series(seed=1)
+    together = resample_ohlc(timestamps, prices, list(ResampleFrequency))
+    for frequency in ResampleFrequency:
+        alone = resample_ohlc(timestamps, prices, [frequency])[frequency]
+        for field in ('period', 'timestamp', 'open', 'high', 'low', 'close', 'count'):
+            assert np.array_equal(getattr(together[frequency], field), getattr(alone, field)), (frequency, field)
+    assert resample_ohlc(timestamps, prices, []) == {}
+
+
+def test_dense_fills_empty_periods():
+    timestamps = np.array(['2024-01-01T10:15', '2024-01-01T10:45', '2024-01-01T13:05'], dtype='datetime64[ns]')
+    bars = resample_ohlc(timestamps, np.array([1.0, 3.0, 2.0]), [ResampleFrequency.HOURLY])[ResampleFrequency.HOURLY]
+    assert len(bars) == 2
+    dense = bars.dense()
+    assert dense.count.tolist() == [2, 0, 0, 1]
+    assert dense.close.tolist() == [3.0, 3.0, 3.0, 2.0]
+    assert dense.open.tolist() == [1.0, 3.0, 3.0, 2.0]
+    assert dense.high.tolist() == [3.0, 3.0, 3.0, 2.0]
+
+
+def test_resample_price_series_ohlc_columns():
+    df = pd.DataFrame({'timestamp': pd.to_datetime(['2024-01-01 00:10', '2024-01-01 02:00', '2024-01-01 03:59', '2024-01-01 09:00']),
+                       'price': [5.0, 7.0, 6.0, 8.0]})
+    resampled = resample_price_series(df, 'price', ResampleFrequency.FOUR_HOURLY)
+    assert list(resampled.columns) == ['timestamp', 'price', 'open', 'high', 'low', 'count']
+    assert resampled['timestamp'].tolist() == list(pd.to_datetime(['2024-01-01 00:00', '2024-01-01 04:00', '2024-01-01 08:00']))
+    assert resampled['price'].tolist() == [6.0, 6.0, 8.0]
+    assert resampled.iloc[0][['open', 'high', 'low', 'count']].tolist() == [5.0, 7.0, 5.0, 3]
+    assert resampled['count'].tolist() == [3, 0, 1]
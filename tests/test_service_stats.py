@@ -0,0 +1,161 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.domain.entities import Symbol, Currency, Provider, PricePoint, PricePointSeries, MarketChartData
+from app.domain import services as domain_services
+from app.domain.errors import BusinessComputationError, BusinessNoDataError, BusinessValidationError
+from app.services.stats import RangeStatsIndex, RunningPriceStats, calculate_price_stats, price_array, range_stats_index
+
+'''
+Tests:
+1. Same figures as pandas, across block boundaries and for odd / even counts
+2. NaN prices are skipped; empty and all-NaN series are rejected
+3. Price arrays come from PricePointSeries without copy and from lists of PricePoint
+4. compute_market_chart_stats works on the price array and maps failures to BusinessComputationError
+5. The range index gives the same figures as a rescan for any window (NaN, unsorted input, tiny blocks)
+6. Window bounds are inclusive, aware datetimes are read as local time, empty windows are rejected
+7. The index is built once per cached series; a window of /stats without data is a BusinessNoDataError, an inverted
+   one (start > end) a BusinessValidationError raised before fetching
+8. Running stats follow a sliding series (dropped, revised and new prices, NaN) like a full recomputation
+'''
+
+def _pandas_stats(prices: np.ndarray) -> dict:
+    series = pd.Series(prices)
+    return {
+        'count': int(series.count()), 'min_price': series.min(), 'max_price': series.max(), 'mean_price': series.mean(),
+        'median_price': series.median(), 'std_dev': series.std(), 'variance': series.var(),
+        'first_price': series.iloc[0], 'last_price': series.iloc[-1],
+        'percent_change': (series.iloc[-1] - series.iloc[0]) / series.iloc[0] * 100,
+    }
+
+
+@pytest.mark.parametrize('n', [1, 2, 7, 64, 1001])
+def test_matches_pandas(n):
+    prices = 30_000 * np.exp(np.cumsum(np.random.default_rng(n).normal(0, 0.01, n)))
+    stats = calculate_price_stats(prices, block_size=16)
+    expected = _pandas_stats(prices)
+    assert stats['count'] == expected['count']
+    for key, value in expected.items():
+        assert stats[key] == pytest.approx(value, rel=1e-12, nan_ok=True), key
+
+
+def test_nan_prices_are_skipped():
+    prices = np.array([np.nan, 1.0, 5.0, np.nan, 3.0, 2.0])
+    stats = calculate_price_stats(prices, block_size=2)
+    assert stats['count'] == 4
+    assert (stats['min_price'], stats['max_price'], stats['mean_price'], stats['median_price']) == (1.0, 5.0, 2.75, 2.5)
+    assert stats['variance'] == pytest.approx(pd.Series(prices).var())
+
+    with pytest.raises(ValueError):
+        calculate_price_stats(np.array([]))
+    with pytest.raises(ValueError):
+        calculate_price_stats(np.array([np.nan, np.nan]))
+
+
+def test_price_array():
+    series = PricePointSeries(np.arange(3).astype('datetime64[s]'), np.array([1.0, 2.0, 3.0]))
+    assert price_array(MarketChartData(Symbol.BTC, Currency.USD, series)) is series.prices
+
+    points = [PricePoint(datetime(2024, 1, 1) + timedelta(hours=i), float(i)) for i in range(3)]
+    assert price_array(MarketChartData(Symbol.BTC, Currency.USD, points)).tolist() == [0.0, 1.0, 2.0]
+
+
+def test_compute_market_chart_stats(monkeypatch):
+    points = [PricePoint(datetime(2024, 1, 1) + timedelta(days=i), float(100 + 10 * i)) for i in range(5)]
+    monkeypatch.setattr(domain_services, 'fetch_market_chart',
+                        lambda symbol, currency, days, provider: MarketChartData(symbol, currency, points))
+    stats = domain_services.compute_market_chart_stats(Symbol.BTC, Currency.USD, 5, Provider.COINGECKO)
+    assert stats['count'] == 5 and stats['median_price'] == 120.0 and stats['percent_change'] == 40.0
+
+    nan_points = [PricePoint(p.timestamp, float('nan')) for p in points]
+    monkeypatch.setattr(domain_services, 'fetch_market_chart',
+                        lambda symbol, currency, days, provider: MarketChartData(symbol, currency, nan_points))
+    with pytest.raises(BusinessComputationError):
+        domain_services.compute_market_chart_stats(Symbol.BTC, Currency.USD, 5, Provider.COINGECKO)
+
+
+def _index_case(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.05, n)))
+    prices[rng.integers(0, n, n // 10)] = np.nan
+    timestamps = np.datetime64('2024-01-01T00:00', 'ns') + np.arange(n) * np.timedelta64(1, 'h')
+    return rng, timestamps, prices
+
+
+def _moment(timestamps: np.ndarray, i: int) -> datetime:
+    return timestamps[i].astype('datetime64[us]').item()
+
+
+@pytest.mark.parametrize('block_size', [1, 4, 256])
+def test_range_index_matches_rescan(block_size):
+    rng, timestamps, prices = _index_case(1000)
+    order = rng.permutation(len(prices))  # the index sorts by time itself
+    index = RangeStatsIndex(timestamps[order], prices[order], block_size=block_size)
+    for _ in range(200):
+        lo, hi = sorted(rng.integers(0, len(prices), 2))
+        stats = index.stats(_moment(timestamps, lo), _moment(timestamps, hi))
+        expected = calculate_price_stats(prices[lo:hi + 1])
+        for key, value in expected.items():
+            assert stats[key] == pytest.approx(value, rel=1e-9, nan_ok=True), key
+    assert index.stats() == pytest.approx(calculate_price_stats(prices), rel=1e-9, nan_ok=True)
+
+
+def test_range_index_bounds():
+    _, timestamps, prices = _index_case(48)
+    index = RangeStatsIndex(timestamps, prices, block_size=4)
+    assert index.bounds(_moment(timestamps, 5), _moment(timestamps, 10)) == (5, 11)
+    assert index.bounds(None, _moment(timestamps, 10)) == (0, 11)
+    aware = _moment(timestamps, 5).astimezone().astimezone(timezone.utc)
+    assert index.bounds(aware, None) == (5, 48)
+    assert index.bounds(datetime(2030, 1, 1), None) == (48, 48)
+    with pytest.raises(ValueError):
+        index.stats(datetime(2030, 1, 1), None)
+
+
+def test_window_stats_use_the_cached_index(monkeypatch):
+    points = [PricePoint(datetime(2024, 1, 1) + timedelta(days=i), float(100 + 10 * i)) for i in range(10)]
+    data = MarketChartData(Symbol.BTC, Currency.USD, points)
+    monkeypatch.setattr(domain_services, 'fetch_market_chart', lambda symbol, currency, days, provider: data)
+
+    stats = domain_services.compute_market_chart_stats(Symbol.BTC, Currency.USD, 10, Provider.COINGECKO,
+                                                       start=datetime(2024, 1, 3), end=datetime(2024, 1, 5))
+    assert (stats['count'], stats['first_price'], stats['last_price'], stats['mean_price']) == (3, 120.0, 140.0, 130.0)
+    assert range_stats_index(data) is range_stats_index(data)
+
+    with pytest.raises(BusinessNoDataError):
+        domain_services.compute_market_chart_stats(Symbol.BTC, Currency.USD, 10, Provider.COINGECKO,
+                                                    start=datetime(2025, 1, 1))
+
+    def no_fetch(symbol, currency, days, provider):
+        raise AssertionError('fetched')
+
+    monkeypatch.setattr(domain_services, 'fetch_market_chart', no_fetch)
+    for use_case in (domain_services.compute_market_chart_stats, domain_services.compute_enriched_market_chart,
+                     domain_services.stream_enriched_market_chart):
+        with pytest.raises(BusinessValidationError):
+            use_case(Symbol.BTC, Currency.USD, 10, Provider.COINGECKO, start=datetime(2024, 1, 5), end=datetime(2024, 1, 3))
+
+
+def test_running_stats_follow_a_sliding_series():
+    rng = np.random.default_rng(3)
+    prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 20_000)))
+    prices[::37] = np.nan
+    lo, hi = 0, 2_000
+    running = RunningPriceStats(prices[lo:hi], block_size=64)
+    for _ in range(300):
+        dropped, added = int(rng.integers(0, 40)), int(rng.integers(0, 60))
+        prices[hi + added - 1] *= 1.001  # live price, revised by the next version
+        running.advance(dropped, prices[lo + dropped:hi + added])
+        lo, hi = lo + dropped, hi + added
+        expected, got = calculate_price_stats(prices[lo:hi]), running.stats()
+        assert got.keys() == expected.keys()
+        for key in expected:
+            assert got[key] == pytest.approx(expected[key], rel=1e-9, nan_ok=True), key
+
+    running.advance(5_000, prices[lo + 5_000:hi + 10])  # nothing kept: rebuilt
+    assert running.stats() == pytest.approx(calculate_price_stats(prices[lo + 5_000:hi + 10]), rel=1e-12)
+    with pytest.raises(ValueError):
+        RunningPriceStats(np.array([np.nan, np.nan])).stats()
@@ -0,0 +1,118 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.domain.entities import Symbol, Currency, Provider, PricePointSeries, MarketChartData
+from app.domain import services as domain_services
+from app.domain.deadline import deadline_scope
+from app.domain.errors import BusinessComputationError, BusinessDeadlineExceededError, BusinessNoDataError, BusinessValidationError
+from app.services.streaming import StreamingEnricher, iter_enriched_chunks, ndjson_lines
+
+'''
+Tests:
+1. The concatenated chunks equal the batch enriched market chart, whatever the chunk size (windows longer than a
+   chunk, duration windows, missing prices)
+2. Only the tail the windows still reach is kept between chunks
+3. stream_enriched_market_chart trims the range and raises its errors before the first chunk
+4. NDJSON lines: one record per row, missing values as null
+5. The request deadline is checked between chunks, after the deadline scope that created the stream is gone
+'''
+
+def _chart(n: int, seed: int = 0, gaps: bool = True) -> MarketChartData:
+    rng = np.random.default_rng(seed)
+    steps = rng.integers(1, 20, n) if gaps else np.full(n, 5)
+    timestamps = np.datetime64('2024-01-01T00:00', 'ns') + np.cumsum(steps) * np.timedelta64(1, 'm')
+    prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    return MarketChartData(Symbol.BTC, Currency.USD, PricePointSeries(timestamps, prices))
+
+
+def _fetch(monkeypatch, chart: MarketChartData):
+    monkeypatch.setattr(domain_services, 'fetch_market_chart', lambda symbol, currency, days, provider: chart)
+
+
+def _stream(**kwargs) -> pd.DataFrame:
+    chunks = domain_services.stream_enriched_market_chart(Symbol.BTC, Currency.USD, 30, Provider.COINGECKO, **kwargs)
+    return pd.concat(list(chunks), ignore_index=True)
+
+
+def _batch(**kwargs) -> pd.DataFrame:
+    return domain_services.compute_enriched_market_chart(Symbol.BTC, Currency.USD, 30, Provider.COINGECKO, **kwargs)
+
+
+@pytest.mark.filterwarnings('ignore:The default fill_method:FutureWarning')  # batch pct_change over missing prices
+@pytest.mark.parametrize('chunk_size', [1, 7, 100, 5_000])
+def test_stream_matches_batch(monkeypatch, chunk_size):
+    chart = _chart(3_000)
+    chart.points.prices[[0, 500, 501, 502, 1_999]] = np.nan
+    chart.points.prices[1] = np.nan  # first valid price after a missing first one
+    _fetch(monkeypatch, chart)
+    params = dict(window_size=[3, 250, '6h'], volatility_window=[2, 120, '1D'], normalize_base=100.0)
+
+    streamed = _stream(chunk_size=chunk_size, **params)
+    batch = _batch(**params)
+    assert list(streamed.columns) == list(batch.columns)
+    assert np.array_equal(streamed['timestamp'].to_numpy(), batch['timestamp'].to_numpy())
+    for column in batch.columns[1:]:
+        np.testing.assert_allclose(streamed[column], batch[column], rtol=1e-9, atol=1e-8, err_msg=column)
+
+
+def test_tail_is_bounded():
+    chart = _chart(2_000, gaps=False)  # one price every 5 minutes
+    enricher = StreamingEnricher([50], ['2h'])
+    chunks = list(iter_enriched_chunks(chart.points.timestamps, chart.points.prices, enricher, 300))
+    assert sum(len(chunk) for chunk in chunks) == 2_000
+    assert len(enricher._tail_prices) == 50  # 50 prices for the rolling mean, more than 2h (24 returns + 1)
+
+
+def test_range_and_errors(monkeypatch):
+    chart = _chart(1_000)
+    _fetch(monkeypatch, chart)
+    start, end = datetime(2024, 1, 2), datetime(2024, 1, 3)
+    streamed = _stream(start=start, end=end, window_size=[10], chunk_size=64)
+    batch = _batch(start=start, end=end, window_size=[10])
+    np.testing.assert_allclose(streamed['rolling_mean_10'], batch['rolling_mean_10'])
+    assert streamed['timestamp'].min() >= pd.Timestamp(start) and streamed['timestamp'].max() <= pd.Timestamp(end)
+
+    with pytest.raises(BusinessValidationError):
+        _stream(window_size=['soon'])
+    with pytest.raises(BusinessValidationError):
+        _stream(chunk_size=0)
+    with pytest.raises(BusinessComputationError):
+        _stream(window_size=[5_000])
+    with pytest.raises(BusinessComputationError):
+        _stream(volatility_window=[1])
+    with pytest.raises(BusinessNoDataError):
+        _stream(start=datetime(2030, 1, 1))
+
+    chart.points.prices[0] = 0.0
+    with pytest.raises(BusinessComputationError):
+        _stream(normalize_base=100.0)
+
+
+def test_ndjson_lines():
+    frame = pd.DataFrame({'timestamp': [datetime(2024, 1, 1), datetime(2024, 1, 1) + timedelta(hours=1)],
+                          'price': [1.0, np.nan]})
+    lines = ''.join(ndjson_lines([frame, frame.iloc[:0]])).splitlines()
+    assert len(lines) == 2
+    assert lines[1].startswith('{"timestamp":"2024-01-01T01:00:00') and lines[1].endswith('"price":null}')
+
+
+class _Deadline:
+    spent = False
+
+    def expired(self) -> bool:
+        return self.spent
+
+
+def test_deadline_between_chunks(monkeypatch):
+    _fetch(monkeypatch, _chart(1_000))
+    deadline = _Deadline()
+    with deadline_scope(deadline):
+        chunks = domain_services.stream_enriched_market_chart(Symbol.BTC, Currency.USD, 30, Provider.COINGECKO,
+                                                              window_size=[10], chunk_size=100)
+    assert len(next(chunks)) == 100
+    deadline.spent = True
+    with pytest.raises(BusinessDeadlineExceededError):
+        next(chunks)